@@ -18,9 +18,9 @@ module alu
       `ALU_OP_AND: res = a & b;
       `ALU_OP_OR:  res = a | b;
       `ALU_OP_XOR: res = a ^ b;
-      `ALU_OP_SLL: res = a << b;
-      `ALU_OP_SRL: res = a >> b;
-      `ALU_OP_SRA: res = signed'(a) >>> b;
+      `ALU_OP_SLL: res = a << b[4:0];
+      `ALU_OP_SRL: res = a >> b[4:0];
+      `ALU_OP_SRA: res = signed'(a) >>> b[4:0];
       `ALU_OP_EQ:  res = a == b;
       `ALU_OP_NE:  res = a != b;
       `ALU_OP_LT:  res = signed'(a) < signed'(b);
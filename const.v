@@ -24,6 +24,18 @@
 
 `define RD_SEL_ALU 0
 `define RD_SEL_MEM 1
+`define RD_SEL_CSR 2
+`define RD_SEL_MULDIV 3
+
+// funct3 of the RV32M instructions
+`define MULDIV_OP_MUL 0
+`define MULDIV_OP_MULH 1
+`define MULDIV_OP_MULHSU 2
+`define MULDIV_OP_MULHU 3
+`define MULDIV_OP_DIV 4
+`define MULDIV_OP_DIVU 5
+`define MULDIV_OP_REM 6
+`define MULDIV_OP_REMU 7
 
 `define PC_NEXT_SEL_STALL 0
 `define PC_NEXT_SEL_NEXT 1
@@ -38,3 +50,10 @@
 `define MEM_ACCESS_BYTE 0
 `define MEM_ACCESS_HALFWORD 1
 `define MEM_ACCESS_WORD 2
+
+`define CSR_CYCLE 12'hc00
+`define CSR_INSTRET 12'hc02
+`define CSR_CYCLEH 12'hc80
+`define CSR_INSTRETH 12'hc82
+// Custom read-only counter of cycles spent in ST_READ_STALL
+`define CSR_READSTALL 12'hcc0
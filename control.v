@@ -4,10 +4,21 @@
 `include "const.v"
 
 module control
+  #(
+    // Control of the pipelined core, see cpu.v
+    parameter PIPELINE = 0
+  )
   (
     input logic clk_i,
     input logic rstn_i,
+    // instruction at pc, compressed ones expanded by rvc_expand
     input logic [31:0] pc_data_i,
+    input logic        compressed_i,
+
+    // mispredicted branch or jump (pipelined core only), destination of a load
+    // whose value is not available to forwarding yet, see cpu.v
+    input   logic        redirect_i,
+    input   logic [4:0]  load_rd_i,
 
     output  logic        reg_wr_en_o,
     output  logic [4:0]  rd_idx_o,
@@ -19,23 +30,31 @@ module control
     output  logic [3:0] alu_op_o,
     output  logic alu_a_sel_o,
     output  logic alu_b_sel_o,
-    output  logic rd_sel_o,
+    output  logic [1:0] rd_sel_o,
     output  logic [2:0] pc_isize_o,
     output  logic [31:0] pc_next_off_o,
     output  logic [2:0] pc_next_sel_o,
 
-    input   logic mem_wr_ready_i,
     output  logic mem_wr_en_o,
     output  logic mem_r_sext_o,
     output  logic mem_r_en_o,
     output  logic [1:0] mem_acc_r_o,
-    output  logic [1:0] mem_acc_w_o
+    output  logic [1:0] mem_acc_w_o,
+    output  logic [31:0] csr_data_o,
+
+    input   logic muldiv_done_i,
+    output  logic muldiv_start_o,
+    output  logic [2:0] muldiv_op_o
   );
 
+  // ST_READ_STALL is the cycle after a load-use interlock, the pipelined core
+  // uses ST_FETCH_STALL for the bubble after a mispredicted branch or jump.
+  // ST_MULDIV_STALL waits for the result of an RV32M instruction.
   localparam [2:0] ST_RESET = 'd0,
                    ST_EXEC = 'd1,
                    ST_READ_STALL = 'd2,
-                   ST_WRITE_STALL = 'd3;
+                   ST_FETCH_STALL = 'd3,
+                   ST_MULDIV_STALL = 'd4;
 
   logic [2:0] state;
   logic [2:0] state_next;
@@ -47,6 +66,63 @@ module control
       state <= state_next;
   end
 
+  // Performance counters
+  logic [63:0] cycle, instret;
+  logic [31:0] read_stall;
+
+  always_ff @(posedge clk_i or negedge rstn_i) begin
+    if (~rstn_i) begin
+      cycle <= 0;
+      instret <= 0;
+      read_stall <= 0;
+    end
+    else begin
+      cycle <= cycle + 1;
+      if (pc_next_sel_o != `PC_NEXT_SEL_STALL)
+        instret <= instret + 1;
+      if (state == ST_READ_STALL)
+        read_stall <= read_stall + 1;
+    end
+  end
+
+  always_comb begin
+    case (pc_data_i[31:20])
+      `CSR_CYCLE:      csr_data_o = cycle[31:0];
+      `CSR_CYCLEH:     csr_data_o = cycle[63:32];
+      `CSR_INSTRET:    csr_data_o = instret[31:0];
+      `CSR_INSTRETH:   csr_data_o = instret[63:32];
+      `CSR_READSTALL:  csr_data_o = read_stall;
+      default:         csr_data_o = 0;
+    endcase
+  end
+
+  // Registers read by the instruction. An instruction which reads the
+  // destination of a load in writeback, or in the memory stage of the
+  // pipelined core, waits one cycle until the loaded value is in the register
+  // file or can be forwarded.
+  logic rs1_used, rs2_used, load_use;
+
+  always_comb begin
+    case (pc_data_i[6:0])
+      7'b1100011, 7'b0100011, 7'b0110011: begin // B-type, S{B,H,W}, R-type
+        rs1_used = 1;
+        rs2_used = 1;
+      end
+      7'b1100111, 7'b0000011, 7'b0010011: begin // JALR, L{B,H,W,BU,HU}, I-type
+        rs1_used = 1;
+        rs2_used = 0;
+      end
+      default: begin
+        rs1_used = 0;
+        rs2_used = 0;
+      end
+    endcase
+
+    load_use = state == ST_EXEC && load_rd_i != 0 &&
+      ((rs1_used && pc_data_i[19:15] == load_rd_i) ||
+       (rs2_used && pc_data_i[24:20] == load_rd_i));
+  end
+
   always_comb begin
     reg_wr_en_o = 0;
     rd_idx_o = pc_data_i[11:7];
@@ -57,7 +133,7 @@ module control
     alu_a_sel_o = `ALU_A_SEL_RS1;
     alu_b_sel_o = `ALU_B_SEL_RS2;
     rd_sel_o = `RD_SEL_ALU;
-    pc_isize_o = 4;
+    pc_isize_o = compressed_i ? 2 : 4;
     pc_next_off_o = 0;
     pc_next_sel_o = `PC_NEXT_SEL_STALL;
     mem_wr_en_o = 0;
@@ -65,10 +141,14 @@ module control
     mem_r_en_o = 0;
     mem_acc_r_o = `MEM_ACCESS_BYTE;
     mem_acc_w_o = `MEM_ACCESS_BYTE;
+    muldiv_start_o = 0;
+    muldiv_op_o = pc_data_i[14:12];
 
     state_next = ST_EXEC;
 
-    if (state > ST_RESET) begin
+    if (load_use)
+      state_next = ST_READ_STALL;
+    else if (state != ST_RESET && state != ST_FETCH_STALL) begin
       pc_next_sel_o = `PC_NEXT_SEL_NEXT;
 
       case (pc_data_i[6:0])
@@ -86,7 +166,7 @@ module control
         end
         7'b1101111: begin // JAL
           reg_wr_en_o = 1;
-          imm_data_o = 4;
+          imm_data_o = pc_isize_o;
           alu_a_sel_o = `ALU_A_SEL_PC;
           alu_b_sel_o = `ALU_B_SEL_IMM;
           pc_next_sel_o = `PC_NEXT_SEL_PC_IMM;
@@ -94,7 +174,7 @@ module control
         end
         7'b1100111: begin // JALR
           reg_wr_en_o = 1;
-          imm_data_o = 4;
+          imm_data_o = pc_isize_o;
           alu_a_sel_o = `ALU_A_SEL_PC;
           alu_b_sel_o = `ALU_B_SEL_IMM;
           pc_next_off_o = signed'(pc_data_i[31:20]);
@@ -135,27 +215,21 @@ module control
           endcase
         end
         7'b0000011: begin // L{B,H,W,BU,HU}
-          // TODO Split the values for both cycles in a clearer way.
-          reg_wr_en_o = state == ST_READ_STALL;
           imm_data_o = signed'(pc_data_i[31:20]);
           alu_b_sel_o = `ALU_B_SEL_IMM;
           rd_sel_o = `RD_SEL_MEM;
-          pc_next_sel_o = state == ST_READ_STALL ? `PC_NEXT_SEL_NEXT : `PC_NEXT_SEL_STALL;
           mem_r_sext_o = ~pc_data_i[14];
-          mem_r_en_o = state == ST_EXEC;
           mem_acc_r_o = pc_data_i[13:12];
-
-          state_next = state == ST_READ_STALL ? ST_EXEC : ST_READ_STALL;
+          // The loaded value is written in the writeback stage.
+          reg_wr_en_o = 1;
+          mem_r_en_o = 1;
         end
         7'b0100011: begin // S{B,H,W}
-          // TODO Split the values for both cycles in a clearer way.
+          // The memory accepts writes of all sizes in the same cycle.
           imm_data_o = signed'({pc_data_i[31:25], pc_data_i[11:7]});
           alu_b_sel_o = `ALU_B_SEL_IMM;
-          pc_next_sel_o = (state == ST_WRITE_STALL && mem_wr_ready_i == 1)  ? `PC_NEXT_SEL_NEXT : `PC_NEXT_SEL_STALL;
-          mem_wr_en_o = state == ST_EXEC;
+          mem_wr_en_o = 1;
           mem_acc_w_o = pc_data_i[13:12];
-
-          state_next = (state == ST_WRITE_STALL && mem_wr_ready_i == 1) ? ST_EXEC : ST_WRITE_STALL;
         end
         7'b0010011: begin // I-type
           case (pc_data_i[14:12])
@@ -222,6 +296,13 @@ module control
             end
           endcase
         end
+        7'b1110011: begin // SYSTEM
+          // All implemented CSRs are read-only counters, writes are ignored.
+          if (pc_data_i[14:12] != 3'b000) begin // CSRR{W,S,C}[I]
+            reg_wr_en_o = 1;
+            rd_sel_o = `RD_SEL_CSR;
+          end
+        end
         7'b0110011: begin // R-type
           case (pc_data_i[14:12])
             3'b000: begin
@@ -296,8 +377,26 @@ module control
               endcase
             end
           endcase
+
+          if (pc_data_i[31:25] == 7'b0000001) begin // MUL[H[[S]U]], DIV[U], REM[U]
+            // The operation starts in the first cycle of the instruction,
+            // u_muldiv samples the operands then. The instruction is held in
+            // ST_MULDIV_STALL until its result is ready and retires in the
+            // same cycle.
+            rd_sel_o = `RD_SEL_MULDIV;
+            muldiv_start_o = state != ST_MULDIV_STALL;
+            if (state == ST_MULDIV_STALL && muldiv_done_i == 1)
+              reg_wr_en_o = 1;
+            else begin
+              pc_next_sel_o = `PC_NEXT_SEL_STALL;
+              state_next = ST_MULDIV_STALL;
+            end
+          end
         end
       endcase
+
+      if (PIPELINE && redirect_i)
+        state_next = ST_FETCH_STALL;
     end // state
   end
 endmodule
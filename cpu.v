@@ -4,6 +4,12 @@
 `include "const.v"
 
 module cpu
+  #(
+    // Rows of 32b words of the instruction and data memory
+    parameter ROWS     = 512,
+    // Select the pipelined core instead of the single-stage one
+    parameter PIPELINE = 0
+  )
   (
     input logic clk_i,
     input logic rstn_i,
@@ -33,6 +39,8 @@ module cpu
   logic [31:0] pc;
   logic [31:0] pc_next;
   logic [31:0] pc_data;
+  logic [31:0] instr;
+  logic        compressed;
   logic [2:0]  pc_isize;
   logic [31:0] pc_next_off;
   logic [2:0]  pc_next_sel;
@@ -43,16 +51,33 @@ module cpu
   logic [31:0] rs1_data, rs2_data, imm_data;
   logic [3:0]  alu_op;
   logic [31:0] rd_data_mx, alu_a_mx, alu_b_mx;
-  logic        rd_sel, alu_a_sel, alu_b_sel;
+  logic [1:0]  rd_sel;
+  logic        alu_a_sel, alu_b_sel;
   logic [31:0] alu_res;
   logic [1:0]  mem_acc_r, mem_acc_w;
-  logic        mem_wr_ready;
+  logic        dm_r_en, dm_wr_en, dm_sext;
+  logic [1:0]  dm_acc_r, dm_acc_w;
+  logic [31:0] dm_addr, dm_data_w;
   logic        mem_r_sext;
+  logic [31:0] csr_data;
+  logic [31:0] fetch_addr;
+  logic [31:0] rs1_fwd, rs2_fwd;
+  logic        redirect;
+  logic [31:0] redirect_target;
+  logic [4:0]  load_rd;
+  logic        rf_wr_en;
+  logic [4:0]  rf_wr_idx;
+  logic [31:0] rf_wr_data;
+  logic        muldiv_start, muldiv_done;
+  logic [2:0]  muldiv_op;
+  logic [31:0] muldiv_res;
 
   mem_control #(
     .DATA_FILE_01("examples/calc/calc.text.txt01"),
     .DATA_FILE_23("examples/calc/calc.text.txt23"),
-    .MAP_ZERO(`MEM_INSTR_ZERO)
+    .ROWS(ROWS),
+    .MAP_ZERO(`MEM_INSTR_ZERO),
+    .HALF_ALIGNED_R(1)
   ) u_mem_instr (
     .clk_i(clk_i),
     .rstn_i(rstn),
@@ -60,7 +85,7 @@ module cpu
     .sext_i('b0),
     .r_en_i('b1),
     .acc_r_i(2'(`MEM_ACCESS_WORD)),
-    .addr_r_i(pc_next),
+    .addr_r_i(fetch_addr),
     .data_r_o(pc_data),
 
     .wr_en_i('b0),
@@ -74,9 +99,9 @@ module cpu
     .clk_i(clk_i),
     .rstn_i(rstn),
 
-    .wr_en_i(reg_wr_en),
-    .rd_idx_i(rd_idx),
-    .rd_data_i(rd_data_mx),
+    .wr_en_i(rf_wr_en),
+    .rd_idx_i(rf_wr_idx),
+    .rd_data_i(rf_wr_data),
 
     .rs1_idx_i(rs1_idx),
     .rs1_data_o(rs1_data),
@@ -92,32 +117,56 @@ module cpu
     .res(alu_res)
   );
 
+  muldiv u_muldiv(
+    .clk_i(clk_i),
+    .rstn_i(rstn),
+
+    .start_i(muldiv_start),
+    .op_i(muldiv_op),
+    .a_i(rs1_fwd),
+    .b_i(rs2_fwd),
+    .done_o(muldiv_done),
+    .res_o(muldiv_res)
+  );
+
   mem_control #(
     .DATA_FILE_01("examples/calc/calc.data.txt01"),
     .DATA_FILE_23("examples/calc/calc.data.txt23"),
+    .ROWS(ROWS),
     .MAP_ZERO(`MEM_DATA_ZERO)
   ) u_mem_control (
     .clk_i(clk_i),
     .rstn_i(rstn),
 
-    .sext_i(mem_r_sext),
-    .r_en_i(mem_r_en),
-    .acc_r_i(mem_acc_r),
-    .addr_r_i(alu_res),
+    .sext_i(dm_sext),
+    .r_en_i(dm_r_en),
+    .acc_r_i(dm_acc_r),
+    .addr_r_i(dm_addr),
     .data_r_o(mem_data_r),
 
-    .wr_en_i(mem_wr_en),
-    .acc_w_i(mem_acc_w),
-    .addr_w_i(alu_res),
-    .data_w_i(rs2_data),
-    .wr_ready_o(mem_wr_ready)
+    .wr_en_i(dm_wr_en),
+    .acc_w_i(dm_acc_w),
+    .addr_w_i(dm_addr),
+    .data_w_i(dm_data_w),
+    .wr_ready_o()
+  );
+
+  rvc_expand u_rvc_expand(
+    .data_i(pc_data),
+    .instr_o(instr),
+    .compressed_o(compressed)
   );
 
-  control u_control(
+  control #(
+    .PIPELINE(PIPELINE)
+  ) u_control(
     .clk_i(clk_i),
     .rstn_i(rstn),
 
-    .pc_data_i(pc_data),
+    .pc_data_i(instr),
+    .compressed_i(compressed),
+    .redirect_i(redirect),
+    .load_rd_i(load_rd),
     .reg_wr_en_o(reg_wr_en),
     .rd_idx_o(rd_idx),
     .rs1_idx_o(rs1_idx),
@@ -133,23 +182,188 @@ module cpu
     .pc_next_off_o(pc_next_off),
     .pc_next_sel_o(pc_next_sel),
 
-    .mem_wr_ready_i(mem_wr_ready),
     .mem_wr_en_o(mem_wr_en),
     .mem_r_sext_o(mem_r_sext),
     .mem_r_en_o(mem_r_en),
     .mem_acc_r_o(mem_acc_r),
-    .mem_acc_w_o(mem_acc_w)
+    .mem_acc_w_o(mem_acc_w),
+    .csr_data_o(csr_data),
+
+    .muldiv_done_i(muldiv_done),
+    .muldiv_start_o(muldiv_start),
+    .muldiv_op_o(muldiv_op)
   );
 
-  assign bus_data = fifo_sel ? fifo_rddata : mem_data_r;
-  assign rd_data_mx = rd_sel == `RD_SEL_ALU ? alu_res : bus_data;
-  assign alu_a_mx = alu_a_sel == `ALU_A_SEL_RS1 ? rs1_data : pc;
-  assign alu_b_mx = alu_b_sel == `ALU_B_SEL_RS2 ? rs2_data : imm_data;
+  // Memory access, writeback and the pipelined core
+  //
+  // An instruction executes in the cycle in which it comes out of the
+  // instruction memory. The single-stage core also accesses the data memory
+  // and the FIFO in that cycle, the pipelined core registers the address,
+  // store data and access of the instruction in ma_* and performs them in the
+  // following cycle, the memory stage. The result is written to the register
+  // file in the cycle after the access, the writeback, where loads take the
+  // value which arrives from the data memory. The single-stage core thus
+  // writes a result one cycle after execute, the pipelined core two cycles.
+  //
+  // Results in the memory stage and in writeback are forwarded to the
+  // instruction in execute. A loaded value is forwarded only from writeback of
+  // the pipelined core, the single-stage core reads it from the register file.
+  // Either way, an instruction which uses a loaded value in the cycle after
+  // the load is held for a cycle in ST_READ_STALL.
+  //
+  // The single-stage core fetches the next instruction at pc_next, so the
+  // whole decode, register read, ALU and branch resolution path ends at the
+  // address input of the instruction memory. The pipelined core instead
+  // predicts the next pc from the instruction alone, which does not depend on
+  // the register file or the ALU:
+  // - JAL and backward conditional branches are predicted taken and fetch
+  //   pc + pc_next_off,
+  // - forward conditional branches and all other instructions fetch
+  //   pc + pc_isize,
+  // - an instruction which stalls fetches pc again.
+  // A mispredicted branch or JALR raises redirect. pc is then loaded with
+  // redirect_target, the other way of the branch or the JALR target, which
+  // does not depend on the ALU either. The control FSM spends one cycle in
+  // ST_FETCH_STALL while the instruction at it is fetched.
+  logic        predict_taken;
+  logic        ma_en;
+  logic [4:0]  ma_rd;
+  logic        ma_load;
+  logic [31:0] ma_data;
+  logic        ma_r_en, ma_wr_en, ma_sext;
+  logic [1:0]  ma_acc_r, ma_acc_w;
+  logic [31:0] ma_addr, ma_data_w;
+  logic        wb_en;
+  logic [4:0]  wb_rd;
+  logic        wb_load;
+  logic        wb_fifo_sel;
+  logic [31:0] wb_data;
+
+  always_ff @(posedge clk_i or negedge rstn) begin
+    if (~rstn) begin
+      ma_en <= 0;
+      ma_rd <= 0;
+      ma_load <= 0;
+      ma_data <= 0;
+      ma_r_en <= 0;
+      ma_wr_en <= 0;
+      ma_sext <= 0;
+      ma_acc_r <= 0;
+      ma_acc_w <= 0;
+      ma_addr <= 0;
+      ma_data_w <= 0;
+    end
+    else begin
+      ma_en <= reg_wr_en;
+      ma_rd <= rd_idx;
+      ma_load <= rd_sel == `RD_SEL_MEM;
+      ma_data <= rd_data_mx;
+      ma_r_en <= mem_r_en;
+      ma_wr_en <= mem_wr_en;
+      ma_sext <= mem_r_sext;
+      ma_acc_r <= mem_acc_r;
+      ma_acc_w <= mem_acc_w;
+      ma_addr <= alu_res;
+      ma_data_w <= rs2_fwd;
+    end
+  end
+
+  // Access of the instruction in the memory stage.
+  always_comb begin
+    if (PIPELINE) begin
+      dm_r_en = ma_r_en;
+      dm_wr_en = ma_wr_en;
+      dm_sext = ma_sext;
+      dm_acc_r = ma_acc_r;
+      dm_acc_w = ma_acc_w;
+      dm_addr = ma_addr;
+      dm_data_w = ma_data_w;
+    end
+    else begin
+      dm_r_en = mem_r_en;
+      dm_wr_en = mem_wr_en;
+      dm_sext = mem_r_sext;
+      dm_acc_r = mem_acc_r;
+      dm_acc_w = mem_acc_w;
+      dm_addr = alu_res;
+      dm_data_w = rs2_fwd;
+    end
+  end
+
+  always_ff @(posedge clk_i or negedge rstn) begin
+    if (~rstn) begin
+      wb_en <= 0;
+      wb_rd <= 0;
+      wb_load <= 0;
+      wb_fifo_sel <= 0;
+      wb_data <= 0;
+    end
+    else if (PIPELINE) begin
+      wb_en <= ma_en;
+      wb_rd <= ma_rd;
+      wb_load <= ma_load;
+      wb_fifo_sel <= fifo_sel;
+      wb_data <= ma_data;
+    end
+    else begin
+      wb_en <= reg_wr_en;
+      wb_rd <= rd_idx;
+      wb_load <= rd_sel == `RD_SEL_MEM;
+      wb_fifo_sel <= fifo_sel;
+      wb_data <= rd_data_mx;
+    end
+  end
+
+  always_comb begin
+    bus_data = wb_fifo_sel ? fifo_rddata : mem_data_r;
+    rf_wr_en = wb_en;
+    rf_wr_idx = wb_rd;
+    rf_wr_data = wb_load ? bus_data : wb_data;
+
+    if (PIPELINE) begin
+      // Static backward taken, forward not taken prediction.
+      predict_taken = pc_next_sel == `PC_NEXT_SEL_PC_IMM ||
+        (pc_next_sel == `PC_NEXT_SEL_COND_PC_IMM && pc_next_off[31]);
+      fetch_addr = pc_next_sel == `PC_NEXT_SEL_STALL ? pc :
+                   predict_taken ? pc + pc_next_off : pc + pc_isize;
+      redirect = pc_next_sel == `PC_NEXT_SEL_RS1_IMM ||
+        (pc_next_sel == `PC_NEXT_SEL_COND_PC_IMM && alu_res[0] != predict_taken);
+      redirect_target = pc_next_sel == `PC_NEXT_SEL_RS1_IMM ? rs1_fwd + pc_next_off :
+                        predict_taken ? pc + pc_isize : pc + pc_next_off;
+
+      load_rd = ma_en && ma_load ? ma_rd : 0;
+      rs1_fwd = ma_en && !ma_load && ma_rd != 0 && ma_rd == rs1_idx ? ma_data :
+                rf_wr_en && rf_wr_idx != 0 && rf_wr_idx == rs1_idx ? rf_wr_data : rs1_data;
+      rs2_fwd = ma_en && !ma_load && ma_rd != 0 && ma_rd == rs2_idx ? ma_data :
+                rf_wr_en && rf_wr_idx != 0 && rf_wr_idx == rs2_idx ? rf_wr_data : rs2_data;
+    end
+    else begin
+      predict_taken = 0;
+      fetch_addr = pc_next;
+      redirect = 0;
+      redirect_target = pc_next;
+
+      load_rd = wb_en && wb_load ? wb_rd : 0;
+      rs1_fwd = wb_en && !wb_load && wb_rd != 0 && wb_rd == rs1_idx ? wb_data : rs1_data;
+      rs2_fwd = wb_en && !wb_load && wb_rd != 0 && wb_rd == rs2_idx ? wb_data : rs2_data;
+    end
+  end
+
+  // Result of the instruction in execute, loads take bus_data in writeback.
+  always_comb begin
+    case (rd_sel)
+      `RD_SEL_CSR: rd_data_mx = csr_data;
+      `RD_SEL_MULDIV: rd_data_mx = muldiv_res;
+      default: rd_data_mx = alu_res;
+    endcase
+  end
+  assign alu_a_mx = alu_a_sel == `ALU_A_SEL_RS1 ? rs1_fwd : pc;
+  assign alu_b_mx = alu_b_sel == `ALU_B_SEL_RS2 ? rs2_fwd : imm_data;
   always_comb begin
     case (pc_next_sel)
       `PC_NEXT_SEL_NEXT: pc_next = pc + pc_isize;
       `PC_NEXT_SEL_PC_IMM: pc_next = pc + pc_next_off;
-      `PC_NEXT_SEL_RS1_IMM: pc_next = rs1_data + pc_next_off;
+      `PC_NEXT_SEL_RS1_IMM: pc_next = rs1_fwd + pc_next_off;
       `PC_NEXT_SEL_COND_PC_IMM: pc_next = alu_res ? pc + pc_next_off : pc + pc_isize;
       default: pc_next = pc; // PC_NEXT_SEL_STALL
     endcase
@@ -158,8 +372,10 @@ module cpu
   always_ff @(posedge clk_i or negedge rstn) begin
     if (~rstn)
       pc <= `MEM_INSTR_ZERO;
+    else if (redirect)
+      pc <= redirect_target;
     else
-      pc <= pc_next;
+      pc <= fetch_addr;
   end
 
   // USB FIFO
@@ -171,12 +387,12 @@ module cpu
   logic       fifo_out_irq, fifo_in_irq; // unused
 
   always_comb begin
-    fifo_sel = alu_res >= `MEM_USB_IO_ZERO &&
-      alu_res < `MEM_USB_IO_ZERO + 4;
-    fifo_rd = fifo_sel && mem_r_en;
-    fifo_wr = fifo_sel && mem_wr_en;
-    fifo_addr = 2'(alu_res - `MEM_USB_IO_ZERO);
-    fifo_wrdata = rs2_data;
+    fifo_sel = dm_addr >= `MEM_USB_IO_ZERO &&
+      dm_addr < `MEM_USB_IO_ZERO + 4;
+    fifo_rd = fifo_sel && dm_r_en;
+    fifo_wr = fifo_sel && dm_wr_en;
+    fifo_addr = 2'(dm_addr - `MEM_USB_IO_ZERO);
+    fifo_wrdata = dm_data_w;
   end
 
   fifo_if u_fifo_if (.clk_i(clk_i),
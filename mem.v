@@ -17,8 +17,9 @@ module mem
     input  logic [31:0] addr_r_i,
     output logic [31:0] data_r_o,
 
-    // write port
+    // write port, wr_be_i enables the individual bytes of data_w_i
     input  logic        wr_en_i,
+    input  logic [3:0]  wr_be_i,
     input  logic [31:0] addr_w_i,
     input  logic [31:0] data_w_i
   );
@@ -26,7 +27,9 @@ module mem
   logic [15:0] mem_01 [ROWS-1:0];
   logic [15:0] mem_23 [ROWS-1:0];
 
-  logic [31:0] addr_r, addr_w;
+  logic [31:0] addr_r_01, addr_r_23, addr_w;
+  logic [15:0] data_r_01, data_r_23;
+  logic        swap_r;
 
   initial begin
     if (DATA_FILE_01 != "" && DATA_FILE_23 != "") begin
@@ -34,19 +37,47 @@ module mem
       $readmemh(DATA_FILE_23, mem_23, 0, ROWS - 1);
     end
   end
+
+`ifdef COCOTB_SIM
+  // Simulation-only backdoor to replace the whole memory content at once,
+  // instead of writing it row by row from a testbench. Setting backdoor_load to
+  // a non-zero value N loads mem_backdoor_N.txt01 and mem_backdoor_N.txt23 from
+  // the current directory, see load_mem() in tests/utils.py.
+  int backdoor_load = 0;
+
+  always @(backdoor_load) begin
+    if (backdoor_load != 0) begin
+      $readmemh($sformatf("mem_backdoor_%0d.txt01", backdoor_load), mem_01, 0, ROWS - 1);
+      $readmemh($sformatf("mem_backdoor_%0d.txt23", backdoor_load), mem_23, 0, ROWS - 1);
+    end
+  end
+`endif
  
+  // A word at a 2-byte aligned address, as fetched for compressed
+  // instructions, starts in mem_23 of its row and continues in mem_01 of the
+  // next one. Both halves are read in the same cycle and swapped on the output.
+  // The next row of the last one wraps to row 0, so a compressed instruction
+  // in the last halfword reads a defined upper half.
   always_comb begin
-    addr_r = addr_r_i >> 2;
+    addr_r_01 = (addr_r_i + 2) >> 2;
+    if (addr_r_01 == ROWS)
+      addr_r_01 = 0;
+    addr_r_23 = addr_r_i >> 2;
     addr_w = addr_w_i >> 2;
+    data_r_o = swap_r ? {data_r_01, data_r_23} : {data_r_23, data_r_01};
   end
 
   always_ff @(posedge clk_i) begin
     if (wr_en_i) begin
-      mem_23[addr_w] <= data_w_i[31:16];
-      mem_01[addr_w] <= data_w_i[15:0];
+      if (wr_be_i[3]) mem_23[addr_w][15:8] <= data_w_i[31:24];
+      if (wr_be_i[2]) mem_23[addr_w][7:0] <= data_w_i[23:16];
+      if (wr_be_i[1]) mem_01[addr_w][15:8] <= data_w_i[15:8];
+      if (wr_be_i[0]) mem_01[addr_w][7:0] <= data_w_i[7:0];
     end
     if (r_en_i) begin
-      data_r_o <= {mem_23[addr_r], mem_01[addr_r]};
+      data_r_01 <= mem_01[addr_r_01];
+      data_r_23 <= mem_23[addr_r_23];
+      swap_r <= addr_r_i[1];
     end
   end
 
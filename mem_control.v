@@ -9,7 +9,10 @@ module mem_control
     parameter DATA_FILE_01 = "",
     parameter DATA_FILE_23 = "",
     parameter ROWS         = 512,
-    parameter MAP_ZERO     = 0
+    parameter MAP_ZERO     = 0,
+    // Read words at 2-byte aligned addresses, for the instruction fetch of
+    // compressed instructions
+    parameter HALF_ALIGNED_R = 0
   )
   (
     input logic clk_i,
@@ -31,8 +34,7 @@ module mem_control
   );
 
   localparam [1:0] ST_RESET = 'd0,
-                   ST_READY = 'd1,
-                   ST_WRITE_PENDING = 'd2;
+                   ST_READY = 'd1;
 
   logic [1:0]  state;
   logic [1:0]  state_next;
@@ -40,11 +42,13 @@ module mem_control
   logic        r_en;
   logic [31:0] addr_r;
   logic [31:0] data_r;
+  logic        r_en_post;
   logic [1:0]  addr_r_post;
   logic [1:0]  acc_r_post;
   logic        sext_post;
 
   logic        wr_en;
+  logic [3:0]  wr_be;
   logic [31:0] addr_w;
   logic [31:0] data_w;
 
@@ -55,49 +59,43 @@ module mem_control
     addr_r = 0;
     data_r_o = 0;
     wr_en = 0;
+    wr_be = 0;
     addr_w = 0;
     data_w = 0;
     state_next = ST_READY;
 
-    // TODO Unnecessarily one cycle late?
+    // Writes of all sizes complete in the cycle in which they are issued.
     wr_ready_o = state == ST_READY;
 
     if (state == ST_READY && wr_en_i && (addr_w_i >= MAP_ZERO && addr_w_i < MAP_ZERO + 4 * ROWS)) begin
-      // writing -- read of the original data
-      r_en = 1;
-      addr_r = (addr_w_i & 'hfffffffc) - MAP_ZERO;
-      state_next = ST_WRITE_PENDING;
-    end
-    else if (state == ST_WRITE_PENDING) begin
-      // writing -- store of the updated data
+      // writing -- the value is replicated to all byte lanes and only the
+      // addressed ones are enabled
       wr_en = 1;
       addr_w = (addr_w_i & 'hfffffffc) - MAP_ZERO;
 
       case (acc_w_i)
         `MEM_ACCESS_BYTE: begin
-          case (addr_w_i & 3)
-            2'b00: data_w = (data_r & 'hffffff00) | ((data_w_i & 'hff) << 0);
-            2'b01: data_w = (data_r & 'hffff00ff) | ((data_w_i & 'hff) << 8);
-            2'b10: data_w = (data_r & 'hff00ffff) | ((data_w_i & 'hff) << 16);
-            2'b11: data_w = (data_r & 'h00ffffff) | ((data_w_i & 'hff) << 24);
-          endcase
+          data_w = {4{data_w_i[7:0]}};
+          wr_be = 4'b0001 << (addr_w_i & 3);
         end
         `MEM_ACCESS_HALFWORD: begin
-          case (addr_w_i & 2)
-            2'b00: data_w = (data_r & 'hffff0000) | ((data_w_i & 'hffff) << 0);
-            2'b10: data_w = (data_r & 'h0000ffff) | ((data_w_i & 'hffff) << 16);
-          endcase
+          data_w = {2{data_w_i[15:0]}};
+          wr_be = 4'b0011 << (addr_w_i & 2);
+        end
+        default: begin // MEM_ACCESS_WORD
+          data_w = data_w_i;
+          wr_be = 4'b1111;
         end
-        default: data_w = data_w_i; // MEM_ACCESS_WORD
       endcase
     end
-    else if (r_en_i) begin
+
+    if (r_en_i) begin
       // reading
-      addr_r = (addr_r_i & 'hfffffffc) - MAP_ZERO;
+      addr_r = (addr_r_i & (HALF_ALIGNED_R ? 'hfffffffe : 'hfffffffc)) - MAP_ZERO;
     end
 
-    // post posedge clk_i
-    case (acc_r_post)
+    // post posedge clk_i, reads outside of the mapped range return 0
+    if (r_en_post) case (acc_r_post)
       `MEM_ACCESS_BYTE: begin
         if (sext_post == 1)
           data_r_o =   signed'(8'(data_r >> (8 * (addr_r_post & 3))));
@@ -115,6 +113,7 @@ module mem_control
   end
 
   always_ff @(posedge clk_i) begin
+    r_en_post <= r_en;
     addr_r_post <= addr_r_i;
     acc_r_post <= acc_r_i;
     sext_post <= sext_i;
@@ -137,6 +136,7 @@ module mem_control
     .addr_r_i(addr_r),
     .data_r_o(data_r),
     .wr_en_i(wr_en),
+    .wr_be_i(wr_be),
     .addr_w_i(addr_w),
     .data_w_i(data_w)
   );
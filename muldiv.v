@@ -0,0 +1,126 @@
+// Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+// SPDX-License-Identifier: MIT
+
+`include "const.v"
+
+// Iterative multiplier and divider of the RV32M instructions
+//
+// An operation starts in a cycle with start_i set, op_i is funct3 of the
+// instruction and a_i and b_i are its rs1 and rs2 values, which are only
+// sampled then. Both operations work on the absolute values of the operands
+// in one 64-bit register, with one step per bit of the result:
+// - multiplication keeps {product, multiplier} and shifts it right, adding
+//   the multiplicand to the upper half when the low bit of the multiplier is
+//   set,
+// - division keeps {remainder, dividend} and shifts it left, subtracting the
+//   divisor from the upper half when it fits and shifting in a quotient bit.
+// Two steps are chained in each cycle. After 16 cycles done_o is set and res_o
+// holds the result with its sign restored, both stay valid until the next
+// start.
+module muldiv
+  (
+    input logic clk_i,
+    input logic rstn_i,
+
+    input  logic        start_i,
+    input  logic [2:0]  op_i,
+    input  logic [31:0] a_i,
+    input  logic [31:0] b_i,
+    output logic        done_o,
+    output logic [31:0] res_o
+  );
+
+  logic [2:0]  op;
+  logic [63:0] acc;
+  logic [31:0] operand;
+  logic        neg;
+  logic [4:0]  count;
+
+  logic        a_neg, b_neg;
+  logic [31:0] a_abs, b_abs;
+  logic [63:0] acc_next;
+  logic [32:0] sum;
+  logic [33:0] diff;
+  logic [63:0] product;
+
+  always_comb begin
+    // Signed operands of MULH, MULHSU, DIV and REM. The low word of the
+    // product of MUL does not depend on the signedness.
+    case (op_i)
+      `MULDIV_OP_MULH, `MULDIV_OP_DIV, `MULDIV_OP_REM: begin
+        a_neg = a_i[31];
+        b_neg = b_i[31];
+      end
+      `MULDIV_OP_MULHSU: begin
+        a_neg = a_i[31];
+        b_neg = 0;
+      end
+      default: begin
+        a_neg = 0;
+        b_neg = 0;
+      end
+    endcase
+    a_abs = a_neg ? -a_i : a_i;
+    b_abs = b_neg ? -b_i : b_i;
+
+    // Both steps are assigned in every iteration, otherwise the unused one
+    // would become a latch.
+    sum = 0;
+    diff = 0;
+    acc_next = acc;
+    for (int i = 0; i < 2; i++) begin
+      if (op[2]) begin
+        diff = acc_next[63:31] - operand;
+        acc_next = diff[33] ? {acc_next[62:0], 1'b0} : {diff[31:0], acc_next[30:0], 1'b1};
+      end
+      else begin
+        sum = acc_next[63:32] + (acc_next[0] ? operand : 32'b0);
+        acc_next = {sum, acc_next[31:1]};
+      end
+    end
+  end
+
+  always_ff @(posedge clk_i or negedge rstn_i) begin
+    if (~rstn_i) begin
+      op <= 0;
+      acc <= 0;
+      operand <= 0;
+      neg <= 0;
+      count <= 0;
+    end
+    else if (start_i) begin
+      op <= op_i;
+      count <= 16;
+      if (op_i[2]) begin // DIV[U], REM[U]
+        acc <= {32'b0, a_abs};
+        operand <= b_abs;
+        // The remainder has the sign of the dividend, the quotient of a
+        // division by zero is all ones regardless of the signs.
+        neg <= op_i[1] ? a_neg : a_neg ^ b_neg && b_i != 0;
+      end
+      else begin // MUL[H[[S]U]]
+        acc <= {32'b0, b_abs};
+        operand <= a_abs;
+        neg <= a_neg ^ b_neg;
+      end
+    end
+    else if (count != 0) begin
+      count <= count - 1;
+      acc <= acc_next;
+    end
+  end
+
+  always_comb begin
+    done_o = count == 0;
+    product = neg ? -acc : acc;
+
+    case (op)
+      `MULDIV_OP_MUL:  res_o = product[31:0];
+      `MULDIV_OP_DIV,
+      `MULDIV_OP_DIVU: res_o = neg ? -acc[31:0] : acc[31:0];
+      `MULDIV_OP_REM,
+      `MULDIV_OP_REMU: res_o = neg ? -acc[63:32] : acc[63:32];
+      default:         res_o = product[63:32]; // MULH[[S]U]
+    endcase
+  end
+endmodule
@@ -5,6 +5,15 @@
 // https://github.com/ulixxe/usb_cdc/blob/main/examples/TinyFPGA-BX/hdl/soc/soc.v.
 
 module pako32
+  #(
+    // Divider of the 16MHz clock which gives the clock of the cpu and of the
+    // application side of usb_cdc, one of 2, 4, 8 and 16
+    parameter CPU_CLK_DIV = 8,
+    // Rows of 32b words of the instruction and data memory
+    parameter ROWS        = 512,
+    // Select the pipelined cpu core
+    parameter PIPELINE    = 0
+  )
   (
     input  logic clk,   // 16MHz Clock
     output logic led,   // User LED ON=1, OFF=0
@@ -21,6 +30,7 @@ module pako32
   logic       clk_2mhz;
   logic       clk_4mhz;
   logic       clk_8mhz;
+  logic       clk_cpu;
   logic       lock;
   logic       dp_pu;
   logic       dp_rx;
@@ -69,6 +79,18 @@ module pako32
                          .clk_div4_o(clk_4mhz),
                          .clk_div2_o(clk_8mhz));
 
+  generate
+    case (CPU_CLK_DIV)
+      2:  assign clk_cpu = clk_8mhz;
+      4:  assign clk_cpu = clk_4mhz;
+      8:  assign clk_cpu = clk_2mhz;
+      16: assign clk_cpu = clk_1mhz;
+      default: begin
+        $error("CPU_CLK_DIV must be 2, 4, 8 or 16");
+      end
+    endcase
+  endgenerate
+
   logic [1:0] rstn_sync;
   logic       rstn;
 
@@ -96,14 +118,16 @@ module pako32
 
   assign led = ~dp_pu | ~up_cnt[20];
 
-  cpu u_cpu (.clk_i(clk_2mhz),
-             .rstn_i(rstn),
-             .out_data_i(out_data),
-             .out_valid_i(out_valid),
-             .in_ready_i(in_ready),
-             .out_ready_o(out_ready),
-             .in_data_o(in_data),
-             .in_valid_o(in_valid));
+  cpu #(.ROWS(ROWS),
+        .PIPELINE(PIPELINE))
+  u_cpu (.clk_i(clk_cpu),
+         .rstn_i(rstn),
+         .out_data_i(out_data),
+         .out_valid_i(out_valid),
+         .in_ready_i(in_ready),
+         .out_ready_o(out_ready),
+         .in_data_o(in_data),
+         .in_valid_o(in_valid));
 
   usb_cdc #(.VENDORID(16'h1D50),
             .PRODUCTID(16'h6130),
@@ -111,10 +135,10 @@ module pako32
             .OUT_BULK_MAXPACKETSIZE('d8),
             .BIT_SAMPLES(BIT_SAMPLES),
             .USE_APP_CLK(1),
-            .APP_CLK_RATIO(BIT_SAMPLES*12/2))  // BIT_SAMPLES * 12MHz / 2MHz
+            .APP_CLK_RATIO(BIT_SAMPLES*12*CPU_CLK_DIV/16))  // BIT_SAMPLES * 12MHz / cpu clock
   u_usb_cdc (.frame_o(),
              .configured_o(),
-             .app_clk_i(clk_2mhz),
+             .app_clk_i(clk_cpu),
              .clk_i(clk_pll),
              .rstn_i(rstn),
              .out_ready_i(out_ready),
@@ -0,0 +1,130 @@
+// Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+// SPDX-License-Identifier: MIT
+
+`include "const.v"
+
+// Expander of the RV32C compressed instructions
+//
+// data_i is the word fetched at pc. When its two low bits are not 2'b11, the
+// low halfword is a compressed instruction, compressed_o is set and instr_o
+// is the equivalent 32-bit instruction, so the control FSM only decodes the
+// base encoding. Other words are passed through unchanged. Illegal and
+// reserved compressed encodings, including the floating-point loads and
+// stores, expand to zero, which executes as a nop like any other unknown
+// opcode.
+module rvc_expand
+  (
+    input  logic [31:0] data_i,
+    output logic [31:0] instr_o,
+    output logic        compressed_o
+  );
+
+  localparam [6:0] OP_LUI    = 7'b0110111,
+                   OP_JAL    = 7'b1101111,
+                   OP_JALR   = 7'b1100111,
+                   OP_BRANCH = 7'b1100011,
+                   OP_LOAD   = 7'b0000011,
+                   OP_STORE  = 7'b0100011,
+                   OP_IMM    = 7'b0010011,
+                   OP_REG    = 7'b0110011;
+
+  logic [15:0] c;
+  logic [4:0]  rd, rs2, rd_p, rs1_p;
+  logic [11:0] imm;
+  logic [20:0] j_off;
+  logic [12:0] b_off;
+  logic [11:0] sp_imm;
+
+  always_comb begin
+    c = data_i[15:0];
+    // rd/rs1 and rs2 of the CR and CI formats, rd'/rs2' and rs1' of the
+    // formats which address x8..x15 only
+    rd = c[11:7];
+    rs2 = c[6:2];
+    rd_p = {2'b01, c[4:2]};
+    rs1_p = {2'b01, c[9:7]};
+    imm = signed'({c[12], c[6:2]});
+    j_off = signed'({c[12], c[8], c[10:9], c[6], c[7], c[2], c[11], c[5:3], 1'b0});
+    b_off = signed'({c[12], c[6:5], c[2], c[11:10], c[4:3], 1'b0});
+    sp_imm = signed'({c[12], c[4:3], c[5], c[2], c[6], 4'b0000});
+
+    compressed_o = data_i[1:0] != 2'b11;
+    instr_o = data_i;
+
+    if (compressed_o) begin
+      instr_o = 0;
+      case ({c[15:13], c[1:0]})
+        5'b000_00: begin // C.ADDI4SPN
+          if (c[12:5] != 0)
+            instr_o = {2'b00, c[10:7], c[12:11], c[5], c[6], 2'b00, 5'd2, 3'b000, rd_p, OP_IMM};
+        end
+        5'b010_00: // C.LW
+          instr_o = {5'b0, c[5], c[12:10], c[6], 2'b00, rs1_p, 3'b010, rd_p, OP_LOAD};
+        5'b110_00: // C.SW
+          instr_o = {5'b0, c[5], c[12], rd_p, rs1_p, 3'b010, c[11:10], c[6], 2'b00, OP_STORE};
+        5'b000_01: // C.ADDI, C.NOP
+          instr_o = {imm, rd, 3'b000, rd, OP_IMM};
+        5'b001_01, 5'b101_01: // C.JAL, C.J
+          instr_o = {j_off[20], j_off[10:1], j_off[11], j_off[19:12], 4'b0, ~c[15], OP_JAL};
+        5'b010_01: // C.LI
+          instr_o = {imm, 5'd0, 3'b000, rd, OP_IMM};
+        5'b011_01: begin
+          if (rd == 2) // C.ADDI16SP
+            instr_o = {sp_imm, 5'd2, 3'b000, 5'd2, OP_IMM};
+          else // C.LUI
+            instr_o = {{15{c[12]}}, c[6:2], rd, OP_LUI};
+        end
+        5'b100_01: begin
+          case (c[11:10])
+            2'b00: begin // C.SRLI
+              if (!c[12])
+                instr_o = {7'b0000000, c[6:2], rs1_p, 3'b101, rs1_p, OP_IMM};
+            end
+            2'b01: begin // C.SRAI
+              if (!c[12])
+                instr_o = {7'b0100000, c[6:2], rs1_p, 3'b101, rs1_p, OP_IMM};
+            end
+            2'b10: // C.ANDI
+              instr_o = {imm, rs1_p, 3'b111, rs1_p, OP_IMM};
+            default: begin
+              if (!c[12]) case (c[6:5])
+                2'b00: instr_o = {7'b0100000, rd_p, rs1_p, 3'b000, rs1_p, OP_REG}; // C.SUB
+                2'b01: instr_o = {7'b0000000, rd_p, rs1_p, 3'b100, rs1_p, OP_REG}; // C.XOR
+                2'b10: instr_o = {7'b0000000, rd_p, rs1_p, 3'b110, rs1_p, OP_REG}; // C.OR
+                default: instr_o = {7'b0000000, rd_p, rs1_p, 3'b111, rs1_p, OP_REG}; // C.AND
+              endcase
+            end
+          endcase
+        end
+        5'b110_01, 5'b111_01: // C.BEQZ, C.BNEZ
+          instr_o = {b_off[12], b_off[10:5], 5'd0, rs1_p, 2'b00, c[13], b_off[4:1], b_off[11],
+                     OP_BRANCH};
+        5'b000_10: begin // C.SLLI
+          if (!c[12])
+            instr_o = {7'b0000000, c[6:2], rd, 3'b001, rd, OP_IMM};
+        end
+        5'b010_10: // C.LWSP
+          instr_o = {4'b0, c[3:2], c[12], c[6:4], 2'b00, 5'd2, 3'b010, rd, OP_LOAD};
+        5'b100_10: begin
+          if (!c[12]) begin
+            if (rs2 == 0) // C.JR
+              instr_o = {12'b0, rd, 3'b000, 5'd0, OP_JALR};
+            else // C.MV
+              instr_o = {7'b0000000, rs2, 5'd0, 3'b000, rd, OP_REG};
+          end
+          else begin
+            if (rs2 == 0 && rd == 0) // C.EBREAK
+              instr_o = 32'h00100073;
+            else if (rs2 == 0) // C.JALR
+              instr_o = {12'b0, rd, 3'b000, 5'd1, OP_JALR};
+            else // C.ADD
+              instr_o = {7'b0000000, rs2, rd, 3'b000, rd, OP_REG};
+          end
+        end
+        5'b110_10: // C.SWSP
+          instr_o = {4'b0, c[8:7], c[12], rs2, 5'd2, 3'b010, c[11:9], 2'b00, OP_STORE};
+        default: ; // floating-point loads and stores, reserved
+      endcase
+    end
+  end
+endmodule
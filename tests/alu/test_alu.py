@@ -1,12 +1,39 @@
 # Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
 # SPDX-License-Identifier: MIT
 
+import os
+import random
+
 import cocotb
 from cocotb.triggers import Timer
 
+import funccov
 import utils
 
 
+def signed(value):
+    return value - ((value >> 31) << 32)
+
+
+# Reference results of the operations, indexed by alu_op.
+MODEL = [
+    lambda a, b: a + b,
+    lambda a, b: a - b,
+    lambda a, b: a & b,
+    lambda a, b: a | b,
+    lambda a, b: a ^ b,
+    lambda a, b: a << (b & 31),
+    lambda a, b: a >> (b & 31),
+    lambda a, b: signed(a) >> (b & 31),
+    lambda a, b: int(a == b),
+    lambda a, b: int(a != b),
+    lambda a, b: int(signed(a) < signed(b)),
+    lambda a, b: int(signed(a) >= signed(b)),
+    lambda a, b: int(a < b),
+    lambda a, b: int(a >= b),
+]
+
+
 @cocotb.test()
 async def test_add(dut):
     """Check addition."""
@@ -87,6 +114,22 @@ async def test_sra(dut):
     assert dut.res.value == 0xfaaaaaaa
 
 
+@cocotb.test()
+async def test_shift_amount(dut):
+    """Check that shifts use only the low 5 bits of the shift amount."""
+    dut.a.value = 0xaaaaaaaa
+    dut.b.value = 0xffffffe4
+    dut.op.value = 5
+    await Timer(1)
+    assert dut.res.value == 0xaaaaaaa0
+    dut.op.value = 6
+    await Timer(1)
+    assert dut.res.value == 0x0aaaaaaa
+    dut.op.value = 7
+    await Timer(1)
+    assert dut.res.value == 0xfaaaaaaa
+
+
 @cocotb.test()
 async def test_eq(dut):
     """Check equality comparison."""
@@ -181,3 +224,27 @@ async def test_geu(dut):
     dut.op.value = 13
     await Timer(1)
     assert dut.res.value == 1
+
+
+@cocotb.test()
+async def test_random(dut):
+    """Check all operations with random operands and their coverage."""
+    rng = random.Random(cocotb.RANDOM_SEED)
+    coverage = funccov.AluCoverage(dut)
+    for _ in range(2000):
+        op = rng.randrange(len(MODEL))
+        a = rng.choice([0, 1, 0x7fffffff, 0x80000000, 0xffffffff, rng.getrandbits(32)])
+        b = rng.choice([a, 0, 1, 31, 0x80000000, 0xffffffff, rng.getrandbits(32)])
+        dut.a.value = a
+        dut.b.value = b
+        dut.op.value = op
+        await Timer(1)
+        expected = MODEL[op](a, b) & 0xffffffff
+        assert dut.res.value == expected, \
+            f"{funccov.ALU_OPS[op]}({a:#x}, {b:#x}) is {dut.res.value.integer:#x}, " \
+            f"expected {expected:#x}"
+        coverage.sample()
+
+    if 'COVERAGE_OUTPUT' in os.environ:
+        coverage.save(os.environ['COVERAGE_OUTPUT'])
+    assert not coverage.gaps()
@@ -0,0 +1,565 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Assembler of RV32IMC programs for the cpu toplevel.
+
+The assembler accepts the usual RISC-V assembly syntax with one statement per
+line:
+
+    # Comments start with '#'.
+    start:                      # labels end with ':'
+        li    a0, 0x20000       # registers by number or by ABI name
+        lw    t0, 4(a0)
+        beqz  t0, start         # branches and jumps take labels or offsets
+        csrr  t1, cycle
+        c.addi a0, 4              # compressed instructions take 2 bytes
+        .word 0xdeadbeef
+        .half 0x0001
+
+All RV32IM instructions, the Zicsr instructions and the common pseudoinstructions
+(nop, li, la, mv, not, neg, seqz, snez, j, jr, call, ret, csrr, beqz, bnez,
+bltz, bgez, blez, bgtz, bgt, ble, bgtu, bleu) are supported. Instructions of the
+C extension are written explicitly with their c. mnemonics, other ones are never
+compressed. Immediates are integers, label names optionally followed by +/- an
+integer, or %hi(...) and %lo(...) of these. Branch and jump operands which are
+numbers are offsets from the instruction, as in the output of objdump.
+
+assemble() returns an Image with the instruction words and the addresses of
+labels, a program which ends in the middle of a word is padded with c.nop.
+Image.halves() gives the split of the words into the mem_01 and mem_23 arrays
+of mem.v, which is also the content of the .txt01 and .txt23 files read by
+$readmemh.
+
+The encode_*() functions build 32-bit instructions of the base formats from
+their fields and c_imm() places an immediate into a compressed instruction,
+rvgen uses them to generate programs without going through the parser.
+"""
+
+import argparse
+import re
+import sys
+
+import const
+import elf2mem
+
+
+class AsmError(Exception):
+    pass
+
+
+REGS = {f'x{i}': i for i in range(32)}
+REGS.update({name: i for i, name in enumerate(
+    ['zero', 'ra', 'sp', 'gp', 'tp', 't0', 't1', 't2', 's0', 's1', 'a0', 'a1', 'a2', 'a3',
+     'a4', 'a5', 'a6', 'a7', 's2', 's3', 's4', 's5', 's6', 's7', 's8', 's9', 's10', 's11',
+     't3', 't4', 't5', 't6'])})
+REGS['fp'] = 8
+
+CSRS = {
+    'cycle': const.CSR_CYCLE,
+    'instret': const.CSR_INSTRET,
+    'cycleh': const.CSR_CYCLEH,
+    'instreth': const.CSR_INSTRETH,
+    'readstall': const.CSR_READSTALL,
+}
+
+_REG_OPS = {'add': (0b000, 0b0000000), 'sub': (0b000, 0b0100000), 'sll': (0b001, 0b0000000),
+            'slt': (0b010, 0b0000000), 'sltu': (0b011, 0b0000000), 'xor': (0b100, 0b0000000),
+            'srl': (0b101, 0b0000000), 'sra': (0b101, 0b0100000), 'or': (0b110, 0b0000000),
+            'and': (0b111, 0b0000000), 'mul': (0b000, 0b0000001), 'mulh': (0b001, 0b0000001),
+            'mulhsu': (0b010, 0b0000001), 'mulhu': (0b011, 0b0000001), 'div': (0b100, 0b0000001),
+            'divu': (0b101, 0b0000001), 'rem': (0b110, 0b0000001), 'remu': (0b111, 0b0000001)}
+_IMM_OPS = {'addi': 0b000, 'slti': 0b010, 'sltiu': 0b011, 'xori': 0b100, 'ori': 0b110,
+            'andi': 0b111}
+_SHIFT_IMM_OPS = {'slli': (0b001, 0b0000000), 'srli': (0b101, 0b0000000),
+                  'srai': (0b101, 0b0100000)}
+_LOADS = {'lb': 0b000, 'lh': 0b001, 'lw': 0b010, 'lbu': 0b100, 'lhu': 0b101}
+_STORES = {'sb': 0b000, 'sh': 0b001, 'sw': 0b010}
+_BRANCHES = {'beq': 0b000, 'bne': 0b001, 'blt': 0b100, 'bge': 0b101, 'bltu': 0b110,
+             'bgeu': 0b111}
+_CSR_OPS = {'csrrw': 0b001, 'csrrs': 0b010, 'csrrc': 0b011, 'csrrwi': 0b101,
+            'csrrsi': 0b110, 'csrrci': 0b111}
+# Pseudo branches as (instruction, swap operands, compare with zero)
+_BRANCHES_ZERO = {'beqz': ('beq', False), 'bnez': ('bne', False), 'bltz': ('blt', False),
+                  'bgez': ('bge', False), 'blez': ('bge', True), 'bgtz': ('blt', True)}
+_BRANCHES_SWAP = {'bgt': 'blt', 'ble': 'bge', 'bgtu': 'bltu', 'bleu': 'bgeu'}
+
+_C_ALU_OPS = {'c.sub': 0b00, 'c.xor': 0b01, 'c.or': 0b10, 'c.and': 0b11}
+_C_SHIFT_OPS = {'c.srli': 0b00, 'c.srai': 0b01}
+
+# Accepted numbers of operands by mnemonic
+_OPERANDS = {
+    **dict.fromkeys(list(_REG_OPS) + list(_IMM_OPS) + list(_SHIFT_IMM_OPS) + list(_BRANCHES) +
+                    list(_BRANCHES_SWAP) + list(_CSR_OPS), (3,)),
+    **dict.fromkeys(list(_LOADS) + list(_STORES) + list(_BRANCHES_ZERO), (2,)),
+    **dict.fromkeys(['lui', 'auipc', 'li', 'la', 'mv', 'not', 'neg', 'seqz', 'snez', 'csrr'],
+                    (2,)),
+    **dict.fromkeys(['j', 'jr', 'call'], (1,)),
+    **dict.fromkeys(['nop', 'ret', 'fence', 'ecall', 'ebreak'], (0,)),
+    'jal': (1, 2),
+    'jalr': (1, 2, 3),
+    'c.addi4spn': (3,),
+    **dict.fromkeys(list(_C_ALU_OPS) + list(_C_SHIFT_OPS) +
+                    ['c.lw', 'c.sw', 'c.addi', 'c.li', 'c.addi16sp', 'c.lui', 'c.andi', 'c.beqz',
+                     'c.bnez', 'c.slli', 'c.lwsp', 'c.swsp', 'c.mv', 'c.add'], (2,)),
+    **dict.fromkeys(['c.jal', 'c.j', 'c.jr', 'c.jalr'], (1,)),
+    **dict.fromkeys(['c.nop', 'c.ebreak'], (0,)),
+}
+
+_LABEL = re.compile(r'^\s*([A-Za-z_.$][\w.$]*)\s*:')
+_MEMORY = re.compile(r'^(.*)\((\w+)\)$')
+_SYMBOL = re.compile(r'^([A-Za-z_.$][\w.$]*)\s*(?:([+-])\s*(\w+))?$')
+_RELOC = re.compile(r'^%(hi|lo)\((.*)\)$')
+
+
+class Image:
+    """Assembled instruction words placed from address base."""
+
+    def __init__(self, words, labels, base):
+        self.words = words
+        self.labels = labels
+        self.base = base
+
+    @property
+    def text(self):
+        """Little-endian byte image of the words."""
+        return b''.join(word.to_bytes(4, 'little') for word in self.words)
+
+    def halves(self):
+        """Return the lower and upper halfwords of all words, i.e. rows of mem_01
+        and mem_23 in mem.v."""
+        return ([word & 0xffff for word in self.words],
+                [word >> 16 for word in self.words])
+
+    def write_hex(self, prefix):
+        """Write the halfwords to prefix.txt01 and prefix.txt23 for $readmemh.
+        Files which already have the same content are not rewritten."""
+        for suffix, halves in zip(('txt01', 'txt23'), self.halves()):
+            elf2mem.update_file(f'{prefix}.{suffix}', ''.join(f'{half:04x}\n' for half in halves))
+
+
+def encode_r(funct7, rs2, rs1, funct3, rd, opcode):
+    return (funct7 << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+
+def encode_i(imm, rs1, funct3, rd, opcode):
+    return ((imm & 0xfff) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+
+def encode_s(imm, rs2, rs1, funct3):
+    return (((imm >> 5) & 0x7f) << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | \
+        ((imm & 0x1f) << 7) | 0b0100011
+
+
+def encode_b(off, rs2, rs1, funct3):
+    return (((off >> 12) & 1) << 31) | (((off >> 5) & 0x3f) << 25) | (rs2 << 20) | \
+        (rs1 << 15) | (funct3 << 12) | (((off >> 1) & 0xf) << 8) | \
+        (((off >> 11) & 1) << 7) | 0b1100011
+
+
+def encode_u(imm, rd, opcode):
+    return ((imm & 0xfffff) << 12) | (rd << 7) | opcode
+
+
+def encode_j(off, rd):
+    return (((off >> 20) & 1) << 31) | (((off >> 1) & 0x3ff) << 21) | \
+        (((off >> 11) & 1) << 20) | (((off >> 12) & 0xff) << 12) | (rd << 7) | 0b1101111
+
+
+def c_imm(value, hi, layout):
+    """Place the bits of an immediate into bits hi and below of a compressed
+    instruction, layout lists them in the notation of the RISC-V specification,
+    e.g. '5:3|2|6'."""
+    half = 0
+    pos = hi
+    for field in layout.split('|'):
+        msb, _, lsb = field.partition(':')
+        for bit in range(int(msb), int(lsb or msb) - 1, -1):
+            half |= ((value >> bit) & 1) << pos
+            pos -= 1
+    return half
+
+
+def _hi(value):
+    """Upper 20 bits of value for lui/auipc, rounded for a following signed
+    12-bit addition of _lo(value)."""
+    return ((value + 0x800) >> 12) & 0xfffff
+
+
+def _lo(value):
+    return ((value & 0xfff) ^ 0x800) - 0x800
+
+
+class _Assembler:
+    def __init__(self, labels, base):
+        self.labels = labels
+        self.base = base
+        self.addr = base
+
+    def reg(self, token):
+        try:
+            return REGS[token]
+        except KeyError:
+            raise AsmError(f"invalid register '{token}'") from None
+
+    def value(self, token):
+        """Return the value of an integer, a label expression or a relocation."""
+        match = _RELOC.match(token)
+        if match:
+            value = self.value(match.group(2).strip())
+            return _hi(value) if match.group(1) == 'hi' else _lo(value)
+        try:
+            return int(token, 0)
+        except ValueError:
+            pass
+        match = _SYMBOL.match(token)
+        if not match or match.group(1) not in self.labels:
+            raise AsmError(f"invalid value '{token}'")
+        value = self.labels[match.group(1)]
+        if match.group(2):
+            offset = int(match.group(3), 0)
+            value += offset if match.group(2) == '+' else -offset
+        return value
+
+    def creg(self, token):
+        """Return the 3-bit number of one of x8..x15, the registers of the
+        compressed formats with 3-bit register fields."""
+        reg = self.reg(token)
+        if not 8 <= reg < 16:
+            raise AsmError(f"register '{token}' is not one of x8..x15")
+        return reg - 8
+
+    def imm(self, token, bits, signed=True, scale=1, nonzero=False):
+        value = self.value(token)
+        low, high = (-(1 << (bits - 1)), 1 << (bits - 1)) if signed else (0, 1 << bits)
+        if not low <= value < high:
+            raise AsmError(f"immediate {value} out of range [{low}, {high})")
+        if value % scale:
+            raise AsmError(f"immediate {value} is not a multiple of {scale}")
+        if nonzero and not value:
+            raise AsmError("immediate must not be zero")
+        return value
+
+    def target(self, token, bits):
+        """Return the offset to a branch or jump target."""
+        try:
+            off = int(token, 0)
+        except ValueError:
+            off = self.value(token) - self.addr
+        if off & 1 or not -(1 << (bits - 1)) <= off < 1 << (bits - 1):
+            raise AsmError(f"invalid target offset {off}")
+        return off
+
+    def memory(self, token, bits=12, signed=True, scale=1):
+        match = _MEMORY.match(token)
+        if not match:
+            raise AsmError(f"invalid memory operand '{token}'")
+        offset = match.group(1).strip()
+        return (self.imm(offset, bits, signed, scale) if offset else 0,
+                self.reg(match.group(2)))
+
+    def sp(self, reg):
+        if reg != REGS['sp']:
+            raise AsmError("operand must be sp")
+
+    def csr(self, token):
+        if token in CSRS:
+            return CSRS[token]
+        return self.imm(token, 12, signed=False)
+
+    def li(self, rd, value):
+        value = (value + (1 << 31)) % (1 << 32) - (1 << 31)
+        if -2048 <= value < 2048:
+            return [encode_i(value, 0, 0b000, rd, 0b0010011)]
+        words = [encode_u(_hi(value), rd, 0b0110111)]
+        if _lo(value):
+            words.append(encode_i(_lo(value), rd, 0b000, rd, 0b0010011))
+        return words
+
+    def encode(self, mnemonic, ops):
+        """Return the words of one statement, or the halfword of a compressed
+        instruction."""
+        counts = _OPERANDS.get(mnemonic)
+        if counts is None:
+            raise AsmError(f"unknown instruction '{mnemonic}'")
+        if len(ops) not in counts:
+            raise AsmError(f"wrong number of operands of '{mnemonic}'")
+
+        if mnemonic.startswith('c.'):
+            return self.encode_compressed(mnemonic, ops)
+        if mnemonic in _REG_OPS:
+            funct3, funct7 = _REG_OPS[mnemonic]
+            return [encode_r(funct7, self.reg(ops[2]), self.reg(ops[1]), funct3, self.reg(ops[0]),
+                       0b0110011)]
+        if mnemonic in _IMM_OPS:
+            return [encode_i(self.imm(ops[2], 12), self.reg(ops[1]), _IMM_OPS[mnemonic],
+                       self.reg(ops[0]), 0b0010011)]
+        if mnemonic in _SHIFT_IMM_OPS:
+            funct3, funct7 = _SHIFT_IMM_OPS[mnemonic]
+            return [encode_r(funct7, self.imm(ops[2], 5, signed=False), self.reg(ops[1]), funct3,
+                       self.reg(ops[0]), 0b0010011)]
+        if mnemonic in _LOADS:
+            imm, rs1 = self.memory(ops[1])
+            return [encode_i(imm, rs1, _LOADS[mnemonic], self.reg(ops[0]), 0b0000011)]
+        if mnemonic in _STORES:
+            imm, rs1 = self.memory(ops[1])
+            return [encode_s(imm, self.reg(ops[0]), rs1, _STORES[mnemonic])]
+        if mnemonic in _BRANCHES:
+            return [encode_b(self.target(ops[2], 13), self.reg(ops[1]), self.reg(ops[0]),
+                       _BRANCHES[mnemonic])]
+        if mnemonic in _BRANCHES_SWAP:
+            return [encode_b(self.target(ops[2], 13), self.reg(ops[0]), self.reg(ops[1]),
+                       _BRANCHES[_BRANCHES_SWAP[mnemonic]])]
+        if mnemonic in _BRANCHES_ZERO:
+            branch, swap = _BRANCHES_ZERO[mnemonic]
+            rs1, rs2 = (0, self.reg(ops[0])) if swap else (self.reg(ops[0]), 0)
+            return [encode_b(self.target(ops[1], 13), rs2, rs1, _BRANCHES[branch])]
+        if mnemonic in _CSR_OPS:
+            funct3 = _CSR_OPS[mnemonic]
+            src = self.imm(ops[2], 5, signed=False) if funct3 & 0b100 else self.reg(ops[2])
+            return [encode_i(self.csr(ops[1]), src, funct3, self.reg(ops[0]), 0b1110011)]
+
+        if mnemonic == 'lui':
+            return [encode_u(self.imm(ops[1], 20, signed=False), self.reg(ops[0]), 0b0110111)]
+        if mnemonic == 'auipc':
+            return [encode_u(self.imm(ops[1], 20, signed=False), self.reg(ops[0]), 0b0010111)]
+        if mnemonic == 'jal':
+            rd, target = (1, ops[0]) if len(ops) == 1 else (self.reg(ops[0]), ops[1])
+            return [encode_j(self.target(target, 21), rd)]
+        if mnemonic == 'jalr':
+            # jalr rs1, jalr rd, rs1[, imm] and jalr rd, imm(rs1)
+            if len(ops) == 1:
+                return [encode_i(0, self.reg(ops[0]), 0b000, 1, 0b1100111)]
+            if len(ops) == 2 and '(' in ops[1]:
+                imm, rs1 = self.memory(ops[1])
+                return [encode_i(imm, rs1, 0b000, self.reg(ops[0]), 0b1100111)]
+            imm = self.imm(ops[2], 12) if len(ops) == 3 else 0
+            return [encode_i(imm, self.reg(ops[1]), 0b000, self.reg(ops[0]), 0b1100111)]
+        if mnemonic == 'nop':
+            return [encode_i(0, 0, 0b000, 0, 0b0010011)]
+        if mnemonic == 'fence':
+            return [0x0ff0000f]
+        if mnemonic == 'ecall':
+            return [0x00000073]
+        if mnemonic == 'ebreak':
+            return [0x00100073]
+        if mnemonic == 'ret':
+            return [encode_i(0, 1, 0b000, 0, 0b1100111)]
+        if mnemonic == 'j':
+            return [encode_j(self.target(ops[0], 21), 0)]
+        if mnemonic == 'jr':
+            return [encode_i(0, self.reg(ops[0]), 0b000, 0, 0b1100111)]
+        if mnemonic == 'call':
+            return [encode_j(self.target(ops[0], 21), 1)]
+        if mnemonic == 'li':
+            return self.li(self.reg(ops[0]), self.value(ops[1]))
+        if mnemonic == 'la':
+            value = self.value(ops[1])
+            rd = self.reg(ops[0])
+            return [encode_u(_hi(value), rd, 0b0110111),
+                    encode_i(_lo(value), rd, 0b000, rd, 0b0010011)]
+        if mnemonic == 'mv':
+            return [encode_i(0, self.reg(ops[1]), 0b000, self.reg(ops[0]), 0b0010011)]
+        if mnemonic == 'not':
+            return [encode_i(-1, self.reg(ops[1]), 0b100, self.reg(ops[0]), 0b0010011)]
+        if mnemonic == 'neg':
+            return [encode_r(0b0100000, self.reg(ops[1]), 0, 0b000, self.reg(ops[0]), 0b0110011)]
+        if mnemonic == 'seqz':
+            return [encode_i(1, self.reg(ops[1]), 0b011, self.reg(ops[0]), 0b0010011)]
+        if mnemonic == 'snez':
+            return [encode_r(0, self.reg(ops[1]), 0, 0b011, self.reg(ops[0]), 0b0110011)]
+        # csrr
+        return [encode_i(self.csr(ops[1]), 0, 0b010, self.reg(ops[0]), 0b1110011)]
+
+    def encode_compressed(self, mnemonic, ops):
+        if mnemonic == 'c.addi4spn':
+            self.sp(self.reg(ops[1]))
+            imm = self.imm(ops[2], 10, signed=False, scale=4, nonzero=True)
+            return c_imm(imm, 12, '5:4|9:6|2|3') | (self.creg(ops[0]) << 2)
+        if mnemonic in ('c.lw', 'c.sw'):
+            imm, rs1 = self.memory(ops[1], 7, signed=False, scale=4)
+            if not 8 <= rs1 < 16:
+                raise AsmError(f"register x{rs1} is not one of x8..x15")
+            funct3 = 0b010 if mnemonic == 'c.lw' else 0b110
+            return (funct3 << 13) | c_imm(imm, 12, '5:3') | ((rs1 - 8) << 7) | \
+                c_imm(imm, 6, '2|6') | (self.creg(ops[0]) << 2)
+        if mnemonic == 'c.nop':
+            return 0b01
+        if mnemonic in ('c.addi', 'c.li'):
+            funct3 = 0b000 if mnemonic == 'c.addi' else 0b010
+            imm = self.imm(ops[1], 6)
+            return (funct3 << 13) | c_imm(imm, 12, '5') | (self.reg(ops[0]) << 7) | \
+                c_imm(imm, 6, '4:0') | 0b01
+        if mnemonic in ('c.jal', 'c.j'):
+            funct3 = 0b001 if mnemonic == 'c.jal' else 0b101
+            off = self.target(ops[0], 12)
+            return (funct3 << 13) | c_imm(off, 12, '11|4|9:8|10|6|7|3:1|5') | 0b01
+        if mnemonic == 'c.addi16sp':
+            self.sp(self.reg(ops[0]))
+            imm = self.imm(ops[1], 10, scale=16, nonzero=True)
+            return (0b011 << 13) | c_imm(imm, 12, '9') | (2 << 7) | \
+                c_imm(imm, 6, '4|6|8:7|5') | 0b01
+        if mnemonic == 'c.lui':
+            rd = self.reg(ops[0])
+            if rd in (0, 2):
+                raise AsmError("c.lui cannot write x0 or sp")
+            # The 20-bit upper immediate is the sign extension of 6 bits.
+            imm = self.imm(ops[1], 20, signed=False, nonzero=True)
+            if 32 <= imm < 0xfffe0:
+                raise AsmError(f"immediate {imm:#x} is not a sign-extended 6-bit value")
+            return (0b011 << 13) | c_imm(imm, 12, '5') | (rd << 7) | c_imm(imm, 6, '4:0') | 0b01
+        if mnemonic in _C_SHIFT_OPS or mnemonic == 'c.andi':
+            if mnemonic == 'c.andi':
+                funct2, imm = 0b10, self.imm(ops[1], 6)
+            else:
+                funct2, imm = _C_SHIFT_OPS[mnemonic], self.imm(ops[1], 5, signed=False)
+            return (0b100 << 13) | c_imm(imm, 12, '5') | (funct2 << 10) | \
+                (self.creg(ops[0]) << 7) | c_imm(imm, 6, '4:0') | 0b01
+        if mnemonic in _C_ALU_OPS:
+            return (0b100011 << 10) | (self.creg(ops[0]) << 7) | (_C_ALU_OPS[mnemonic] << 5) | \
+                (self.creg(ops[1]) << 2) | 0b01
+        if mnemonic in ('c.beqz', 'c.bnez'):
+            funct3 = 0b110 if mnemonic == 'c.beqz' else 0b111
+            off = self.target(ops[1], 9)
+            return (funct3 << 13) | c_imm(off, 12, '8|4:3') | (self.creg(ops[0]) << 7) | \
+                c_imm(off, 6, '7:6|2:1|5') | 0b01
+        if mnemonic == 'c.slli':
+            imm = self.imm(ops[1], 5, signed=False)
+            return c_imm(imm, 12, '5') | (self.reg(ops[0]) << 7) | c_imm(imm, 6, '4:0') | 0b10
+        if mnemonic == 'c.lwsp':
+            rd = self.reg(ops[0])
+            if rd == 0:
+                raise AsmError("c.lwsp cannot write x0")
+            imm, rs1 = self.memory(ops[1], 8, signed=False, scale=4)
+            self.sp(rs1)
+            return (0b010 << 13) | c_imm(imm, 12, '5') | (rd << 7) | \
+                c_imm(imm, 6, '4:2|7:6') | 0b10
+        if mnemonic == 'c.swsp':
+            imm, rs1 = self.memory(ops[1], 8, signed=False, scale=4)
+            self.sp(rs1)
+            return (0b110 << 13) | c_imm(imm, 12, '5:2|7:6') | (self.reg(ops[0]) << 2) | 0b10
+        if mnemonic == 'c.ebreak':
+            return 0x9002
+        # c.jr, c.jalr, c.mv, c.add
+        funct4 = 0b1000 if mnemonic in ('c.jr', 'c.mv') else 0b1001
+        rd = self.reg(ops[0])
+        rs2 = self.reg(ops[1]) if len(ops) == 2 else 0
+        if mnemonic in ('c.jr', 'c.jalr') and rd == 0:
+            raise AsmError(f"{mnemonic} cannot jump to x0")
+        if mnemonic in ('c.mv', 'c.add') and rs2 == 0:
+            raise AsmError(f"{mnemonic} cannot read x0")
+        return (funct4 << 12) | (rd << 7) | (rs2 << 2) | 0b10
+
+
+def _size(mnemonic, ops):
+    """Return the number of bytes of a statement without resolving labels."""
+    if mnemonic == '.word':
+        return 4 * len(ops)
+    if mnemonic == '.half':
+        return 2 * len(ops)
+    if mnemonic.startswith('c.'):
+        return 2
+    if mnemonic == 'la':
+        return 8
+    if mnemonic == 'li':
+        try:
+            value = (int(ops[1], 0) + (1 << 31)) % (1 << 32) - (1 << 31)
+        except (IndexError, ValueError):
+            raise AsmError("li needs an integer operand, use la for labels") from None
+        if -2048 <= value < 2048 or not _lo(value):
+            return 4
+        return 8
+    return 4
+
+
+def _parse(source):
+    """Split source into (line number, labels, mnemonic, operands) statements."""
+    statements = []
+    for number, line in enumerate(source.splitlines(), 1):
+        line = line.split('#', 1)[0]
+        labels = []
+        while True:
+            match = _LABEL.match(line)
+            if not match:
+                break
+            labels.append(match.group(1))
+            line = line[match.end():]
+        line = line.strip()
+        if not line:
+            statements.append((number, labels, None, []))
+            continue
+        mnemonic, *rest = line.split(None, 1)
+        ops = [op.strip() for op in rest[0].split(',')] if rest else []
+        statements.append((number, labels, mnemonic.lower(), ops))
+    return statements
+
+
+def assemble(source, base=const.MEM_INSTR_ZERO, symbols=None):
+    """Assemble source placed at address base and return an Image.
+
+    Symbols is an optional dictionary of predefined names and their values,
+    which can be used like labels.
+    """
+    statements = _parse(source)
+
+    labels = dict(symbols or {})
+    addr = base
+    for number, names, mnemonic, ops in statements:
+        for name in names:
+            if name in labels:
+                raise AsmError(f"line {number}: duplicate label '{name}'")
+            labels[name] = addr
+        if mnemonic is not None:
+            try:
+                addr += _size(mnemonic, ops)
+            except AsmError as e:
+                raise AsmError(f"line {number}: {e}") from None
+
+    assembler = _Assembler(labels, base)
+    text = bytearray()
+    for number, _, mnemonic, ops in statements:
+        if mnemonic is None:
+            continue
+        try:
+            if mnemonic == '.word':
+                new = [(assembler.value(op) & 0xffffffff).to_bytes(4, 'little') for op in ops]
+            elif mnemonic == '.half':
+                new = [(assembler.value(op) & 0xffff).to_bytes(2, 'little') for op in ops]
+            elif mnemonic.startswith('c.'):
+                new = [assembler.encode(mnemonic, ops).to_bytes(2, 'little')]
+            else:
+                new = [word.to_bytes(4, 'little') for word in assembler.encode(mnemonic, ops)]
+        except AsmError as e:
+            raise AsmError(f"line {number}: {e}") from None
+        for chunk in new:
+            text += chunk
+            assembler.addr += len(chunk)
+    if len(text) % 4:
+        text += (0b01).to_bytes(2, 'little') # c.nop
+    words = [int.from_bytes(text[i:i + 4], 'little') for i in range(0, len(text), 4)]
+    return Image(words, labels, base)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Assemble an RV32IMC program into .txt01 and .txt23 memory images.")
+    parser.add_argument('source', help="assembly source")
+    parser.add_argument('-o', '--output', required=True, metavar='PREFIX',
+                        help="write PREFIX.txt01 and PREFIX.txt23")
+    parser.add_argument('-b', '--base', type=lambda value: int(value, 0),
+                        default=const.MEM_INSTR_ZERO,
+                        help="address of the first instruction (default: %(default)#x)")
+    args = parser.parse_args()
+
+    with open(args.source) as f:
+        source = f.read()
+    try:
+        image = assemble(source, args.base)
+    except AsmError as e:
+        print(f"{args.source}: {e}", file=sys.stderr)
+        return 1
+    image.write_hex(args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
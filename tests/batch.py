@@ -0,0 +1,235 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Table-driven instruction tests of the cpu toplevel.
+
+A Case is a short program together with the architectural state before it and
+the state expected after it. run_cases() places as many cases as fit one after
+another into the instruction memory, each followed by nops, and executes them
+in a single simulation run. A case starts when pc reaches its first instruction
+and ends when pc reaches the nops following its last instruction. The nops give
+the last instruction time to write back its result, one cycle on the
+single-stage core and two on the pipelined one. After them, the runner checks
+the expected state and then sets registers and data memory of the next case by
+writing them directly, instead of resetting the core.
+
+Control flow which leaves a case, or a case which does not finish within
+max_cycles, fails the case. The runner then reloads the remaining cases and
+resets the core, so a failure does not affect the cases which follow it. The
+same happens when the cases do not fit into the instruction memory at once.
+"""
+
+from cocotb.triggers import ClockCycles, FallingEdge
+
+import asm
+import const
+import iss
+import utils
+
+
+# Instruction placed where control flow must not go in a case. Executing it
+# changes x31 which is reported as a failure of the case.
+POISON = 0x001f8f93 # addi x31, x31, 1
+
+# Instruction placed after each case, once for every cycle between execute and
+# writeback, and after the last case of a batch.
+_NOP = 0x00000013 # addi x0, x0, 0
+_HALT = 0x0000006f # jal x0, 0x0
+
+
+class Pc:
+    """Register value relative to the address of the first instruction of a
+    case, for values which depend on where the runner places the case."""
+
+    def __init__(self, offset):
+        self.offset = offset
+
+    def __repr__(self):
+        return f'Pc({self.offset:#x})'
+
+
+class Case:
+    """Program and its initial and expected architectural state.
+
+    The program is either a list of instruction words or assembly source. The
+    source is assembled at address 0, POISON can be used as a symbol in it, for
+    example in ".word POISON".
+
+    Registers are given as {index: value}, data memory as {offset: word} with
+    word-aligned offsets from MEM_DATA_ZERO. All registers and memory words
+    which are not listed start as zero. The expected state lists only values
+    which change. When cycles is given, the case must also take exactly this
+    number of clock cycles, or pipeline_cycles on the pipelined core if the
+    two differ.
+
+    Counters sets performance counters of u_control as {name: value}, e.g.
+    {'cycle': 0}. They are not checked after the case, counters which are not
+    listed keep counting from the previous cases.
+    """
+
+    def __init__(self, name, words, regs=None, mem=None, expect_regs=None,
+                 expect_mem=None, cycles=None, pipeline_cycles=None, counters=None):
+        self.name = name
+        if isinstance(words, str):
+            words = asm.assemble(words, base=0, symbols={'POISON': POISON}).words
+        self.words = words
+        self.regs = regs or {}
+        self.mem = mem or {}
+        self.expect_regs = expect_regs or {}
+        self.expect_mem = expect_mem or {}
+        self.cycles = cycles
+        self.pipeline_cycles = cycles if pipeline_cycles is None else pipeline_cycles
+        self.counters = counters or {}
+
+    def initial_regs(self, base):
+        regs = 32 * [0]
+        for index, value in self.regs.items():
+            regs[index] = _resolve(value, base)
+        return regs
+
+    def final_regs(self, base):
+        regs = self.initial_regs(base)
+        for index, value in self.expect_regs.items():
+            regs[index] = _resolve(value, base)
+        regs[0] = 0
+        return regs
+
+    def final_mem(self):
+        return {**self.mem, **self.expect_mem}
+
+
+def _resolve(value, base):
+    if isinstance(value, Pc):
+        value = base + value.offset
+    return value & 0xffffffff
+
+
+def _layout(cases, rows, nops):
+    """Return the cases which fit into rows of the instruction memory and their
+    addresses."""
+    bases = []
+    addr = const.MEM_INSTR_ZERO
+    for case in cases:
+        if bases and (addr - const.MEM_INSTR_ZERO) // 4 + len(case.words) + nops + 1 > rows:
+            break
+        bases.append(addr)
+        addr += 4 * (len(case.words) + nops)
+    return cases[:len(bases)], bases
+
+
+def _set_regs(dut, regs):
+    current = utils.read_regs(dut)
+    for index in range(1, 32):
+        if current[index] != regs[index]:
+            dut.u_registers.regs[index].value = regs[index]
+
+
+def _set_mem(dut, current, mem):
+    """Change data memory words from the current content to mem, both given as
+    {offset: word} of non-zero words."""
+    u_mem = dut.u_mem_control.u_mem
+    for offset in current.keys() | mem.keys():
+        word = mem.get(offset, 0)
+        if current.get(offset, 0) != word:
+            u_mem.mem_01[offset // 4].value = word & 0xffff
+            u_mem.mem_23[offset // 4].value = word >> 16
+
+
+def _check(dut, case, base, cycles):
+    """Return a list of differences between the expected and actual state."""
+    errors = []
+    expected_cycles = case.pipeline_cycles if utils.is_pipelined(dut) else case.cycles
+    if expected_cycles is not None and cycles != expected_cycles:
+        errors.append(f"took {cycles} cycles, expected {expected_cycles}")
+    regs = utils.read_regs(dut)
+    for index, (value, expected) in enumerate(zip(regs, case.final_regs(base))):
+        if value != expected:
+            errors.append(f"x{index} = {value:#010x}, expected {expected:#010x}")
+    data = utils.read_mem(dut.u_mem_control.u_mem)
+    expected_mem = case.final_mem()
+    for offset in range(0, len(data), 4):
+        value = int.from_bytes(data[offset:offset + 4], 'little')
+        expected = expected_mem.get(offset, 0)
+        if value != expected:
+            errors.append(f"mem[{const.MEM_DATA_ZERO + offset:#x}] = {value:#010x}, "
+                          f"expected {expected:#010x}")
+    return errors
+
+
+def _describe(case, base, errors):
+    lines = [f"{case.name}: " + errors[0]] + [f"    {error}" for error in errors[1:]]
+    text = b''.join(word.to_bytes(4, 'little') for word in case.words)
+    offset = 0
+    while offset < len(text):
+        word = int.from_bytes(text[offset:offset + 4], 'little')
+        lines.append(f"    {base + offset:#010x}: {iss.disassemble(word)}")
+        offset += 4 if word & 3 == 3 else 2
+    return '\n'.join(lines)
+
+
+async def run_cases(dut, cases, max_cycles=32):
+    """Run cases on the cpu toplevel and return a description of each failed
+    one. The clock must not be running yet."""
+    rows = len(dut.u_mem_instr.u_mem.mem_01)
+    control = dut.u_control
+    st_exec = control.ST_EXEC.value
+    nops = 2 if utils.is_pipelined(dut) else 1
+    failures = []
+    pending = list(cases)
+    await utils.init_dut(dut)
+
+    while pending:
+        batch, bases = _layout(pending, rows, nops)
+        if not batch:
+            raise ValueError(f"case {pending[0].name} does not fit into the memory")
+        text = [word for case in batch for word in case.words + nops * [_NOP]] + [_HALT]
+        await utils.load_image(dut, b''.join(word.to_bytes(4, 'little') for word in text))
+        while control.state.value != st_exec:
+            await FallingEdge(dut.clk_i)
+
+        mem = {}
+        done = len(batch)
+        for i, (case, base) in enumerate(zip(batch, bases)):
+            # The first instruction of the case is in its first cycle and
+            # reads the state set here.
+            _set_regs(dut, case.initial_regs(base))
+            for name, value in case.counters.items():
+                getattr(control, name).value = value
+            _set_mem(dut, mem, case.mem)
+            mem = {offset: word for offset, word in case.final_mem().items() if word}
+            end = base + 4 * len(case.words)
+
+            errors = []
+            cycles = 0
+            while True:
+                await FallingEdge(dut.clk_i)
+                cycles += 1
+                pc = dut.pc.value.integer
+                if pc == end and control.state.value == st_exec:
+                    # Step over the nops.
+                    await ClockCycles(dut.clk_i, nops, rising=False)
+                    errors = _check(dut, case, base, cycles)
+                    break
+                # The pipelined core waits for the target of a jump to end in
+                # ST_FETCH_STALL.
+                if not base <= pc <= end:
+                    errors = [f"jumped out of the case to {pc:#x}"]
+                    break
+                if cycles == max_cycles:
+                    errors = [f"did not finish in {max_cycles} cycles"]
+                    break
+
+            if errors:
+                failures.append(_describe(case, base, errors))
+                dut._log.error(failures[-1])
+                done = i + 1
+                break
+            dut._log.debug(f"{case.name} passed in {cycles} cycles")
+
+        pending = pending[done:]
+        if pending:
+            dut.rstn_i.value = 0
+            await FallingEdge(dut.clk_i)
+            dut.rstn_i.value = 1
+
+    return failures
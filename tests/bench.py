@@ -0,0 +1,237 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Cycle-accurate performance measurement of programs on the cpu toplevel.
+
+PerfMonitor follows the control FSM of the cpu toplevel on each falling clock
+edge and attributes every cycle to the instruction being executed. Results of
+benchmarks are kept in a JSON file of the form:
+
+    {"benchmarks": {"<name>": {"cycles": ..., "instret": ..., "cpi": ...,
+                               "compressed": ...,
+                               "read_stall_cycles": ...,
+                               "fetch_stall_cycles": ...,
+                               "muldiv_stall_cycles": ...,
+                               "classes": {"<class>": {"count": ...,
+                                                       "cycles": ...,
+                                                       "cpi": ...}}}}}
+
+compressed counts the retired RV32C instructions. I/O benchmarks additionally
+record rx_bytes_per_cycle and tx_bytes_per_cycle, the sustained throughput of
+the USB FIFO into and out of the cpu.
+
+Running this module compares such a file with a saved baseline:
+
+    $ python bench.py compare bench.json baseline.json
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+
+from cocotb.triggers import FallingEdge
+
+import const
+
+
+# Instruction classes by opcode. Loads and stores which access the USB FIFO
+# are counted separately as io_load and io_store, RV32M instructions as
+# muldiv.
+CLASSES = {
+    0b0110011: 'alu',
+    0b0010011: 'alu_imm',
+    0b0110111: 'upper',
+    0b0010111: 'upper',
+    0b1100011: 'branch',
+    0b1101111: 'jump',
+    0b1100111: 'jump',
+    0b0000011: 'load',
+    0b0100011: 'store',
+}
+
+
+class PerfMonitor:
+    """Cycle and instruction counters of a program running on the cpu toplevel.
+
+    Counting starts with the first cycle after reset and stops once the
+    program reaches its end, which is either the given end address or the
+    first retired instruction after which done() returns True. The instruction
+    at the end address itself is not counted.
+    """
+
+    def __init__(self, dut, end=None, done=None):
+        self.dut = dut
+        self.end = end
+        self.done = done
+        self.cycles = 0
+        self.instret = 0
+        self.compressed = 0
+        self.read_stall_cycles = 0
+        self.fetch_stall_cycles = 0
+        self.muldiv_stall_cycles = 0
+        self.class_counts = dict.fromkeys(sorted(set(CLASSES.values())) +
+                                          ['io_load', 'io_store', 'muldiv', 'other'], 0)
+        self.class_cycles = dict(self.class_counts)
+        # Bytes written by the program to the USB FIFO.
+        self.tx = bytearray()
+
+    async def run(self):
+        """Count cycles until the program reaches its end."""
+        dut = self.dut
+        control = dut.u_control
+        st_reset = control.ST_RESET.value
+        st_read_stall = control.ST_READ_STALL.value
+        st_fetch_stall = control.ST_FETCH_STALL.value
+        st_muldiv_stall = control.ST_MULDIV_STALL.value
+        class_counts = self.class_counts
+        class_cycles = self.class_cycles
+        kind = None
+        last_kind = None
+
+        while True:
+            await FallingEdge(dut.clk_i)
+            state = control.state.value
+            if state == st_reset:
+                continue
+            if state == st_fetch_stall:
+                # Bubble of the pipelined core after a mispredicted jump or
+                # branch, charged to the jump.
+                self.cycles += 1
+                self.fetch_stall_cycles += 1
+                class_cycles[last_kind] += 1
+                continue
+
+            if kind is None:
+                # First cycle of a new instruction.
+                if self.end is not None and dut.pc.value == self.end:
+                    return
+                ir = dut.instr.value.integer
+                kind = CLASSES.get(ir & 0x7f, 'other')
+                if kind in ('load', 'store') and \
+                   dut.alu_res.value.integer >= const.MEM_USB_IO_ZERO:
+                    kind = 'io_' + kind
+                elif kind == 'alu' and ir >> 25 == 0b0000001:
+                    kind = 'muldiv'
+                if dut.compressed.value:
+                    self.compressed += 1
+
+            self.cycles += 1
+            class_cycles[kind] += 1
+            if state == st_read_stall:
+                self.read_stall_cycles += 1
+            elif state == st_muldiv_stall:
+                self.muldiv_stall_cycles += 1
+            if dut.fifo_wr.value and dut.fifo_addr.value == 1:
+                self.tx.append(dut.fifo_wrdata.value.integer & 0xff)
+
+            if dut.pc_next_sel.value != 0: # PC_NEXT_SEL_STALL
+                self.instret += 1
+                class_counts[kind] += 1
+                last_kind = kind
+                kind = None
+                if self.done is not None and self.done():
+                    return
+
+    def results(self):
+        """Return the counters as a JSON-serializable dictionary."""
+        classes = {}
+        for kind, count in self.class_counts.items():
+            if count:
+                cycles = self.class_cycles[kind]
+                classes[kind] = {'count': count, 'cycles': cycles, 'cpi': cycles / count}
+        return {
+            'cycles': self.cycles,
+            'instret': self.instret,
+            'cpi': self.cycles / self.instret if self.instret else 0.0,
+            'compressed': self.compressed,
+            'read_stall_cycles': self.read_stall_cycles,
+            'fetch_stall_cycles': self.fetch_stall_cycles,
+            'muldiv_stall_cycles': self.muldiv_stall_cycles,
+            'classes': classes,
+        }
+
+
+def save(path, name, results):
+    """Add results of a benchmark to a JSON file.
+
+    The file is locked while it is updated so that benchmarks running in
+    parallel jobs can share it.
+    """
+    with open(path, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        content = f.read()
+        data = json.loads(content) if content else {'benchmarks': {}}
+        data['benchmarks'][name] = results
+        f.seek(0)
+        f.truncate()
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path):
+    """Load benchmark results from a JSON file."""
+    with open(path) as f:
+        return json.load(f)['benchmarks']
+
+
+def compare(current, baseline):
+    """Return rows (benchmark, metric, baseline, current, relative change) for
+    all metrics present in both results."""
+    rows = []
+    for name in sorted(current.keys() & baseline.keys()):
+        new, old = current[name], baseline[name]
+        metrics = [(key, old[key], new[key])
+                   for key in ('cycles', 'instret', 'cpi', 'read_stall_cycles')]
+        # Throughput of the USB FIFO is recorded only by I/O benchmarks,
+        # fetch and muldiv stalls and compressed are missing in results of
+        # older versions.
+        metrics += [(key, old[key], new[key])
+                    for key in ('compressed', 'fetch_stall_cycles', 'muldiv_stall_cycles',
+                                'rx_bytes_per_cycle', 'tx_bytes_per_cycle')
+                    if key in old and key in new]
+        for kind in sorted(new['classes'].keys() & old['classes'].keys()):
+            metrics.append((f'cpi.{kind}', old['classes'][kind]['cpi'],
+                            new['classes'][kind]['cpi']))
+        for metric, old_value, new_value in metrics:
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            rows.append((name, metric, old_value, new_value, change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compare_parser = subparsers.add_parser(
+        'compare', help="compare results with a baseline")
+    compare_parser.add_argument('current', help="current results")
+    compare_parser.add_argument('baseline', help="baseline results")
+    compare_parser.add_argument(
+        '-t', '--threshold', type=float, default=0.0,
+        help="fail if cycles of a benchmark grow by more than this percentage "
+             "(default: %(default)s)")
+    args = parser.parse_args()
+
+    current = load(args.current)
+    baseline = load(args.baseline)
+    regressed = []
+    print(f"{'BENCHMARK':12} {'METRIC':20} {'BASELINE':>12} {'CURRENT':>12} {'CHANGE':>8}")
+    for name, metric, old_value, new_value, change in compare(current, baseline):
+        fmt = '12.3f' if isinstance(new_value, float) else '12d'
+        print(f"{name:12} {metric:20} {old_value:{fmt}} {new_value:{fmt}} {100 * change:+7.2f}%")
+        if metric == 'cycles' and 100 * change > args.threshold:
+            regressed.append(name)
+    for name in sorted(current.keys() ^ baseline.keys()):
+        where = args.current if name in current else args.baseline
+        print(f"{name:12} only in {os.path.basename(where)}")
+
+    if regressed:
+        print(f"Cycles regressed by more than {args.threshold}%: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
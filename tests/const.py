@@ -0,0 +1,30 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Python mirror of the constants in const.v."""
+
+MEM_INSTR_ZERO = 0x10000
+MEM_DATA_ZERO = 0x20000
+MEM_USB_IO_ZERO = 0x30000
+
+MULDIV_OP_MUL = 0
+MULDIV_OP_MULH = 1
+MULDIV_OP_MULHSU = 2
+MULDIV_OP_MULHU = 3
+MULDIV_OP_DIV = 4
+MULDIV_OP_DIVU = 5
+MULDIV_OP_REM = 6
+MULDIV_OP_REMU = 7
+
+MEM_ACCESS_BYTE = 0
+MEM_ACCESS_HALFWORD = 1
+MEM_ACCESS_WORD = 2
+
+CSR_CYCLE = 0xc00
+CSR_INSTRET = 0xc02
+CSR_CYCLEH = 0xc80
+CSR_INSTRETH = 0xc82
+CSR_READSTALL = 0xcc0
+
+# Default number of 32-bit rows of u_mem_instr and u_mem_control in cpu.v.
+MEM_ROWS = 512
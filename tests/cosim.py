@@ -0,0 +1,235 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Lockstep co-simulation of the cpu toplevel against the ISS."""
+
+import collections
+
+from cocotb.triggers import FallingEdge, ReadOnly
+
+import const
+import elf
+import iss
+import utils
+
+
+class CosimError(AssertionError):
+    pass
+
+
+def _byte_mask(be):
+    """Return a mask of the bytes of a word enabled by wr_be_i of mem."""
+    return sum(0xff << 8 * i for i in range(4) if be >> i & 1)
+
+
+class MirrorFifo(iss.Fifo):
+    """ISS FIFO which returns values read by the RTL.
+
+    Ready flags of fifo_if depend on the timing of the USB side which the ISS
+    does not model, so loads from the FIFO registers take the value observed on
+    the RTL bus instead.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.value = 0
+        self.writes = []
+
+    def read(self, addr):
+        return self.value
+
+    def write(self, addr, value):
+        super().write(addr, value)
+        self.writes.append((addr, value & 0xff))
+
+
+class MirrorCounters(iss.Counters):
+    """ISS counters which return values read by the RTL, the ISS has no notion
+    of cycles."""
+
+    def __init__(self):
+        self.value = 0
+
+    def read(self, csr):
+        return self.value
+
+
+class Cosim:
+    """Monitor which steps the ISS on every instruction retired by the RTL.
+
+    The monitor samples the register, data memory and FIFO write ports of the
+    cpu toplevel on each falling clock edge. When an instruction retires, i.e.
+    pc_next_sel is not PC_NEXT_SEL_STALL in a non-reset state, which is also
+    when u_control counts it in instret, the ISS executes the same instruction
+    and all writes done by the RTL since the previous retirement are compared
+    with the ISS state. The first divergence raises CosimError describing the
+    last retired instructions.
+
+    The single-stage core writes the data memory and the FIFO in the cycle in
+    which an instruction retires and the register file one cycle after it, the
+    pipelined core does both one cycle later. The comparison is deferred until
+    the register write and takes register writes and the loaded value from that
+    cycle. check_regs() waits for the comparison of the last retired
+    instruction before it looks at the register file.
+    """
+
+    def __init__(self, dut, text=b'', data=b'', history=16):
+        self.dut = dut
+        self.fifo = MirrorFifo()
+        self.counters = MirrorCounters()
+        self.iss = iss.Iss(text, data, fifo=self.fifo, counters=self.counters)
+        self.history = collections.deque(maxlen=history)
+        self.cycles = 0
+        # Instructions retired by the RTL, the ISS lags behind by the ones
+        # waiting for their writeback.
+        self.rtl_retired = 0
+
+    @classmethod
+    def from_elf(cls, dut, path, **kwargs):
+        """Create a monitor whose ISS runs the given ELF file."""
+        return cls(dut, *elf.read_images(path), **kwargs)
+
+    @property
+    def retired(self):
+        return self.iss.retired
+
+    async def run(self):
+        """Monitor the DUT until the end of the test."""
+        dut = self.dut
+        control = dut.u_control
+        regs = dut.u_registers
+        mem = dut.u_mem_control.u_mem
+        st_reset = control.ST_RESET.value
+        reg_writes = []
+        mem_writes = []
+        fifo_writes = []
+        # Instructions retired in the last cycles which have not accessed the
+        # data memory yet, None for cycles without one.
+        mem_latency = 1 if utils.is_pipelined(dut) else 0
+        retiring = collections.deque(mem_latency * [None])
+        # Instruction which accessed the data memory in the previous cycle,
+        # waiting for its writeback.
+        pending = None
+
+        while True:
+            await FallingEdge(dut.clk_i)
+            self.cycles += 1
+            if control.state.value == st_reset:
+                retiring = collections.deque(mem_latency * [None])
+                pending = None
+                self.rtl_retired = self.retired
+                continue
+
+            if regs.wr_en_i.value:
+                rd = regs.rd_idx_i.value.integer
+                if rd != 0:
+                    reg_writes.append((rd, regs.rd_data_i.value.integer))
+            if pending is not None:
+                self._retire(*pending, dut.bus_data.value.integer, reg_writes)
+                reg_writes.clear()
+                pending = None
+            if mem.wr_en_i.value:
+                # Keep only the bytes which are written.
+                mask = _byte_mask(mem.wr_be_i.value.integer)
+                mem_writes.append((mem.addr_w_i.value.integer,
+                                   mem.data_w_i.value.integer & mask, mask))
+            if dut.fifo_wr.value:
+                fifo_writes.append((dut.fifo_addr.value.integer,
+                                    dut.fifo_wrdata.value.integer))
+
+            if dut.pc_next_sel.value == 0: # PC_NEXT_SEL_STALL
+                retiring.append(None)
+            else:
+                retiring.append((self.cycles, dut.pc.value.integer, dut.pc_data.value.integer,
+                                 dut.csr_data.value.integer, dut.pc_next.value.integer))
+                self.rtl_retired += 1
+            retired = retiring.popleft()
+            if retired is None:
+                continue
+
+            pending = (*retired, list(mem_writes), list(fifo_writes))
+            mem_writes.clear()
+            fifo_writes.clear()
+
+    def _retire(self, cycle, pc, word, csr_data, next_pc, mem_writes, fifo_writes,
+                bus_data, reg_writes):
+        model = self.iss
+        self.history.append((cycle, pc, word, list(reg_writes), mem_writes, fifo_writes))
+
+        if pc != model.pc:
+            self._fail(f"pc {pc:#x} does not match the ISS pc {model.pc:#x}")
+        expected = model.fetch(pc)
+        if word & 3 != 3:
+            # Only the low halfword belongs to a compressed instruction.
+            word &= 0xffff
+            expected &= 0xffff
+            instr = iss.expand(word)
+        else:
+            instr = word
+        if word != expected:
+            self._fail(f"fetched {word:#010x}, expected {expected:#010x}")
+
+        is_store = instr & 0x7f == 0b0100011
+        regs = model.regs[:32]
+        data = bytes(model.data) if is_store else None
+        self.fifo.value = bus_data
+        if instr & 0x7f == 0b1110011:
+            self.counters.value = csr_data
+        self.fifo.writes.clear()
+        try:
+            model.step()
+        except iss.IssError as e:
+            self._fail(f"ISS error: {e}")
+
+        if next_pc != model.pc:
+            self._fail(f"next pc {next_pc:#x} does not match the ISS pc {model.pc:#x}")
+
+        written = {rd for rd, _ in reg_writes}
+        for rd, value in reg_writes:
+            if value != model.regs[rd]:
+                self._fail(f"x{rd} written with {value:#x}, ISS has {model.regs[rd]:#x}")
+        for rd in range(1, 32):
+            if model.regs[rd] != regs[rd] and rd not in written:
+                self._fail(f"x{rd} not written, ISS has {model.regs[rd]:#x}")
+
+        for addr, value, mask in mem_writes:
+            expected = int.from_bytes(model.data[addr:addr + 4], 'little') & mask
+            if value != expected:
+                self._fail(f"data memory {const.MEM_DATA_ZERO + addr:#x} written with "
+                           f"{value:#010x}, ISS has {expected:#010x}")
+        if is_store and not mem_writes and data != model.data:
+            self._fail("data memory not written")
+
+        if fifo_writes != self.fifo.writes:
+            self._fail(f"FIFO writes {fifo_writes} do not match the ISS {self.fifo.writes}")
+
+    async def check_regs(self):
+        """Compare the whole register file with the ISS.
+
+        Instructions which already retired on the RTL are compared first, the
+        register file then includes the write presented on its port.
+        """
+        dut = self.dut
+        await ReadOnly()
+        retired = self.rtl_retired
+        while self.retired < retired:
+            await FallingEdge(dut.clk_i)
+            await ReadOnly()
+        regs = utils.read_regs(dut)
+        if dut.u_registers.wr_en_i.value:
+            regs[dut.u_registers.rd_idx_i.value.integer] = \
+                dut.u_registers.rd_data_i.value.integer
+        for rd in range(1, 32):
+            if regs[rd] != self.iss.regs[rd]:
+                self._fail(f"x{rd} is {regs[rd]:#x}, ISS has {self.iss.regs[rd]:#x}")
+
+    def _fail(self, message):
+        lines = [f"divergence after {self.retired} retired instructions: {message}"]
+        for cycle, pc, word, reg_writes, mem_writes, fifo_writes in self.history:
+            effects = [f'x{rd}={value:#x}' for rd, value in reg_writes]
+            effects += [f'[{const.MEM_DATA_ZERO + addr:#x}]={value:#010x}'
+                        for addr, value, _ in mem_writes]
+            effects += [f'fifo[{addr}]={value:#04x}' for addr, value in fifo_writes]
+            lines.append(f"  cycle {cycle:8d}  {pc:#07x}: {word:08x}  "
+                         f"{iss.disassemble(word):<28} {' '.join(effects)}")
+        raise CosimError('\n'.join(lines))
@@ -1,1202 +1,753 @@
 # Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
 # SPDX-License-Identifier: MIT
 
+import os
+
 import cocotb
-from cocotb.triggers import ClockCycles, FallingEdge
+from cocotb.triggers import ClockCycles
 
+import asm
+import batch
+import cosim
 import utils
 
 
-async def init_dut(dut):
-    await utils.init_dut(dut)
-
-    for i in range(8):
-        dut.u_mem_instr.u_mem.mem_01[i].value = 0
-        dut.u_mem_instr.u_mem.mem_23[i].value = 0
-
-
-async def init_instr(dut, offset, instr):
-    dut.u_mem_instr.u_mem.mem_01[offset / 4].value = (instr >> 0) & 0xffff
-    dut.u_mem_instr.u_mem.mem_23[offset / 4].value = (instr >> 16) & 0xffff
-
-
-@cocotb.test()
-async def test_lui(dut):
-    """Check LUI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0xabcde0b7) # lui x1, 0xabcde
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0xabcde000]
-
-
-@cocotb.test()
-async def test_luilui(dut):
-    """Check LUI, followed by another LUI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0xabcde0b7) # lui x1, 0xabcde
-    await init_instr(dut, 4, 0xedcba0b7) # lui x1, 0xedcba
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0xabcde000]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10008
-    assert dut.pc_next.value == 0x1000c
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0xedcba000]
-
-
-@cocotb.test()
-async def test_auipc(dut):
-    """Check AUIPC."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0xabcde097) # auipc x1, 0xabcde
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0xabcee000]
-
-
-@cocotb.test()
-async def test_jal(dut):
-    """Check JAL."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x010000ef) # jal x1, 0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10010
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10010
-    assert dut.pc_next.value == 0x10014
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x10004]
-
-
-@cocotb.test()
-async def test_jalr(dut):
-    """Check JALR."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x010100e7) # jalr x1, x2, 0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[2].value = 0x10010
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10020
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x10010, 0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10020
-    assert dut.pc_next.value == 0x10024
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x10010, 0x10004]
-
-
-@cocotb.test()
-async def test_beq(dut):
-    """Check BEQ."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x00208863) # beq x1, x2, 0x10
-    await init_instr(dut, 4, 0x00418863) # beq x3, x4, 0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x10
-    dut.u_registers.regs[2].value = 0x11
-    dut.u_registers.regs[3].value = 0x20
-    dut.u_registers.regs[4].value = 0x20
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0x20, 0x11, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10014
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0x20, 0x11, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10014
-    assert dut.pc_next.value == 0x10018
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0x20, 0x11, 0x10]
-
-
-@cocotb.test()
-async def test_beq_neg(dut):
-    """Check BEQ with negative offset (sign extension)."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0xfe2088e3) # beq x1, x2, -0x10
-    await init_instr(dut, 4, 0xfe4188e3) # beq x3, x4, -0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x10
-    dut.u_registers.regs[2].value = 0x11
-    dut.u_registers.regs[3].value = 0x20
-    dut.u_registers.regs[4].value = 0x20
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0x20, 0x11, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0xfff4
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0x20, 0x11, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0xfff4
-    assert dut.pc_next.value == 0xfff8
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0x20, 0x11, 0x10]
-
-
-@cocotb.test()
-async def test_bne(dut):
-    """Check BNE."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x00209863) # bne x1, x2, 0x10
-    await init_instr(dut, 4, 0x00419863) # bne x3, x4, 0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x10
-    dut.u_registers.regs[2].value = 0x10
-    dut.u_registers.regs[3].value = 0x20
-    dut.u_registers.regs[4].value = 0x21
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x21, 0x20, 0x10, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10014
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x21, 0x20, 0x10, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10014
-    assert dut.pc_next.value == 0x10018
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x21, 0x20, 0x10, 0x10]
-
-
-@cocotb.test()
-async def test_blt(dut):
-    """Check BLT."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0020c863) # blt x1, x2, 0x10
-    await init_instr(dut, 4, 0x0041c863) # blt x3, x4, 0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x10
-    dut.u_registers.regs[2].value = 0x10
-    dut.u_registers.regs[3].value = 0xffffffff
-    dut.u_registers.regs[4].value = 0x20
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0xffffffff, 0x10, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10014
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0xffffffff, 0x10, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10014
-    assert dut.pc_next.value == 0x10018
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0xffffffff, 0x10, 0x10]
-
-
-@cocotb.test()
-async def test_bge(dut):
-    """Check BGE."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0020d863) # bge x1, x2, 0x10
-    await init_instr(dut, 4, 0x0041d863) # bge x3, x4, 0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x10
-    dut.u_registers.regs[2].value = 0x11
-    dut.u_registers.regs[3].value = 0x20
-    dut.u_registers.regs[4].value = 0xffffffff
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0xffffffff, 0x20, 0x11, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10014
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0xffffffff, 0x20, 0x11, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10014
-    assert dut.pc_next.value == 0x10018
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0xffffffff, 0x20, 0x11, 0x10]
-
-
-@cocotb.test()
-async def test_bltu(dut):
-    """Check BLTU."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0020e863) # bltu x1, x2, 0x10
-    await init_instr(dut, 4, 0x0041e863) # bltu x3, x4, 0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x10
-    dut.u_registers.regs[2].value = 0x10
-    dut.u_registers.regs[3].value = 0x20
-    dut.u_registers.regs[4].value = 0xffffffff
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0xffffffff, 0x20, 0x10, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10014
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0xffffffff, 0x20, 0x10, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10014
-    assert dut.pc_next.value == 0x10018
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0xffffffff, 0x20, 0x10, 0x10]
-
-
-@cocotb.test()
-async def test_bgeu(dut):
-    """Check BGEU."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0020f863) # bgeu x1, x2, 0x10
-    await init_instr(dut, 4, 0x0041f863) # bgeu x3, x4, 0x10
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x10
-    dut.u_registers.regs[2].value = 0x11
-    dut.u_registers.regs[3].value = 0xffffffff
-    dut.u_registers.regs[4].value = 0x20
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0xffffffff, 0x11, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10014
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0xffffffff, 0x11, 0x10]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10014
-    assert dut.pc_next.value == 0x10018
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 27 * [0] + [0x20, 0xffffffff, 0x11, 0x10]
-
-
-@cocotb.test()
-async def test_lb(dut):
-    """Check LB."""
-    await utils.init_dut(dut)
-    await init_instr(dut, 0, 0x00710083) # lb x1, x2, 0x7
-
-    dut.u_mem_control.u_mem.mem_01[0].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[0].value = 0xdead
-    dut.u_mem_control.u_mem.mem_01[1].value = 0xef01
-    dut.u_mem_control.u_mem.mem_23[1].value = 0xabcd
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-    dut.u_registers.regs[2].value = 0x20000
-
-    await FallingEdge(dut.clk_i)
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0]
-
-    retries = 5
-    while dut.pc.value == 0x10000 and retries > 0:
-        retries -= 1
-        await FallingEdge(dut.clk_i)
-
-    assert dut.pc.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0xffffffab]
-
-
-@cocotb.test()
-async def test_lh(dut):
-    """Check LH."""
-    await utils.init_dut(dut)
-    await init_instr(dut, 0, 0x00611083) # lh x1, x2, 0x6
-
-    dut.u_mem_control.u_mem.mem_01[0].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[0].value = 0xdead
-    dut.u_mem_control.u_mem.mem_01[1].value = 0xef01
-    dut.u_mem_control.u_mem.mem_23[1].value = 0xabcd
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-    dut.u_registers.regs[2].value = 0x20000
-
-    await FallingEdge(dut.clk_i)
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0]
-
-    retries = 5
-    while dut.pc.value == 0x10000 and retries > 0:
-        retries -= 1
-        await FallingEdge(dut.clk_i)
-
-    assert dut.pc.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0xffffabcd]
-
-
-@cocotb.test()
-async def test_lw(dut):
-    """Check LW."""
-    await utils.init_dut(dut)
-    await init_instr(dut, 0, 0x00412083) # lw x1, x2, 0x4
-
-    dut.u_mem_control.u_mem.mem_01[0].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[0].value = 0xdead
-    dut.u_mem_control.u_mem.mem_01[1].value = 0xef01
-    dut.u_mem_control.u_mem.mem_23[1].value = 0xabcd
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-    dut.u_registers.regs[2].value = 0x20000
-
-    await FallingEdge(dut.clk_i)
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0]
-
-    retries = 5
-    while dut.pc.value == 0x10000 and retries > 0:
-        retries -= 1
-        await FallingEdge(dut.clk_i)
-
-    assert dut.pc.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0xabcdef01]
-
-
-@cocotb.test()
-async def test_lbu(dut):
-    """Check LBU."""
-    await utils.init_dut(dut)
-    await init_instr(dut, 0, 0x00714083) # lbu x1, x2, 0x7
-
-    dut.u_mem_control.u_mem.mem_01[0].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[0].value = 0xdead
-    dut.u_mem_control.u_mem.mem_01[1].value = 0xef01
-    dut.u_mem_control.u_mem.mem_23[1].value = 0xabcd
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-    dut.u_registers.regs[2].value = 0x20000
-
-    await FallingEdge(dut.clk_i)
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0]
-
-    retries = 5
-    while dut.pc.value == 0x10000 and retries > 0:
-        retries -= 1
-        await FallingEdge(dut.clk_i)
-
-    assert dut.pc.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0x000000ab]
-
-
-@cocotb.test()
-async def test_lhu(dut):
-    """Check LHU."""
-    await utils.init_dut(dut)
-    await init_instr(dut, 0, 0x00615083) # lhu x1, x2, 0x6
-
-    dut.u_mem_control.u_mem.mem_01[0].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[0].value = 0xdead
-    dut.u_mem_control.u_mem.mem_01[1].value = 0xef01
-    dut.u_mem_control.u_mem.mem_23[1].value = 0xabcd
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-    dut.u_registers.regs[2].value = 0x20000
-
-    await FallingEdge(dut.clk_i)
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0]
-
-    retries = 5
-    while dut.pc.value == 0x10000 and retries > 0:
-        retries -= 1
-        await FallingEdge(dut.clk_i)
+HELLO_ELF = os.path.join(os.path.dirname(__file__), '../../examples/hello/hello')
 
-    assert dut.pc.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x20000, 0x0000abcd]
+POISON = batch.POISON
 
 
-@cocotb.test()
-async def test_sb(dut):
-    """Check SB."""
-    await utils.init_dut(dut)
-    await init_instr(dut, 0, 0x002083a3) # sb x2, 0x7(x1)
-
-    dut.u_mem_control.u_mem.mem_01[0].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[0].value = 0xdead
-    dut.u_mem_control.u_mem.mem_01[1].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[1].value = 0xdead
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-    dut.u_registers.regs[1].value = 0x20000
-    dut.u_registers.regs[2].value = 0xabcdef01
-
-    await FallingEdge(dut.clk_i)
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xabcdef01, 0x20000]
-
-    retries = 5
-    while dut.pc.value == 0x10000 and retries > 0:
-        retries -= 1
-        await FallingEdge(dut.clk_i)
-
-    assert dut.pc.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xabcdef01, 0x20000]
-
-    print(dut.u_mem_control.u_mem.mem_01[1].value)
-    print(dut.u_mem_control.u_mem.mem_23[1].value)
-    assert dut.u_mem_control.u_mem.mem_01[1].value == 0xbeef
-    assert dut.u_mem_control.u_mem.mem_23[1].value == 0x01ad
-
-
-@cocotb.test()
-async def test_sh(dut):
-    """Check SH."""
-    await utils.init_dut(dut)
-    await init_instr(dut, 0, 0x00209323) # sh x2, 0x6(x1)
-
-    dut.u_mem_control.u_mem.mem_01[0].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[0].value = 0xdead
-    dut.u_mem_control.u_mem.mem_01[1].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[1].value = 0xdead
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-    dut.u_registers.regs[1].value = 0x20000
-    dut.u_registers.regs[2].value = 0xabcdef01
-
-    await FallingEdge(dut.clk_i)
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xabcdef01, 0x20000]
-
-    retries = 5
-    while dut.pc.value == 0x10000 and retries > 0:
-        retries -= 1
-        await FallingEdge(dut.clk_i)
-
-    assert dut.pc.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xabcdef01, 0x20000]
-
-    assert dut.u_mem_control.u_mem.mem_01[1].value == 0xbeef
-    assert dut.u_mem_control.u_mem.mem_23[1].value == 0xef01
-
-
-@cocotb.test()
-async def test_sw(dut):
-    """Check SW."""
+async def init_dut(dut):
     await utils.init_dut(dut)
-    await init_instr(dut, 0, 0x0020a223) # sw x2, 0x4(x1)
-
-    dut.u_mem_control.u_mem.mem_01[0].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[0].value = 0xdead
-    dut.u_mem_control.u_mem.mem_01[1].value = 0xbeef
-    dut.u_mem_control.u_mem.mem_23[1].value = 0xdead
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-    dut.u_registers.regs[1].value = 0x20000
-    dut.u_registers.regs[2].value = 0xabcdef01
-
-    await FallingEdge(dut.clk_i)
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xabcdef01, 0x20000]
-
-    retries = 5
-    while dut.pc.value == 0x10000 and retries > 0:
-        retries -= 1
-        await FallingEdge(dut.clk_i)
-
-    assert dut.pc.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xabcdef01, 0x20000]
-
-    assert dut.u_mem_control.u_mem.mem_01[1].value == 0xef01
-    assert dut.u_mem_control.u_mem.mem_23[1].value == 0xabcd
-
-
-@cocotb.test()
-async def test_addi(dut):
-    """Check ADDI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x80008093) # addi x1, x1, -2048
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x400
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x400]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0xfffffc00]
-
-
-@cocotb.test()
-async def test_slti(dut):
-    """Check SLTI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x80002093) # slti x1, x0, -2048
-    await init_instr(dut, 4, 0x7ff02113) # slti x2, x0, 2047
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0xdeadbeef
-    dut.u_registers.regs[2].value = 0xdeadbeef
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + 2 * [0xdeadbeef]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xdeadbeef, 0]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10008
-    assert dut.pc_next.value == 0x1000c
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [1, 0]
-
-
-@cocotb.test()
-async def test_sltiu(dut):
-    """Check SLTIU."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x80003093) # sltiu x1, x0, -2048
-    await init_instr(dut, 4, 0x00003113) # sltiu x2, x0, 0
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0xdeadbeef
-    dut.u_registers.regs[2].value = 0xdeadbeef
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + 2 * [0xdeadbeef]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xdeadbeef, 1]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10008
-    assert dut.pc_next.value == 0x1000c
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0, 1]
-
-
-@cocotb.test()
-async def test_xori(dut):
-    """Check XORI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0xabc0c093) # xori x1, x1, -(0x1000-0xabc)
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x12345678
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x12345678]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0xedcbacc4]
-
-
-@cocotb.test()
-async def test_ori(dut):
-    """Check ORI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0xabc0e093) # ori x1, x1, -(0x1000-0xabc)
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x12345678
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x12345678]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0xfffffefc]
-
-
-@cocotb.test()
-async def test_andi(dut):
-    """Check ANDI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0xabc0f093) # andi x1, x1, -(0x1000-0xabc)
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x12345678
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x12345678]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x12345238]
-
-
-@cocotb.test()
-async def test_slli(dut):
-    """Check SLLI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x00409093) # slli x1, x1, 4
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x87654321
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x87654321]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x76543210]
-
-
+    await utils.load_image(dut)
+
+
+UPPER_JUMP_CASES = [
+    batch.Case('lui', 'lui x1, 0xabcde', expect_regs={1: 0xabcde000}, cycles=1),
+    batch.Case('lui_lui', '''
+        lui x1, 0xabcde
+        lui x1, 0xedcba
+    ''', expect_regs={1: 0xedcba000}, cycles=2),
+    batch.Case('lui_x0', 'lui x0, 0xabcde', cycles=1),
+    batch.Case('auipc', 'auipc x1, 0xabcde', expect_regs={1: batch.Pc(0xabcde000)}, cycles=1),
+    batch.Case('auipc_neg', 'auipc x1, 0xfffff', expect_regs={1: batch.Pc(-0x1000)}, cycles=1),
+    batch.Case('jal', '''
+        jal x1, end
+        .word POISON, POISON, POISON
+    end:
+    ''', expect_regs={1: batch.Pc(0x4)}, cycles=1),
+    batch.Case('jal_neg', '''
+        jal x0, target2
+    target1:
+        jal x0, end
+    target2:
+        jal x1, target1
+    end:
+    ''', expect_regs={1: batch.Pc(0xc)}, cycles=3),
+    batch.Case('jalr', '''
+        jalr x1, 16(x2)
+        .word POISON, POISON, POISON, POISON, POISON, POISON, POISON
+    ''', regs={2: batch.Pc(0x10)}, expect_regs={1: batch.Pc(0x4)}, cycles=1, pipeline_cycles=2),
+    batch.Case('jalr_lsb', '''
+        jalr x1, 3(x2)
+        .word POISON
+    ''', regs={2: batch.Pc(0x5)}, expect_regs={1: batch.Pc(0x4)}, cycles=1, pipeline_cycles=2),
+    batch.Case('jalr_rd_rs1', '''
+        jalr x2, 8(x2)
+        .word POISON
+    ''', regs={2: batch.Pc(0x0)}, expect_regs={2: batch.Pc(0x4)}, cycles=1, pipeline_cycles=2),
+    batch.Case('jalr_neg', '''
+        jal x0, target
+        jal x0, end
+    target:
+        jalr x1, -4(x2)
+    end:
+    ''', regs={2: batch.Pc(0x8)}, expect_regs={1: batch.Pc(0xc)}, cycles=3, pipeline_cycles=4),
+]
+
+
+BRANCH_CASES = [
+    batch.Case('beq', '''
+        beq x1, x2, bad
+        beq x3, x4, end
+        .word POISON, POISON
+    bad:
+        .word POISON
+    end:
+    ''', regs={1: 0x10, 2: 0x11, 3: 0x20, 4: 0x20}, cycles=2, pipeline_cycles=3),
+    batch.Case('bne', '''
+        bne x1, x2, bad
+        bne x3, x4, end
+        .word POISON, POISON
+    bad:
+        .word POISON
+    end:
+    ''', regs={1: 0x10, 2: 0x10, 3: 0x20, 4: 0x21}, cycles=2, pipeline_cycles=3),
+    batch.Case('blt', '''
+        blt x1, x2, bad
+        blt x3, x4, end
+        .word POISON, POISON
+    bad:
+        .word POISON
+    end:
+    ''', regs={1: 0x10, 2: 0x10, 3: 0xffffffff, 4: 0x20}, cycles=2, pipeline_cycles=3),
+    batch.Case('bge', '''
+        bge x1, x2, bad
+        bge x3, x4, end
+        .word POISON, POISON
+    bad:
+        .word POISON
+    end:
+    ''', regs={1: 0x10, 2: 0x11, 3: 0x20, 4: 0xffffffff}, cycles=2, pipeline_cycles=3),
+    batch.Case('bltu', '''
+        bltu x1, x2, bad
+        bltu x3, x4, end
+        .word POISON, POISON
+    bad:
+        .word POISON
+    end:
+    ''', regs={1: 0x10, 2: 0x10, 3: 0x20, 4: 0xffffffff}, cycles=2, pipeline_cycles=3),
+    batch.Case('bgeu', '''
+        bgeu x1, x2, bad
+        bgeu x3, x4, end
+        .word POISON, POISON
+    bad:
+        .word POISON
+    end:
+    ''', regs={1: 0x10, 2: 0x11, 3: 0xffffffff, 4: 0x20}, cycles=2, pipeline_cycles=3),
+    batch.Case('beq_neg', '''
+    target1:
+        jal x0, target3
+    target2:
+        jal x0, end
+        .word POISON, POISON
+    target3:
+        beq x1, x2, target1
+        beq x3, x4, target2
+    end:
+    ''', regs={1: 0x10, 2: 0x11, 3: 0x20, 4: 0x20}, cycles=4, pipeline_cycles=5),
+    batch.Case('bne_x0', 'bne x0, x0, 0x8', cycles=1),
+    batch.Case('bne_loop', '''
+    loop:
+        addi x1, x1, 1
+        bne x1, x2, loop
+    ''', regs={2: 3}, expect_regs={1: 3}, cycles=6, pipeline_cycles=7),
+    batch.Case('blt_negative', '''
+        blt x1, x2, end
+        .word POISON
+    end:
+    ''', regs={1: 0xfffffffe, 2: 0xffffffff}, cycles=1, pipeline_cycles=2),
+    batch.Case('blt_min_max', '''
+        blt x1, x2, end
+        .word POISON
+    end:
+    ''', regs={1: 0x80000000, 2: 0x7fffffff}, cycles=1, pipeline_cycles=2),
+    batch.Case('bge_min_max', 'bge x1, x2, 0x8', regs={1: 0x80000000, 2: 0x7fffffff}, cycles=1),
+    batch.Case('bge_equal', '''
+        bge x1, x2, end
+        .word POISON
+    end:
+    ''', regs={1: 0x80000000, 2: 0x80000000}, cycles=1, pipeline_cycles=2),
+    batch.Case('bltu_zero', '''
+        bltu x0, x1, end
+        .word POISON
+    end:
+    ''', regs={1: 1}, cycles=1, pipeline_cycles=2),
+    batch.Case('bltu_max_min', '''
+        bltu x1, x2, end
+        .word POISON
+    end:
+    ''', regs={1: 0x7fffffff, 2: 0x80000000}, cycles=1, pipeline_cycles=2),
+    batch.Case('bgeu_equal', '''
+        bgeu x1, x2, end
+        .word POISON
+    end:
+    ''', regs={1: 0xffffffff, 2: 0xffffffff}, cycles=1, pipeline_cycles=2),
+    batch.Case('bgeu_zero', 'bgeu x0, x1, 0x8', regs={1: 1}, cycles=1),
+]
+
+
+# Data memory of the load cases, the value of each byte is unique.
+LOAD_MEM = {0: 0xdeadbeef, 4: 0xabcdef01}
+
+LOAD_CASES = [
+    batch.Case('lb', 'lb x1, 7(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xffffffab}, cycles=1),
+    batch.Case('lb_0', 'lb x1, 4(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 1}, cycles=1),
+    batch.Case('lb_1', 'lb x1, 5(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xffffffef}, cycles=1),
+    batch.Case('lb_2', 'lb x1, 6(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xffffffcd}, cycles=1),
+    batch.Case('lh', 'lh x1, 6(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xffffabcd}, cycles=1),
+    batch.Case('lh_0', 'lh x1, 4(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xffffef01}, cycles=1),
+    batch.Case('lh_dead', 'lh x1, 2(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xffffdead}, cycles=1),
+    batch.Case('lw', 'lw x1, 4(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xabcdef01}, cycles=1),
+    batch.Case('lw_0', 'lw x1, 0(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xdeadbeef}, cycles=1),
+    batch.Case('lw_neg', 'lw x1, -4(x2)',
+               regs={2: 0x20008}, mem=LOAD_MEM, expect_regs={1: 0xabcdef01}, cycles=1),
+    batch.Case('lbu', 'lbu x1, 7(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xab}, cycles=1),
+    batch.Case('lbu_0', 'lbu x1, 4(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 1}, cycles=1),
+    batch.Case('lhu', 'lhu x1, 6(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xabcd}, cycles=1),
+    batch.Case('lhu_0', 'lhu x1, 4(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xef01}, cycles=1),
+    batch.Case('lw_rd_rs1', 'lw x2, 4(x2)',
+               regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={2: 0xabcdef01}, cycles=1),
+    batch.Case('lw_x0', 'lw x0, 4(x2)', regs={2: 0x20000}, mem=LOAD_MEM, cycles=1),
+    batch.Case('lb_positive', 'lb x1, 8(x2)',
+               regs={2: 0x20000}, mem={8: 0x7f}, expect_regs={1: 0x7f}, cycles=1),
+    batch.Case('lh_positive', 'lh x1, 8(x2)',
+               regs={2: 0x20000}, mem={8: 0x7fff}, expect_regs={1: 0x7fff}, cycles=1),
+    batch.Case('lw_lw', '''
+        lw x1, 0(x2)
+        lw x3, 4(x2)
+    ''', regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xdeadbeef, 3: 0xabcdef01},
+       cycles=2),
+    batch.Case('lw_use', '''
+        lw x1, 4(x2)
+        addi x3, x1, 1
+    ''', regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xabcdef01, 3: 0xabcdef02},
+       cycles=3),
+]
+
+
+STORE_MEM = {0: 0xdeadbeef, 4: 0xdeadbeef}
+
+STORE_CASES = [
+    batch.Case('sb', 'sb x2, 7(x1)',
+               regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0x01adbeef},
+       cycles=1),
+    batch.Case('sb_0', 'sb x2, 4(x1)',
+               regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0xdeadbe01},
+       cycles=1),
+    batch.Case('sb_1', 'sb x2, 5(x1)',
+               regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0xdead01ef},
+       cycles=1),
+    batch.Case('sb_2', 'sb x2, 6(x1)',
+               regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0xde01beef},
+       cycles=1),
+    batch.Case('sh', 'sh x2, 6(x1)',
+               regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0xef01beef},
+       cycles=1),
+    batch.Case('sh_0', 'sh x2, 4(x1)',
+               regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0xdeadef01},
+       cycles=1),
+    batch.Case('sw', 'sw x2, 4(x1)',
+               regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0xabcdef01},
+       cycles=1),
+    batch.Case('sw_neg', 'sw x2, -4(x1)',
+               regs={1: 0x20008, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0xabcdef01},
+       cycles=1),
+    batch.Case('sw_x0', 'sw x0, 4(x1)',
+               regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_mem={4: 0}, cycles=1),
+    batch.Case('sw_lw', '''
+        sw x2, 4(x1)
+        lw x3, 4(x1)
+    ''', regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_regs={3: 0xabcdef01},
+       expect_mem={4: 0xabcdef01}, cycles=2),
+    batch.Case('sb_lw', '''
+        sb x2, 5(x1)
+        lw x3, 4(x1)
+    ''', regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_regs={3: 0xdead01ef},
+       expect_mem={4: 0xdead01ef}, cycles=2),
+]
+
+
+ALU_IMM_CASES = [
+    batch.Case('addi', 'addi x1, x1, -2048',
+               regs={1: 0x400}, expect_regs={1: 0xfffffc00}, cycles=1),
+    batch.Case('addi_overflow', 'addi x1, x1, 1',
+               regs={1: 0x7fffffff}, expect_regs={1: 0x80000000}, cycles=1),
+    batch.Case('addi_wrap', 'addi x1, x1, 1', regs={1: 0xffffffff}, expect_regs={1: 0}, cycles=1),
+    batch.Case('addi_x0', 'addi x0, x1, 5', regs={1: 0x10}, cycles=1),
+    batch.Case('slti', '''
+        slti x1, x0, -2048
+        slti x2, x0, 2047
+    ''', regs={1: 0xdeadbeef, 2: 0xdeadbeef}, expect_regs={1: 0, 2: 1}, cycles=2),
+    batch.Case('slti_negative', 'slti x3, x1, -1',
+               regs={1: 0xfffffffe}, expect_regs={3: 1}, cycles=1),
+    batch.Case('sltiu', '''
+        sltiu x1, x0, -2048
+        sltiu x2, x0, 0
+    ''', regs={1: 0xdeadbeef, 2: 0xdeadbeef}, expect_regs={1: 1, 2: 0}, cycles=2),
+    batch.Case('sltiu_max', 'sltiu x3, x1, -1', regs={1: 0xfffffffe}, expect_regs={3: 1}, cycles=1),
+    batch.Case('xori', 'xori x1, x1, -1348',
+               regs={1: 0x12345678}, expect_regs={1: 0xedcbacc4}, cycles=1),
+    batch.Case('xori_not', 'xori x1, x1, -1',
+               regs={1: 0x12345678}, expect_regs={1: 0xedcba987}, cycles=1),
+    batch.Case('ori', 'ori x1, x1, -1348',
+               regs={1: 0x12345678}, expect_regs={1: 0xfffffefc}, cycles=1),
+    batch.Case('andi', 'andi x1, x1, -1348',
+               regs={1: 0x12345678}, expect_regs={1: 0x12345238}, cycles=1),
+    batch.Case('andi_positive', 'andi x1, x1, 2047',
+               regs={1: 0xffffffff}, expect_regs={1: 0x7ff}, cycles=1),
+    batch.Case('slli', 'slli x1, x1, 4',
+               regs={1: 0x87654321}, expect_regs={1: 0x76543210}, cycles=1),
+    batch.Case('slli_31', 'slli x1, x1, 31', regs={1: 3}, expect_regs={1: 0x80000000}, cycles=1),
+    batch.Case('slli_0', 'slli x3, x1, 0',
+               regs={1: 0x87654321}, expect_regs={3: 0x87654321}, cycles=1),
+    batch.Case('srli', 'srli x1, x1, 4',
+               regs={1: 0x87654321}, expect_regs={1: 0x08765432}, cycles=1),
+    batch.Case('srli_31', 'srli x1, x1, 31', regs={1: 0x87654321}, expect_regs={1: 1}, cycles=1),
+    batch.Case('srai', 'srai x1, x1, 4',
+               regs={1: 0x87654321}, expect_regs={1: 0xf8765432}, cycles=1),
+    batch.Case('srai_31', 'srai x1, x1, 31',
+               regs={1: 0x87654321}, expect_regs={1: 0xffffffff}, cycles=1),
+    batch.Case('srai_positive', 'srai x1, x1, 4',
+               regs={1: 0x7fffffff}, expect_regs={1: 0x07ffffff}, cycles=1),
+]
+
+
+ALU_CASES = [
+    batch.Case('add', 'add x1, x1, x2',
+               regs={1: 0x400, 2: 0x800}, expect_regs={1: 0xc00}, cycles=1),
+    batch.Case('add_wrap', 'add x3, x1, x2',
+               regs={1: 0xffffffff, 2: 2}, expect_regs={3: 1}, cycles=1),
+    batch.Case('add_x0', 'add x0, x1, x2', regs={1: 0x400, 2: 0x800}, cycles=1),
+    batch.Case('add_from_x0', 'add x3, x0, x0', regs={3: 5}, expect_regs={3: 0}, cycles=1),
+    batch.Case('sub', 'sub x1, x1, x2',
+               regs={1: 0x400, 2: 0x800}, expect_regs={1: 0xfffffc00}, cycles=1),
+    batch.Case('sub_same', 'sub x1, x1, x1', regs={1: 0x12345678}, expect_regs={1: 0}, cycles=1),
+    batch.Case('sll', 'sll x1, x1, x2',
+               regs={1: 0x87654321, 2: 4}, expect_regs={1: 0x76543210}, cycles=1),
+    batch.Case('sll_mask', 'sll x1, x1, x2',
+               regs={1: 0x87654321, 2: 0x24}, expect_regs={1: 0x76543210}, cycles=1),
+    batch.Case('slt', '''
+        slt x1, x0, x1
+        slt x2, x0, x2
+    ''', regs={1: 0xfffff800, 2: 0x7ff}, expect_regs={1: 0, 2: 1}, cycles=2),
+    batch.Case('slt_negative', 'slt x3, x1, x2',
+               regs={1: 0xfffffffe, 2: 0xffffffff}, expect_regs={3: 1}, cycles=1),
+    batch.Case('sltu', '''
+        sltu x1, x0, x1
+        sltu x2, x0, x2
+    ''', regs={1: 0xfffff800}, expect_regs={1: 1}, cycles=2),
+    batch.Case('xor', 'xor x1, x1, x2',
+               regs={1: 0x12345678, 2: 0xfffffabc}, expect_regs={1: 0xedcbacc4}, cycles=1),
+    batch.Case('srl', 'srl x1, x1, x2',
+               regs={1: 0x87654321, 2: 4}, expect_regs={1: 0x08765432}, cycles=1),
+    batch.Case('srl_mask', 'srl x1, x1, x2',
+               regs={1: 0x87654321, 2: 0xffffffff}, expect_regs={1: 1}, cycles=1),
+    batch.Case('sra', 'sra x1, x1, x2',
+               regs={1: 0x87654321, 2: 4}, expect_regs={1: 0xf8765432}, cycles=1),
+    batch.Case('sra_mask', 'sra x1, x1, x2',
+               regs={1: 0x87654321, 2: 0xffffffe4}, expect_regs={1: 0xf8765432}, cycles=1),
+    batch.Case('or', 'or x1, x1, x2',
+               regs={1: 0x12345678, 2: 0xfffffabc}, expect_regs={1: 0xfffffefc}, cycles=1),
+    batch.Case('and', 'and x1, x1, x2',
+               regs={1: 0x12345678, 2: 0xfffffabc}, expect_regs={1: 0x12345238}, cycles=1),
+]
+
+# RV32M instructions stall for 16 cycles of u_muldiv between the cycle in which
+# they start and the one in which they retire.
+MULDIV_CASES = [
+    batch.Case('mul', 'mul x3, x1, x2',
+               regs={1: 0x12345678, 2: 0x9abcdef0}, expect_regs={3: 0x242d2080}, cycles=18),
+    batch.Case('mul_negative', 'mul x3, x1, x2',
+               regs={1: 0xfffffffd, 2: 7}, expect_regs={3: 0xffffffeb}, cycles=18),
+    batch.Case('mulh', 'mulh x3, x1, x2',
+               regs={1: 0x80000000, 2: 0x80000000}, expect_regs={3: 0x40000000}, cycles=18),
+    batch.Case('mulh_negative', 'mulh x3, x1, x2',
+               regs={1: 0xffffffff, 2: 1}, expect_regs={3: 0xffffffff}, cycles=18),
+    batch.Case('mulhsu', 'mulhsu x3, x1, x2',
+               regs={1: 0xffffffff, 2: 0xffffffff}, expect_regs={3: 0xffffffff}, cycles=18),
+    batch.Case('mulhu', 'mulhu x3, x1, x2',
+               regs={1: 0xffffffff, 2: 0xffffffff}, expect_regs={3: 0xfffffffe}, cycles=18),
+    batch.Case('div', 'div x3, x1, x2',
+               regs={1: 0xffffff9c, 2: 7}, expect_regs={3: 0xfffffff2}, cycles=18),
+    batch.Case('div_zero', 'div x3, x1, x0', regs={1: 0xffffff9c}, expect_regs={3: 0xffffffff},
+               cycles=18),
+    batch.Case('div_overflow', 'div x3, x1, x2',
+               regs={1: 0x80000000, 2: 0xffffffff}, expect_regs={3: 0x80000000}, cycles=18),
+    batch.Case('divu', 'divu x3, x1, x2',
+               regs={1: 0xffffff9c, 2: 7}, expect_regs={3: 0x24924916}, cycles=18),
+    batch.Case('divu_zero', 'divu x3, x1, x0', regs={1: 5}, expect_regs={3: 0xffffffff},
+               cycles=18),
+    batch.Case('rem', 'rem x3, x1, x2',
+               regs={1: 0xffffff9c, 2: 7}, expect_regs={3: 0xfffffffe}, cycles=18),
+    batch.Case('rem_zero', 'rem x3, x1, x0', regs={1: 0xffffff9c}, expect_regs={3: 0xffffff9c},
+               cycles=18),
+    batch.Case('rem_overflow', 'rem x3, x1, x2',
+               regs={1: 0x80000000, 2: 0xffffffff}, expect_regs={3: 0}, cycles=18),
+    batch.Case('remu', 'remu x3, x1, x2',
+               regs={1: 0xffffff9c, 2: 7}, expect_regs={3: 2}, cycles=18),
+    batch.Case('mul_x0', 'mul x0, x1, x2', regs={1: 3, 2: 5}, cycles=18),
+    batch.Case('mul_rd_rs1', 'mul x1, x1, x1', regs={1: 0x10001}, expect_regs={1: 0x20001},
+               cycles=18),
+    batch.Case('mul_fwd', '''
+        addi x1, x0, 6
+        mul x2, x1, x1
+        addi x3, x2, 1
+    ''', expect_regs={1: 6, 2: 36, 3: 37}, cycles=20),
+    batch.Case('mul_mul', '''
+        mul x3, x1, x2
+        divu x4, x3, x2
+    ''', regs={1: 1000, 2: 3}, expect_regs={3: 3000, 4: 1000}, cycles=36),
+    batch.Case('load_use_mul', '''
+        lw x1, 4(x2)
+        mul x3, x1, x1
+    ''', regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xabcdef01, 3: 0xfcbcde01},
+       cycles=20),
+]
+
+# Instructions which depend on the result of the previous one. The pipelined
+# core forwards results of ALU instructions, waits a cycle for a loaded value
+# and a cycle for the target of a mispredicted branch or a JALR.
+HAZARD_CASES = [
+    batch.Case('fwd_rs1', '''
+        addi x1, x0, 5
+        add x2, x1, x0
+    ''', expect_regs={1: 5, 2: 5}, cycles=2),
+    batch.Case('fwd_rs2', '''
+        addi x1, x0, 3
+        sub x2, x0, x1
+    ''', expect_regs={1: 3, 2: 0xfffffffd}, cycles=2),
+    batch.Case('fwd_chain', '''
+        addi x1, x0, 1
+        addi x1, x1, 1
+        add x1, x1, x1
+    ''', expect_regs={1: 4}, cycles=3),
+    batch.Case('fwd_x0', '''
+        addi x0, x2, 5
+        add x1, x0, x0
+    ''', regs={1: 7, 2: 1}, expect_regs={1: 0}, cycles=2),
+    batch.Case('fwd_store_data', '''
+        addi x2, x0, 0x55
+        sw x2, 4(x1)
+    ''', regs={1: 0x20000}, mem=STORE_MEM, expect_regs={2: 0x55}, expect_mem={4: 0x55},
+       cycles=2),
+    batch.Case('fwd_store_addr', '''
+        addi x1, x1, 4
+        sw x2, 0(x1)
+    ''', regs={1: 0x20000, 2: 0xabcdef01}, mem=STORE_MEM, expect_regs={1: 0x20004},
+       expect_mem={4: 0xabcdef01}, cycles=2),
+    batch.Case('fwd_branch', '''
+        addi x1, x0, 1
+        bne x1, x0, end
+        .word POISON
+    end:
+    ''', expect_regs={1: 1}, cycles=2, pipeline_cycles=3),
+    batch.Case('fwd_branch_not_taken', '''
+        addi x1, x0, 1
+        beq x1, x0, end
+        addi x2, x0, 2
+    end:
+    ''', expect_regs={1: 1, 2: 2}, cycles=3),
+    batch.Case('fwd_jalr', '''
+        auipc x2, 0
+        jalr x1, 12(x2)
+        .word POISON
+    end:
+    ''', expect_regs={1: batch.Pc(0x8), 2: batch.Pc(0x0)}, cycles=2, pipeline_cycles=3),
+    batch.Case('jal_link_use', '''
+        jal x1, next
+    next:
+        addi x2, x1, 0
+    ''', expect_regs={1: batch.Pc(0x4), 2: batch.Pc(0x4)}, cycles=2),
+    batch.Case('load_use_rs2', '''
+        lw x1, 4(x2)
+        add x3, x0, x1
+    ''', regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xabcdef01, 3: 0xabcdef01},
+       cycles=3),
+    batch.Case('load_use_addr', '''
+        lw x1, 0(x2)
+        lw x3, 0(x1)
+    ''', regs={2: 0x20000}, mem={0: 0x20008, 8: 0x1234},
+       expect_regs={1: 0x20008, 3: 0x1234}, cycles=3),
+    batch.Case('load_use_store', '''
+        lw x3, 4(x1)
+        sw x3, 0(x1)
+    ''', regs={1: 0x20000}, mem=LOAD_MEM, expect_regs={3: 0xabcdef01},
+       expect_mem={0: 0xabcdef01}, cycles=3),
+    batch.Case('load_no_use', '''
+        lw x1, 4(x2)
+        addi x3, x0, 1
+        add x4, x1, x3
+    ''', regs={2: 0x20000}, mem=LOAD_MEM,
+       expect_regs={1: 0xabcdef01, 3: 1, 4: 0xabcdef02}, cycles=3),
+    batch.Case('load_x0_no_stall', '''
+        lw x0, 4(x2)
+        add x3, x0, x0
+    ''', regs={2: 0x20000, 3: 7}, mem=LOAD_MEM, expect_regs={3: 0}, cycles=2),
+]
+
+
+# Compressed instructions, alone and mixed with 32-bit instructions which then
+# start in the middle of a word of the instruction memory. Every case is a
+# whole number of words so that the runner does not pad it with a c.nop.
+RVC_CASES = [
+    batch.Case('c_addi', '''
+        c.addi x1, -3
+        c.addi x1, 5
+    ''', regs={1: 10}, expect_regs={1: 12}, cycles=2),
+    batch.Case('c_li', '''
+        c.li x1, -32
+        c.li x2, 31
+    ''', expect_regs={1: 0xffffffe0, 2: 31}, cycles=2),
+    batch.Case('c_lui', '''
+        c.lui x1, 0xfffe0
+        c.lui x3, 1
+    ''', expect_regs={1: 0xfffe0000, 3: 0x1000}, cycles=2),
+    batch.Case('c_addi16sp', '''
+        c.addi16sp sp, -512
+        c.addi16sp sp, 496
+    ''', regs={2: 0x1000}, expect_regs={2: 0xff0}, cycles=2),
+    batch.Case('c_addi4spn', '''
+        c.addi4spn x8, sp, 1020
+        c.addi4spn x15, sp, 4
+    ''', regs={2: 0x100}, expect_regs={8: 0x4fc, 15: 0x104}, cycles=2),
+    batch.Case('c_shift_andi', '''
+        c.srli x8, 4
+        c.srai x9, 31
+        c.slli x1, 31
+        c.andi x10, -16
+    ''', regs={1: 3, 8: 0x80000000, 9: 0x80000000, 10: 0x1234},
+       expect_regs={1: 0x80000000, 8: 0x08000000, 9: 0xffffffff, 10: 0x1230}, cycles=4),
+    batch.Case('c_alu', '''
+        c.sub x8, x9
+        c.xor x10, x9
+        c.or x11, x9
+        c.and x12, x9
+    ''', regs={8: 1, 9: 3, 10: 6, 11: 8, 12: 6},
+       expect_regs={8: 0xfffffffe, 10: 5, 11: 11, 12: 2}, cycles=4),
+    batch.Case('c_mv_add', '''
+        c.mv x1, x2
+        c.add x1, x1
+    ''', regs={2: 21}, expect_regs={1: 42}, cycles=2),
+    batch.Case('c_lw_sw', '''
+        c.lw x8, 4(x9)
+        c.sw x8, 0(x9)
+    ''', regs={9: 0x20000}, mem=LOAD_MEM, expect_regs={8: 0xabcdef01},
+       expect_mem={0: 0xabcdef01}, cycles=3),
+    batch.Case('c_lwsp_swsp', '''
+        c.lwsp x1, 4(sp)
+        c.swsp x3, 8(sp)
+    ''', regs={2: 0x20000, 3: 0x55}, mem=LOAD_MEM, expect_regs={1: 0xabcdef01},
+       expect_mem={8: 0x55}, cycles=2),
+    batch.Case('c_j', '''
+        c.j end
+        c.addi x31, 1
+        .word POISON
+    end:
+    ''', cycles=1),
+    batch.Case('c_jal', '''
+        c.jal end
+        c.addi x31, 1
+        .word POISON
+    end:
+    ''', expect_regs={1: batch.Pc(0x2)}, cycles=1),
+    batch.Case('c_beqz', '''
+        c.beqz x8, end
+        c.addi x31, 1
+        .word POISON
+    end:
+    ''', cycles=1, pipeline_cycles=2),
+    batch.Case('c_bnez_not_taken', '''
+        c.bnez x8, end
+        c.li x1, 1
+    end:
+    ''', expect_regs={1: 1}, cycles=2),
+    batch.Case('c_bnez_backward', '''
+        c.j start
+    back:
+        c.j end
+    start:
+        c.bnez x8, back
+        c.addi x31, 1
+    end:
+    ''', regs={8: 1}, cycles=3),
+    batch.Case('c_jr', '''
+        c.jr x2
+        c.addi x31, 1
+    ''', regs={2: batch.Pc(0x4)}, cycles=1, pipeline_cycles=2),
+    batch.Case('c_jalr', '''
+        auipc x2, 0
+        addi x2, x2, 12
+        c.jalr x2
+        c.addi x31, 1
+    ''', expect_regs={1: batch.Pc(0xa), 2: batch.Pc(0xc)}, cycles=3, pipeline_cycles=4),
+    batch.Case('c_illegal', '''
+        c.li x1, 1
+        .half 0x0000
+    ''', expect_regs={1: 1}, cycles=2),
+    batch.Case('unaligned', '''
+        c.li x1, 1
+        addi x2, x1, 2
+        lui x3, 0x12345
+        c.nop
+    ''', expect_regs={1: 1, 2: 3, 3: 0x12345000}, cycles=4),
+    batch.Case('unaligned_branch', '''
+        c.li x1, 1
+        bne x1, x0, end
+        .word POISON
+        c.addi x31, 1
+    end:
+    ''', expect_regs={1: 1}, cycles=2, pipeline_cycles=3),
+    batch.Case('unaligned_jal', '''
+        c.nop
+        jal x1, end
+        c.addi x31, 1
+    end:
+    ''', expect_regs={1: batch.Pc(0x6)}, cycles=2),
+    batch.Case('unaligned_jalr_target', '''
+        jalr x1, 6(x2)
+        c.addi x31, 1
+        c.li x3, 7
+    ''', regs={2: batch.Pc(0x0)}, expect_regs={1: batch.Pc(0x4), 3: 7}, cycles=2,
+       pipeline_cycles=3),
+    batch.Case('unaligned_load_use', '''
+        c.nop
+        lw x1, 4(x2)
+        c.addi x1, 1
+    ''', regs={2: 0x20000}, mem=LOAD_MEM, expect_regs={1: 0xabcdef02}, cycles=4),
+]
+
+
+CSR_CASES = [
+    batch.Case('csr_cycle', '''
+        csrrs x1, cycle, x0
+        csrrs x2, cycleh, x0
+        csrrw x8, cycle, x1
+        csrrs x3, cycle, x0
+    ''', counters={'cycle': 0}, expect_regs={1: 0, 2: 0, 8: 2, 3: 3}, cycles=4),
+    batch.Case('csr_cycleh', '''
+        csrrs x1, cycle, x0
+        csrrs x2, cycleh, x0
+    ''', counters={'cycle': 0xffffffff}, expect_regs={1: 0xffffffff, 2: 1}, cycles=2),
+    batch.Case('csr_instret', '''
+        nop
+        nop
+        csrrs x4, instret, x0
+        csrrs x5, instreth, x0
+        csrrsi x9, instret, 0
+    ''', counters={'instret': 0}, expect_regs={4: 2, 5: 0, 9: 4}, cycles=5),
+    batch.Case('csr_stall', '''
+        lw x10, 0(x20)
+        sw x10, 4(x20)
+        csrrs x6, readstall, x0
+    ''', regs={20: 0x20000}, mem={0: 0x12345678}, counters={'read_stall': 0},
+        expect_regs={10: 0x12345678, 6: 1}, expect_mem={4: 0x12345678}, cycles=4),
+]
+
+
+async def check_cases(dut, cases, **kwargs):
+    failures = await batch.run_cases(dut, cases, **kwargs)
+    assert not failures, \
+        f"{len(failures)} of {len(cases)} cases failed:\n" + '\n'.join(failures)
+
+
+@cocotb.test()
+async def test_upper_jump(dut):
+    """Check LUI, AUIPC, JAL and JALR."""
+    await check_cases(dut, UPPER_JUMP_CASES)
+
+
+@cocotb.test()
+async def test_branch(dut):
+    """Check conditional branches."""
+    await check_cases(dut, BRANCH_CASES)
+
+
+@cocotb.test()
+async def test_load(dut):
+    """Check loads."""
+    await check_cases(dut, LOAD_CASES)
+
+
+@cocotb.test()
+async def test_store(dut):
+    """Check stores."""
+    await check_cases(dut, STORE_CASES)
+
+
+@cocotb.test()
+async def test_alu_imm(dut):
+    """Check ALU instructions with an immediate operand."""
+    await check_cases(dut, ALU_IMM_CASES)
+
+
 @cocotb.test()
-async def test_srli(dut):
-    """Check SRLI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0040d093) # srli x1, x1, 4
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x87654321
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x87654321]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x08765432]
+async def test_alu(dut):
+    """Check ALU instructions with register operands."""
+    await check_cases(dut, ALU_CASES)
 
 
 @cocotb.test()
-async def test_srai(dut):
-    """Check SRAI."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x4040d093) # srai x1, x1, 4
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x87654321
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0x87654321]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 30 * [0] + [0xf8765432]
+async def test_muldiv(dut):
+    """Check multiplication and division instructions."""
+    await check_cases(dut, MULDIV_CASES, max_cycles=100)
 
 
 @cocotb.test()
-async def test_add(dut):
-    """Check ADD."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x002080b3) # add x1, x1, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x400
-    dut.u_registers.regs[2].value = 0x800
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x800, 0x400]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x800, 0x00000c00]
+async def test_hazard(dut):
+    """Check instructions which depend on the previous one."""
+    await check_cases(dut, HAZARD_CASES)
 
 
 @cocotb.test()
-async def test_sub(dut):
-    """Check SUB."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x402080b3) # sub x1, x1, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x400
-    dut.u_registers.regs[2].value = 0x800
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x800, 0x400]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0x800, 0xfffffc00]
+async def test_rvc(dut):
+    """Check compressed instructions."""
+    await check_cases(dut, RVC_CASES)
 
 
 @cocotb.test()
-async def test_sll(dut):
-    """Check SLL."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x002090b3) # sll x1, x1, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x87654321
-    dut.u_registers.regs[2].value = 4
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [4, 0x87654321]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [4, 0x76543210]
+async def test_csr(dut):
+    """Check reading the performance counters."""
+    await check_cases(dut, CSR_CASES)
 
 
 @cocotb.test()
-async def test_slt(dut):
-    """Check SLT."""
+async def test_cosim(dut):
+    """Check a loop of ALU, load/store and branch instructions against the ISS."""
+    text = asm.assemble('''
+        lui x1, 0x20
+        addi x2, x0, 10
+        addi x3, x0, 0
+    loop:
+        add x3, x3, x2
+        sw x3, 0(x1)
+        lw x4, 0(x1)
+        sb x2, 5(x1)
+        lbu x5, 5(x1)
+        lh x6, 4(x1)
+        addi x1, x1, 8
+        addi x2, x2, -1
+        bne x2, x0, loop
+        jal x7, end
+    end:
+        jal x0, end
+    ''').text
     await init_dut(dut)
-    await init_instr(dut, 0, 0x001020b3) # slt x1, x0, x1
-    await init_instr(dut, 4, 0x00202133) # slt x2, x0, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0xfffff800 # -2048
-    dut.u_registers.regs[2].value = 2047
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [2047, 0xfffff800]
+    await utils.load_image(dut, text)
 
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [2047, 0]
+    monitor = cosim.Cosim(dut, text)
+    cocotb.start_soon(monitor.run())
+    await ClockCycles(dut.clk_i, 300, rising=False)
 
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10008
-    assert dut.pc_next.value == 0x1000c
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [1, 0]
+    await monitor.check_regs()
+    assert monitor.retired > 10 * 9
+    assert monitor.iss.regs[3] == 55
+    assert monitor.iss.regs[7] == 0x10034
 
 
-@cocotb.test()
-async def test_sltu(dut):
-    """Check SLTU."""
+@cocotb.test(skip=not os.path.exists(HELLO_ELF))
+async def test_cosim_hello(dut):
+    """Run examples/hello in lockstep with the ISS."""
     await init_dut(dut)
-    await init_instr(dut, 0, 0x001030b3) # sltu x1, x0, x1
-    await init_instr(dut, 4, 0x00203133) # sltu x2, x0, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0xfffff800 # -2048
-    dut.u_registers.regs[2].value = 0
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0, 0xfffff800]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0, 1]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10008
-    assert dut.pc_next.value == 0x1000c
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0, 1]
-
-
-@cocotb.test()
-async def test_xor(dut):
-    """Check XOR."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0020c0b3) # xor x1, x1, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x12345678
-    dut.u_registers.regs[2].value = 0xfffffabc
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xfffffabc, 0x12345678]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xfffffabc, 0xedcbacc4]
-
-
-
-@cocotb.test()
-async def test_srl(dut):
-    """Check SRL."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0020d0b3) # srl x1, x1, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x87654321
-    dut.u_registers.regs[2].value = 4
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [4, 0x87654321]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [4, 0x08765432]
-
-
-@cocotb.test()
-async def test_sra(dut):
-    """Check SRA."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x4020d0b3) # srai x1, x1, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x87654321
-    dut.u_registers.regs[2].value = 4
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [4, 0x87654321]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [4, 0xf8765432]
-
-
-@cocotb.test()
-async def test_or(dut):
-    """Check OR."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0020e0b3) # or x1, x1, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
-
-    dut.u_registers.regs[1].value = 0x12345678
-    dut.u_registers.regs[2].value = 0xfffffabc
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xfffffabc, 0x12345678]
-
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xfffffabc, 0xfffffefc]
-
-
-@cocotb.test()
-async def test_and(dut):
-    """Check AND."""
-    await init_dut(dut)
-    await init_instr(dut, 0, 0x0020f0b3) # and x1, x1, x2
-
-    await ClockCycles(dut.clk_i, 2, rising=False)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10000
-    assert dut.u_control.state == dut.u_control.ST_RESET.value
-    assert dut.u_registers.regs.value == 31 * [0]
+    await utils.load_elf(dut, HELLO_ELF)
+    dut.in_ready_i.value = 1
 
-    dut.u_registers.regs[1].value = 0x12345678
-    dut.u_registers.regs[2].value = 0xfffffabc
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10000
-    assert dut.pc_next.value == 0x10004
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xfffffabc, 0x12345678]
+    monitor = cosim.Cosim.from_elf(dut, HELLO_ELF)
+    cocotb.start_soon(monitor.run())
+    await ClockCycles(dut.clk_i, 5000, rising=False)
 
-    await FallingEdge(dut.clk_i)
-    assert dut.pc.value == 0x10004
-    assert dut.pc_next.value == 0x10008
-    assert dut.u_control.state == dut.u_control.ST_EXEC.value
-    assert dut.u_registers.regs.value == 29 * [0] + [0xfffffabc, 0x12345238]
+    await monitor.check_regs()
+    assert monitor.fifo.tx.startswith(b'Hello world!\r\n')
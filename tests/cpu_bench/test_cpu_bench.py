@@ -0,0 +1,200 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+import os
+
+import cocotb
+
+import asm
+import bench
+import const
+import usbfifo
+import utils
+
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '../../examples')
+HELLO_ELF = os.path.join(EXAMPLES, 'hello/hello')
+CALC_ELF = os.path.join(EXAMPLES, 'calc/calc')
+
+BENCH_OUTPUT = os.environ.get('BENCH_OUTPUT', 'bench.json')
+
+# Each kernel ends with a jump to itself which marks the end of the benchmark.
+# Count down 1000 iterations of two dependent ALU instructions.
+KERNEL_LOOP = asm.assemble('''
+        li x1, 1000
+    loop:
+        addi x2, x2, 3
+        xor x3, x3, x2
+        addi x1, x1, -1
+        bnez x1, loop
+    end:
+        j end
+''')
+
+# Copy 128 words and one byte of each from the start of the data memory to the
+# following 512 bytes.
+KERNEL_MEMCPY = asm.assemble('''
+        lui a0, 0x20
+        addi a1, a0, 512
+        li a2, 128
+    loop:
+        lw t0, 0(a0)
+        sw t0, 0(a1)
+        lbu t1, 1(a0)
+        sb t1, 2(a1)
+        addi a0, a0, 4
+        addi a1, a1, 4
+        addi a2, a2, -1
+        bnez a2, loop
+    end:
+        j end
+''')
+
+# Branch on the lowest bit and on the lowest two bits of the counter in 1000
+# iterations, with a jump over the else branch of the first one.
+KERNEL_BRANCH = asm.assemble('''
+        li x1, 1000
+    loop:
+        andi x3, x1, 1
+        beqz x3, even
+        addi x2, x2, 1
+        j next
+    even:
+        addi x2, x2, -1
+    next:
+        andi x4, x1, 3
+        bnez x4, skip
+        addi x5, x5, 1
+    skip:
+        addi x1, x1, -1
+        bnez x1, loop
+    end:
+        j end
+''')
+
+# Sum the decimal digits of i * 40503 for i = 100..1, the conversion of numbers
+# to decimal is the typical use of division in firmware.
+KERNEL_MULDIV = asm.assemble('''
+        li s0, 100
+        li s1, 40503
+        li s2, 10
+        li a0, 0
+    number:
+        mul t0, s0, s1
+    digit:
+        remu t1, t0, s2
+        divu t0, t0, s2
+        add a0, a0, t1
+        bnez t0, digit
+        addi s0, s0, -1
+        bnez s0, number
+    end:
+        j end
+''')
+MULDIV_SUM = sum(sum(map(int, str(i * 40503))) for i in range(1, 101))
+
+# Send back every received byte, polling the FIFO like examples/calc.
+KERNEL_ECHO = asm.assemble('''
+        lui s0, 0x30
+    loop:
+        lbu t0, 2(s0)
+        beqz t0, loop
+        lbu t1, 3(s0)
+    wait:
+        lbu t0, 1(s0)
+        beqz t0, wait
+        sb t1, 1(s0)
+        j loop
+''').text
+
+
+async def run_kernel(dut, name, words):
+    await utils.init_dut(dut)
+    await utils.load_image(dut, b''.join(word.to_bytes(4, 'little') for word in words))
+
+    monitor = bench.PerfMonitor(dut, end=const.MEM_INSTR_ZERO + 4 * (len(words) - 1))
+    await monitor.run()
+    bench.save(BENCH_OUTPUT, name, monitor.results())
+    return monitor
+
+
+async def run_firmware(dut, name, path, done, rx=b''):
+    await utils.init_dut(dut)
+    await utils.load_elf(dut, path)
+    dut.in_ready_i.value = 1
+    dut.out_valid_i.value = 0
+
+    monitor = bench.PerfMonitor(dut)
+    monitor.done = lambda: done(monitor.tx)
+    if rx:
+        cocotb.start_soon(utils.usb_send(dut, rx))
+    await monitor.run()
+    bench.save(BENCH_OUTPUT, name, monitor.results())
+    return monitor
+
+
+@cocotb.test()
+async def test_loop(dut):
+    """Measure a tight ALU loop."""
+    monitor = await run_kernel(dut, 'loop', KERNEL_LOOP.words)
+    assert monitor.instret == 1 + 4 * 1000
+
+
+@cocotb.test()
+async def test_memcpy(dut):
+    """Measure a load and store heavy copy loop."""
+    monitor = await run_kernel(dut, 'memcpy', KERNEL_MEMCPY.words)
+    assert monitor.instret == 3 + 8 * 128
+
+
+@cocotb.test()
+async def test_branch(dut):
+    """Measure a branch heavy loop."""
+    monitor = await run_kernel(dut, 'branch', KERNEL_BRANCH.words)
+    assert monitor.class_counts['branch'] == 3 * 1000
+
+
+@cocotb.test()
+async def test_muldiv(dut):
+    """Measure a multiplication and division heavy loop."""
+    monitor = await run_kernel(dut, 'muldiv', KERNEL_MULDIV.words)
+    assert utils.read_regs(dut)[10] == MULDIV_SUM
+    assert monitor.class_counts['muldiv'] == 100 + 2 * sum(len(str(i * 40503))
+                                                           for i in range(1, 101))
+
+
+@cocotb.test()
+async def test_echo(dut):
+    """Measure USB FIFO throughput of a polling echo loop."""
+    await utils.init_dut(dut)
+    await utils.load_image(dut, KERNEL_ECHO)
+    driver = usbfifo.UsbDriver(dut)
+    usb = usbfifo.UsbMonitor(dut)
+    driver.start()
+    usb.start()
+    driver.send(bytes(range(128)))
+
+    monitor = bench.PerfMonitor(dut, done=lambda: len(monitor.tx) == 128)
+    await monitor.run()
+    results = monitor.results()
+    results['rx_bytes_per_cycle'] = driver.bytes_per_cycle
+    results['tx_bytes_per_cycle'] = usb.bytes_per_cycle
+    bench.save(BENCH_OUTPUT, 'echo', results)
+    assert monitor.tx == bytes(range(128))
+
+
+@cocotb.test(skip=not os.path.exists(HELLO_ELF))
+async def test_hello(dut):
+    """Measure examples/hello until it prints its first line."""
+    monitor = await run_firmware(dut, 'hello', HELLO_ELF,
+                                 lambda tx: tx.endswith(b'\r\n'))
+    assert monitor.tx == b'Hello world!\r\n'
+
+
+@cocotb.test(skip=not os.path.exists(CALC_ELF))
+async def test_calc(dut):
+    """Measure examples/calc evaluating one expression."""
+    monitor = await run_firmware(dut, 'calc', CALC_ELF,
+                                 lambda tx: tx.count(b'hex> ') == 2,
+                                 rx=b'1234+abc-ff\r')
+    assert monitor.tx == b'hex> 1234+abc-ff\r\n00001bf1\r\nhex> '
@@ -0,0 +1,62 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+import os
+
+import cocotb
+
+import bench
+import profiler
+import utils
+
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '../../examples')
+HELLO_ELF = os.path.join(EXAMPLES, 'hello/hello')
+CALC_ELF = os.path.join(EXAMPLES, 'calc/calc')
+
+# Sample every PROFILE_STRIDE cycles.
+PROFILE_STRIDE = int(os.environ.get('PROFILE_STRIDE', '1'))
+
+
+async def profile_firmware(dut, name, path, done, rx=b''):
+    """Run firmware until done(tx) and write <name>.prof and <name>.folded."""
+    await utils.init_dut(dut)
+    await utils.load_elf(dut, path)
+    dut.in_ready_i.value = 1
+    dut.out_valid_i.value = 0
+
+    prof = profiler.Profiler(dut, stride=PROFILE_STRIDE)
+    monitor = bench.PerfMonitor(dut)
+    monitor.done = lambda: done(monitor.tx)
+    prof.start()
+    if rx:
+        cocotb.start_soon(utils.usb_send(dut, rx))
+    await monitor.run()
+    prof.stop()
+
+    symbols = profiler.read_symbols(path)
+    prof.write_report(f'{name}.prof', symbols)
+    prof.write_folded(f'{name}.folded', symbols)
+
+    # The profiler can be stopped before it sees the last cycle of the monitor.
+    assert monitor.cycles // PROFILE_STRIDE - prof.samples in (0, 1)
+    with open(f'{name}.folded') as f:
+        assert sum(int(line.rsplit(' ', 1)[1]) for line in f) == prof.samples
+    return monitor
+
+
+@cocotb.test(skip=not os.path.exists(HELLO_ELF))
+async def test_hello(dut):
+    """Profile examples/hello until it prints its first line."""
+    monitor = await profile_firmware(dut, 'hello', HELLO_ELF,
+                                     lambda tx: tx.endswith(b'\r\n'))
+    assert monitor.tx == b'Hello world!\r\n'
+
+
+@cocotb.test(skip=not os.path.exists(CALC_ELF))
+async def test_calc(dut):
+    """Profile examples/calc evaluating one expression."""
+    monitor = await profile_firmware(dut, 'calc', CALC_ELF,
+                                     lambda tx: tx.count(b'hex> ') == 2,
+                                     rx=b'1234+abc-ff\r')
+    assert monitor.tx == b'hex> 1234+abc-ff\r\n00001bf1\r\nhex> '
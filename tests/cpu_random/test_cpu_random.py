@@ -0,0 +1,98 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+import os
+import random
+
+import cocotb
+from cocotb.regression import TestFactory
+from cocotb.triggers import ClockCycles
+
+import cosim
+import funccov
+import iss
+import rvgen
+import utils
+
+
+# Number of random programs checked by run_program tests. Each one executes
+# about 20k instructions.
+PROGRAMS = int(os.environ.get('RANDOM_PROGRAMS', 8))
+
+MAX_INSTRUCTIONS = 1_000_000
+
+# Functional coverage of all tests is merged into COVERAGE_OUTPUT when it is
+# set, see funccov.py.
+COVERAGE_OUTPUT = os.environ.get('COVERAGE_OUTPUT')
+
+
+def start_coverage(dut):
+    coverage = funccov.CpuCoverage(dut)
+    coverage.start()
+    return coverage
+
+
+def save_coverage(coverage):
+    coverage.stop()
+    if COVERAGE_OUTPUT:
+        coverage.save(COVERAGE_OUTPUT)
+
+
+async def run_program(dut, index):
+    """Run a random program and compare its final state with the ISS."""
+    seed = cocotb.RANDOM_SEED + index
+    dut._log.info("Program seed %d", seed)
+    program = rvgen.generate(random.Random(seed))
+
+    model = iss.Iss(program.text)
+    model.run_until(program.end, MAX_INSTRUCTIONS)
+    assert model.pc == program.end
+
+    await utils.init_dut(dut)
+    await utils.load_image(dut, program.text)
+    coverage = start_coverage(dut) if COVERAGE_OUTPUT else None
+    cycles = 0
+    while dut.pc.value != program.end:
+        assert cycles < 3 * model.retired, "program did not finish"
+        await ClockCycles(dut.clk_i, 1000, rising=False)
+        cycles += 1000
+    dut._log.info("Executed %d instructions in %d cycles", model.retired, cycles)
+    if coverage:
+        save_coverage(coverage)
+
+    regs = utils.read_regs(dut)
+    for rd in range(1, 32):
+        assert regs[rd] == model.regs[rd], \
+            f"x{rd} is {regs[rd]:#x}, ISS has {model.regs[rd]:#x} (seed {seed})"
+    data = utils.read_mem(dut.u_mem_control.u_mem)
+    for addr in range(0, len(data), 4):
+        assert data[addr:addr + 4] == model.data[addr:addr + 4], \
+            f"data memory at {addr:#x} differs from the ISS (seed {seed})"
+
+
+factory = TestFactory(run_program)
+factory.add_option('index', range(PROGRAMS))
+factory.generate_tests()
+
+
+@cocotb.test()
+async def test_random_cosim(dut):
+    """Run a random program in lockstep with the ISS."""
+    seed = cocotb.RANDOM_SEED
+    dut._log.info("Program seed %d", seed)
+    program = rvgen.generate(random.Random(seed), iterations=10)
+
+    await utils.init_dut(dut)
+    await utils.load_image(dut, program.text)
+
+    monitor = cosim.Cosim(dut, program.text)
+    cocotb.start_soon(monitor.run())
+    coverage = start_coverage(dut)
+    while monitor.iss.pc != program.end:
+        assert monitor.retired < MAX_INSTRUCTIONS, "program did not finish"
+        await ClockCycles(dut.clk_i, 1000, rising=False)
+    await monitor.check_regs()
+    save_coverage(coverage)
+
+    for group, name in coverage.gaps():
+        dut._log.info("Not covered: %s %s", group, name)
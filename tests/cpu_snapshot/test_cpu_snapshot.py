@@ -0,0 +1,103 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+import os
+
+import cocotb
+from cocotb.triggers import ClockCycles, FallingEdge
+
+import asm
+import snapshot
+import usbfifo
+import utils
+
+
+CALC_ELF = os.path.join(os.path.dirname(__file__), '../../examples/calc/calc')
+
+# Fill the data memory with a running sum and the cycle counter.
+KERNEL_SUM = asm.assemble('''
+        lui a0, 0x20
+        li a1, 0
+        li a2, 1
+    loop:
+        add a1, a1, a2
+        sw a1, 0(a0)
+        csrr t0, cycle
+        sh t0, 4(a0)
+        lbu t1, 5(a0)
+        add a1, a1, t1
+        addi a0, a0, 8
+        addi a2, a2, 1
+        j loop
+''').text
+
+
+def state(dut):
+    """Return the state compared between a run and its restored copy."""
+    return (dut.pc.value.integer, utils.read_regs(dut), dut.u_control.cycle.value.integer,
+            dut.u_control.instret.value.integer, utils.read_mem(dut.u_mem_control.u_mem))
+
+
+async def scramble(dut):
+    """Reset the core and fill the memories with garbage to make sure that the
+    restored state does not depend on what was there before."""
+    dut.rstn_i.value = 0
+    await utils.randomize_mem(dut.u_mem_instr.u_mem)
+    await utils.randomize_mem(dut.u_mem_control.u_mem)
+    await FallingEdge(dut.clk_i)
+
+
+@cocotb.test()
+async def test_restore(dut):
+    """Test that a run restored from a snapshot continues like the original."""
+    await utils.init_dut(dut)
+    await utils.load_image(dut, KERNEL_SUM)
+    await ClockCycles(dut.clk_i, 100, rising=False)
+    saved = await snapshot.capture(dut)
+    saved.save('sum.snap')
+    await ClockCycles(dut.clk_i, 300, rising=False)
+    expected = state(dut)
+
+    await scramble(dut)
+    await snapshot.restore(dut, snapshot.Snapshot.load('sum.snap'))
+    await ClockCycles(dut.clk_i, 300, rising=False)
+    assert state(dut) == expected
+
+
+@cocotb.test(skip=not os.path.exists(CALC_ELF))
+async def test_fork_calc(dut):
+    """Test forking examples/calc after its boot with different inputs."""
+    await utils.init_dut(dut)
+    await utils.load_elf(dut, CALC_ELF)
+    # Hold the last byte of the prompt in fifo_if to have it in the snapshot.
+    hold = False
+    monitor = usbfifo.UsbMonitor(dut, pause=iter(lambda: hold, None))
+    monitor.start()
+    await monitor.wait_for(lambda received: received == b'hex>')
+    hold = True
+    await ClockCycles(dut.clk_i, 100, rising=False)
+    saved = await snapshot.capture(dut)
+    assert saved.fifo['in_valid_q'] == 1
+    monitor.stop()
+
+    async def run(line, output):
+        driver = usbfifo.UsbDriver(dut)
+        monitor = usbfifo.UsbMonitor(dut)
+        driver.start()
+        monitor.start()
+        driver.send(line)
+        await monitor.wait_for(lambda received: received.endswith(b'hex> '))
+        driver.stop()
+        monitor.stop()
+        assert monitor.data == b' ' + output + b'hex> '
+        return dut.u_control.cycle.value.integer
+
+    cycle = await run(b'1+1\r', b'1+1\r\n00000002\r\n')
+
+    await scramble(dut)
+    await snapshot.restore(dut, saved)
+    assert await run(b'1+1\r', b'1+1\r\n00000002\r\n') == cycle
+
+    await scramble(dut)
+    await snapshot.restore(dut, saved)
+    await run(b'ff-1\r', b'ff-1\r\n000000fe\r\n')
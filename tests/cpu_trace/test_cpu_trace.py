@@ -0,0 +1,92 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+import cocotb
+from cocotb.triggers import ClockCycles
+
+import asm
+import const
+import cputrace
+import utils
+
+
+# Copy 16 words from 0x20000 to 0x20100 and loop forever.
+KERNEL_COPY = asm.assemble('''
+        lui a0, 0x20
+        addi a1, a0, 256
+        li a2, 16
+    loop:
+        lw t0, 0(a0)
+        sw t0, 0(a1)
+        addi a0, a0, 4
+        addi a1, a1, 4
+        addi a2, a2, -1
+        bnez a2, loop
+    halt:
+        j halt
+''').words
+
+KERNEL_ADD = asm.assemble('''
+        li ra, 1
+        li sp, 2
+        add gp, ra, sp
+        addi tp, gp, 1
+    halt:
+        j halt
+''').words
+
+
+def words_to_bytes(words):
+    return b''.join(word.to_bytes(4, 'little') for word in words)
+
+
+async def record(dut, path, words, data=b'', cycles=100, chunk=4096):
+    await utils.init_dut(dut)
+    await utils.load_image(dut, words_to_bytes(words), data)
+    recorder = cputrace.TraceRecorder(dut, path, chunk=chunk)
+    recorder.start()
+    await ClockCycles(dut.clk_i, cycles, rising=False)
+    recorder.stop()
+    return recorder
+
+
+@cocotb.test(skip=cputrace.numpy is None)
+async def test_record(dut):
+    """Test that a trace captures register writes and memory accesses."""
+    data = words_to_bytes(range(0x100, 0x110))
+    recorder = await record(dut, 'copy.trace', KERNEL_COPY, data, cycles=150, chunk=7)
+    trace = cputrace.read_trace('copy.trace')
+    assert len(trace) == recorder.records
+
+    stores = cputrace.stores(trace, const.MEM_DATA_ZERO + 0x100, const.MEM_DATA_ZERO + 0x200)
+    assert list(trace['wdata'][stores]) == list(range(0x100, 0x110))
+    assert list(trace['addr'][stores]) == \
+        [const.MEM_DATA_ZERO + 0x100 + 4 * i for i in range(16)]
+    loads = cputrace.loads(trace, const.MEM_DATA_ZERO, const.MEM_DATA_ZERO + 0x100)
+    assert len(loads) == 16
+
+    # The first records are the three setup instructions, each one written
+    # back in the following cycle, or two cycles later on the pipelined core.
+    wb = 2 if utils.is_pipelined(dut) else 1
+    assert list(trace['pc'][:3]) == [const.MEM_INSTR_ZERO + 4 * i for i in range(3)]
+    assert all(trace['flags'][:3] & cputrace.FLAG_RETIRE)
+    assert list(trace['rd'][wb:wb + 3]) == [10, 11, 12]
+    assert list(trace['rd_data'][wb:wb + 3]) == [0x20000, 0x20100, 16]
+
+
+@cocotb.test(skip=cputrace.numpy is None)
+async def test_divergence(dut):
+    """Test finding the first divergence between two traces."""
+    await record(dut, 'add_a.trace', KERNEL_ADD, cycles=20)
+    await record(dut, 'add_b.trace', KERNEL_ADD, cycles=20)
+    changed = list(KERNEL_ADD)
+    changed[2:3] = asm.assemble('sub x3, x1, x2').words
+    await record(dut, 'add_c.trace', changed, cycles=20)
+
+    a = cputrace.read_trace('add_a.trace')
+    b = cputrace.read_trace('add_b.trace')
+    c = cputrace.read_trace('add_c.trace')
+    assert cputrace.first_divergence(a, b) is None
+    assert cputrace.first_divergence(a, c) == 2
+    assert cputrace.first_divergence(a, c, fields=['pc']) is None
+    assert cputrace.first_divergence(a, a[:10]) == 10
@@ -0,0 +1,109 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+import os
+import random
+
+import cocotb
+
+import asm
+import elf
+import usbfifo
+import utils
+
+
+CALC_ELF = os.path.join(os.path.dirname(__file__), '../../examples/calc/calc')
+
+# Send back every received byte, polling the FIFO like examples/calc.
+KERNEL_ECHO = asm.assemble('''
+        lui s0, 0x30
+    loop:
+        lbu t0, 2(s0)
+        beqz t0, loop
+        lbu t1, 3(s0)
+    wait:
+        lbu t0, 1(s0)
+        beqz t0, wait
+        sb t1, 1(s0)
+        j loop
+''').text
+
+CALC_SESSION = [
+    (b'1234+abc-ff\r', b'1234+abc-ff\r\n00001bf1\r\n'),
+    (b'  1 - - 2\r', b'  1 - - 2\r\n00000003\r\n'),
+    (b'0-1\r', b'0-1\r\nffffffff\r\n'),
+    (b'1*2\r', b'1*2\r\nInvalid input.\r\n'),
+    (b'FfFf\r', b'FfFf\r\n0000ffff\r\n'),
+]
+
+
+async def start(dut, text, data=b'', driver_pause=None, monitor_pause=None):
+    await utils.init_dut(dut)
+    await utils.load_image(dut, text, data)
+    driver = usbfifo.UsbDriver(dut, driver_pause)
+    monitor = usbfifo.UsbMonitor(dut, monitor_pause)
+    driver.start()
+    monitor.start()
+    return driver, monitor
+
+
+async def echo(dut, size, driver_pause=None, monitor_pause=None):
+    driver, monitor = await start(dut, KERNEL_ECHO, driver_pause=driver_pause,
+                                  monitor_pause=monitor_pause)
+    data = random.Random(size).randbytes(size)
+    driver.send(data)
+    await monitor.wait_for(lambda received: len(received) == size)
+    assert monitor.data == data
+    dut._log.info(f"sent {driver.bytes_per_cycle:.4f} B/cycle, "
+                  f"received {monitor.bytes_per_cycle:.4f} B/cycle")
+    return driver, monitor
+
+
+async def calc(dut, driver_pause=None, monitor_pause=None):
+    text, data = elf.read_images(CALC_ELF)
+    driver, monitor = await start(dut, text, data, driver_pause, monitor_pause)
+    expected = b'hex> '
+    for line, output in CALC_SESSION:
+        driver.send(line)
+        expected += output + b'hex> '
+    await monitor.wait_for(lambda received: len(received) >= len(expected))
+    assert monitor.data == expected
+    assert driver.bytes == sum(len(line) for line, _ in CALC_SESSION)
+    dut._log.info(f"sent {driver.bytes_per_cycle:.4f} B/cycle, "
+                  f"received {monitor.bytes_per_cycle:.4f} B/cycle")
+
+
+@cocotb.test()
+async def test_echo(dut):
+    """Test streaming bytes through an echo loop."""
+    driver, monitor = await echo(dut, 256)
+    # Each byte takes at least a poll of both directions and a FIFO store.
+    assert 0 < monitor.bytes_per_cycle < 1 / 6
+    assert abs(driver.bytes_per_cycle - monitor.bytes_per_cycle) < 0.01
+
+
+@cocotb.test()
+async def test_echo_backpressure(dut):
+    """Test streaming bytes through an echo loop with stalls on both sides."""
+    rng = random.Random(1)
+    await echo(dut, 256, usbfifo.random_pause(0.5, rng), usbfifo.random_pause(0.5, rng))
+
+
+@cocotb.test()
+async def test_echo_stalled_output(dut):
+    """Test that the cpu waits while the host does not take its output."""
+    driver, monitor = await echo(dut, 4, monitor_pause=[True] * 200)
+    assert monitor.first_cycle > 200
+
+
+@cocotb.test(skip=not os.path.exists(CALC_ELF))
+async def test_calc(dut):
+    """Run a session of examples/calc."""
+    await calc(dut)
+
+
+@cocotb.test(skip=not os.path.exists(CALC_ELF))
+async def test_calc_backpressure(dut):
+    """Run a session of examples/calc with stalls on both sides."""
+    rng = random.Random(2)
+    await calc(dut, usbfifo.random_pause(0.3, rng), usbfifo.random_pause(0.7, rng))
@@ -0,0 +1,270 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Binary execution traces of the cpu toplevel.
+
+TraceRecorder captures one fixed-size record per cycle after reset and
+streams the records to a file in chunks, so the memory use of the testbench
+does not grow with the length of a run. A trace file starts with a header
+followed by records of the following layout (little-endian):
+
+    offset  size  field
+         0     4  pc       program counter
+         4     4  ir       instruction word at pc
+         8     1  state    state of the control FSM
+         9     1  flags    FLAG_* bits
+        10     1  rd       destination register index
+        11     1  acc      read access size in bits 0-1, write in bits 2-3
+        12     4  rd_data  register writeback value
+        16     4  addr     data bus address
+        20     4  wdata    data bus write value
+
+The rd and rd_data fields and FLAG_REG_WR describe the write to the register
+file in the cycle, which is the result of the instruction executed in the
+previous cycle, or two cycles before on the pipelined core. The other fields
+describe the instruction in execute.
+
+read_trace() maps a trace file into memory and returns a NumPy structured
+array of the records. Columns such as trace['pc'] are views into the file, so
+queries over millions of cycles are vectorized and do not copy the data.
+NumPy is needed only for reading.
+"""
+
+import argparse
+import mmap
+import struct
+import sys
+
+import cocotb
+from cocotb.triggers import FallingEdge
+
+import const
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+MAGIC = b'PK32TRC\0'
+VERSION = 1
+HEADER = struct.Struct('<8sII')
+RECORD = struct.Struct('<IIBBBBIII')
+
+FLAG_REG_WR = 0x01
+FLAG_MEM_RD = 0x02
+FLAG_MEM_WR = 0x04
+FLAG_FIFO = 0x08
+FLAG_RETIRE = 0x10
+
+RECORD_FIELDS = [('pc', '<u4'), ('ir', '<u4'), ('state', 'u1'), ('flags', 'u1'),
+                 ('rd', 'u1'), ('acc', 'u1'), ('rd_data', '<u4'), ('addr', '<u4'),
+                 ('wdata', '<u4')]
+
+
+class TraceError(Exception):
+    pass
+
+
+def _integer(value):
+    try:
+        return value.integer
+    except ValueError:
+        # Unresolved bits, typically outputs of memories which are not read.
+        return int(value.binstr.translate(str.maketrans('xXzZ', '0000')), 2)
+
+
+class TraceRecorder:
+    """Recorder of a trace of the cpu toplevel into a file.
+
+    Records are packed into a preallocated buffer of chunk records which is
+    written out whenever it fills up.
+    """
+
+    def __init__(self, dut, path, chunk=4096):
+        self.dut = dut
+        self.path = path
+        self.chunk = chunk
+        self.records = 0
+        self._buffer = bytearray(chunk * RECORD.size)
+        self._used = 0
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self._task = None
+
+    def start(self):
+        """Start recording in the background."""
+        self._task = cocotb.start_soon(self.run())
+
+    def stop(self):
+        """Stop recording started by start() and close the file."""
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+        self.close()
+
+    def close(self):
+        """Write out buffered records and close the file."""
+        if self._file is not None:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def _flush(self):
+        self._file.write(memoryview(self._buffer)[:self._used * RECORD.size])
+        self._used = 0
+
+    async def run(self):
+        """Record cycles until the coroutine is killed."""
+        dut = self.dut
+        control = dut.u_control
+        st_reset = int(control.ST_RESET.value)
+        buffer = self._buffer
+        pack_into = RECORD.pack_into
+
+        while True:
+            await FallingEdge(dut.clk_i)
+            state = control.state.value.integer
+            if state == st_reset:
+                continue
+
+            reg_wr = dut.rf_wr_en.value.integer
+            mem_rd = dut.mem_r_en.value.integer
+            mem_wr = dut.mem_wr_en.value.integer
+            addr = _integer(dut.alu_res.value)
+            fifo = const.MEM_USB_IO_ZERO <= addr < const.MEM_USB_IO_ZERO + 4
+            flags = (reg_wr * FLAG_REG_WR | mem_rd * FLAG_MEM_RD |
+                     mem_wr * FLAG_MEM_WR | fifo * FLAG_FIFO)
+            if dut.pc_next_sel.value != 0: # PC_NEXT_SEL_STALL
+                flags |= FLAG_RETIRE
+            pack_into(buffer, self._used * RECORD.size,
+                      dut.pc.value.integer,
+                      _integer(dut.pc_data.value),
+                      state,
+                      flags,
+                      dut.rf_wr_idx.value.integer if reg_wr else 0,
+                      dut.mem_acc_r.value.integer | dut.mem_acc_w.value.integer << 2,
+                      _integer(dut.rf_wr_data.value) if reg_wr else 0,
+                      addr if mem_rd or mem_wr else 0,
+                      _integer(dut.rs2_fwd.value) if mem_wr else 0)
+            self._used += 1
+            self.records += 1
+            if self._used == self.chunk:
+                self._flush()
+
+
+def read_trace(path):
+    """Map a trace file into memory and return its records as a NumPy
+    structured array."""
+    if numpy is None:
+        raise TraceError("reading traces requires numpy")
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise TraceError(f"{path}: truncated header")
+        magic, version, record_size = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise TraceError(f"{path}: not a version {VERSION} trace file")
+        f.seek(0, 2)
+        if f.tell() == HEADER.size:
+            return numpy.zeros(0, dtype=RECORD_FIELDS)
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    count = (len(data) - HEADER.size) // RECORD.size
+    return numpy.frombuffer(data, dtype=RECORD_FIELDS, count=count, offset=HEADER.size)
+
+
+def stores(trace, start, end):
+    """Return indices of records which store to the address range [start, end)."""
+    addr = trace['addr']
+    return numpy.flatnonzero(((trace['flags'] & FLAG_MEM_WR) != 0) &
+                             (addr >= start) & (addr < end))
+
+
+def loads(trace, start, end):
+    """Return indices of records which load from the address range [start, end)."""
+    addr = trace['addr']
+    return numpy.flatnonzero(((trace['flags'] & FLAG_MEM_RD) != 0) &
+                             (addr >= start) & (addr < end))
+
+
+def first_divergence(a, b, fields=None):
+    """Return the index of the first record which differs in any of the given
+    fields between two traces, or None if they match.
+
+    If one trace is a prefix of the other, the length of the shorter one is
+    returned.
+    """
+    fields = fields or [name for name, _ in RECORD_FIELDS]
+    count = min(len(a), len(b))
+    differ = numpy.zeros(count, dtype=bool)
+    for name in fields:
+        differ |= a[name][:count] != b[name][:count]
+    indices = numpy.flatnonzero(differ)
+    if len(indices):
+        return int(indices[0])
+    return count if len(a) != len(b) else None
+
+
+def format_record(index, record):
+    """Return a one-line description of a trace record."""
+    flags = record['flags']
+    text = f"{index:10d} pc={int(record['pc']):08x} ir={int(record['ir']):08x} " \
+           f"st={int(record['state'])}"
+    if flags & FLAG_REG_WR:
+        text += f" x{int(record['rd'])}={int(record['rd_data']):08x}"
+    if flags & FLAG_MEM_RD:
+        text += f" rd[{int(record['addr']):08x}]"
+    if flags & FLAG_MEM_WR:
+        text += f" wr[{int(record['addr']):08x}]={int(record['wdata']):08x}"
+    if flags & FLAG_RETIRE:
+        text += " retire"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query traces of the cpu toplevel.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = subparsers.add_parser('info', help="print a summary of a trace")
+    info_parser.add_argument('trace')
+
+    stores_parser = subparsers.add_parser(
+        'stores', help="print stores to an address range")
+    stores_parser.add_argument('trace')
+    stores_parser.add_argument('start', type=lambda value: int(value, 0))
+    stores_parser.add_argument('end', type=lambda value: int(value, 0))
+
+    diff_parser = subparsers.add_parser(
+        'diff', help="print the first divergence between two traces")
+    diff_parser.add_argument('trace')
+    diff_parser.add_argument('other')
+
+    args = parser.parse_args()
+    trace = read_trace(args.trace)
+    if args.command == 'info':
+        retired = numpy.count_nonzero(trace['flags'] & FLAG_RETIRE)
+        print(f"cycles: {len(trace)}")
+        print(f"instret: {retired}")
+        data = (const.MEM_DATA_ZERO, const.MEM_USB_IO_ZERO)
+        print(f"data loads: {len(loads(trace, *data))}")
+        print(f"data stores: {len(stores(trace, *data))}")
+    elif args.command == 'stores':
+        for index in stores(trace, args.start, args.end):
+            print(format_record(index, trace[index]))
+    else:
+        other = read_trace(args.other)
+        index = first_divergence(trace, other)
+        if index is None:
+            print("traces match")
+            return 0
+        for name, records in ((args.trace, trace), (args.other, other)):
+            if index < len(records):
+                print(f"{name}: {format_record(index, records[index])}")
+            else:
+                print(f"{name}: ends after {len(records)} cycles")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
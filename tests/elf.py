@@ -0,0 +1,108 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Minimal reader of 32-bit little-endian RISC-V ELF files."""
+
+import collections
+import struct
+
+import const
+
+
+EM_RISCV = 243
+
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_NOBITS = 8
+
+SHF_ALLOC = 0x2
+
+STT_FUNC = 2
+
+
+Section = collections.namedtuple('Section', ['name', 'addr', 'data'])
+Symbol = collections.namedtuple('Symbol', ['name', 'addr', 'size'])
+
+
+class ElfError(Exception):
+    pass
+
+
+class Elf:
+    """Parsed allocatable sections and function symbols of an ELF file."""
+
+    def __init__(self, data):
+        if data[:4] != b'\x7fELF':
+            raise ElfError("not an ELF file")
+        if data[4] != 1 or data[5] != 1:
+            raise ElfError("not a 32-bit little-endian ELF file")
+
+        (e_machine, e_shoff, e_shentsize, e_shnum,
+         e_shstrndx) = struct.unpack_from('<18xH12xI10xHHH', data, 0)
+        if e_machine != EM_RISCV:
+            raise ElfError(f"unexpected machine {e_machine}")
+
+        headers = [struct.unpack_from('<IIIIIIIIII', data, e_shoff + i * e_shentsize)
+                   for i in range(e_shnum)]
+        shstrtab = headers[e_shstrndx]
+        names = data[shstrtab[4]:shstrtab[4] + shstrtab[5]]
+
+        self.sections = []
+        self.symbols = []
+        for (sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size,
+             sh_link, _, _, sh_entsize) in headers:
+            name = _cstr(names, sh_name)
+            if sh_type == SHT_PROGBITS and sh_flags & SHF_ALLOC:
+                self.sections.append(
+                    Section(name, sh_addr, bytes(data[sh_offset:sh_offset + sh_size])))
+            elif sh_type == SHT_NOBITS and sh_flags & SHF_ALLOC:
+                self.sections.append(Section(name, sh_addr, bytes(sh_size)))
+            elif sh_type == SHT_SYMTAB:
+                strtab = headers[sh_link]
+                strings = data[strtab[4]:strtab[4] + strtab[5]]
+                for offset in range(sh_offset, sh_offset + sh_size, sh_entsize):
+                    (st_name, st_value, st_size,
+                     st_info) = struct.unpack_from('<IIIB', data, offset)
+                    if st_info & 0xf == STT_FUNC:
+                        self.symbols.append(
+                            Symbol(_cstr(strings, st_name), st_value, st_size))
+        self.symbols.sort(key=lambda symbol: symbol.addr)
+
+    def section(self, name):
+        """Return a section by its name, or None if it does not exist."""
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def image(self, start, end):
+        """Return a memory image of [start, end) built from all sections in that
+        range. The image extends only up to the last section byte."""
+        image = bytearray()
+        for section in self.sections:
+            if start <= section.addr < end:
+                offset = section.addr - start
+                if offset + len(section.data) > end - start:
+                    raise ElfError(f"section {section.name} does not fit into "
+                                   f"[{start:#x}, {end:#x})")
+                if len(image) < offset + len(section.data):
+                    image.extend(bytes(offset + len(section.data) - len(image)))
+                image[offset:offset + len(section.data)] = section.data
+        return image
+
+
+def _cstr(data, offset):
+    return data[offset:data.index(b'\0', offset)].decode()
+
+
+def read_elf(path):
+    """Read and parse an ELF file."""
+    with open(path, 'rb') as f:
+        return Elf(f.read())
+
+
+def read_images(path):
+    """Read text and data images of the cpu toplevel from an ELF file."""
+    image = read_elf(path)
+    return (image.image(const.MEM_INSTR_ZERO, const.MEM_INSTR_ZERO + 0x10000),
+            image.image(const.MEM_DATA_ZERO, const.MEM_DATA_ZERO + 0x10000))
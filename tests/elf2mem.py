@@ -0,0 +1,98 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Conversion of firmware ELF files to memory images for $readmemh.
+
+The ELF file is read once and each of the given sections is written as three
+images:
+
+- <prefix>.<section>.txt01 and <prefix>.<section>.txt23 with the lower and upper
+  halfwords of each 32-bit word, i.e. rows of mem_01 and mem_23 in mem.v,
+- <prefix>.<section>.txt with one byte per line.
+
+An image is written only if its content changed, so that its timestamp stays
+and make does not rerun synthesis or simulation which depend on it.
+"""
+
+import argparse
+import os
+import struct
+import sys
+
+import elf
+
+
+SECTIONS = ('.text', '.data')
+
+
+def images(data):
+    """Return {suffix: content} of the images of a section."""
+    words = bytes(data) + bytes(-len(data) % 4)
+    halves = list(struct.iter_unpack('<HH', words))
+    return {
+        'txt01': ''.join(f'{low:04x}\n' for low, _ in halves),
+        'txt23': ''.join(f'{high:04x}\n' for _, high in halves),
+        'txt': ''.join(f'{byte:02x}\n' for byte in data),
+    }
+
+
+def update_file(path, content):
+    """Write content to path unless the file already contains it. Return True if
+    the file was written."""
+    try:
+        with open(path) as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    # Replace the file only once it is complete, an interrupted write must not
+    # leave a truncated image with a new timestamp behind.
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(content)
+    os.replace(tmp, path)
+    return True
+
+
+def convert(path, prefix=None, sections=SECTIONS):
+    """Write images of sections of an ELF file and return the paths of the
+    images which changed. The prefix defaults to the path of the ELF file."""
+    image = elf.read_elf(path)
+    prefix = prefix or path
+    changed = []
+    for name in sections:
+        section = image.section(name)
+        if section is None:
+            raise elf.ElfError(f"no section {name}")
+        for suffix, content in images(section.data).items():
+            output = f'{prefix}.{name.lstrip(".")}.{suffix}'
+            if update_file(output, content):
+                changed.append(output)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert sections of an ELF file to memory images for $readmemh.")
+    parser.add_argument('elf', help="input ELF file")
+    parser.add_argument('-o', '--output', metavar='PREFIX',
+                        help="write PREFIX.<section>.{txt,txt01,txt23} (default: the ELF path)")
+    parser.add_argument('-s', '--section', action='append', dest='sections',
+                        help="section to convert, can be repeated (default: .text and .data)")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="print the images which changed")
+    args = parser.parse_args()
+
+    try:
+        changed = convert(args.elf, args.output, args.sections or SECTIONS)
+    except (OSError, elf.ElfError) as e:
+        print(f"{args.elf}: {e}", file=sys.stderr)
+        return 1
+    if args.verbose:
+        for path in changed:
+            print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
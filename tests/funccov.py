@@ -0,0 +1,349 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Functional coverage of the cpu and alu toplevels.
+
+Coverage is counted in groups of named bins. Each group keeps its counters in
+a preallocated array indexed by the bin, so sampling a cycle only increments
+integers and does not create any Python objects. Bins which a complete test
+run is expected to hit are the goals of the group, the remaining ones are
+tracked but not required, e.g. invalid encodings.
+
+CpuCoverage samples the cpu toplevel on falling clock edges:
+
+    instr         retired instructions by opcode, funct3 and funct7
+    rvc           retired compressed instructions by quadrant and funct3
+    alu_op        alu_op of retired instructions
+    pc_next_sel   pc_next_sel of all cycles
+    load_size     access size of data bus reads
+    store_size    access size of data bus writes
+    control_fsm   state transitions of u_control
+    mem_fsm       state transitions of u_mem_control
+
+AluCoverage samples the combinational alu toplevel when its sample() method is
+called and counts alu_op by the class of the result.
+
+Coverage is saved as JSON of the form:
+
+    {"groups": {"<group>": {"bins": {"<bin>": hits, ...},
+                            "goals": ["<bin>", ...]}}}
+
+save() merges counts into an existing file, under a lock, so tests running in
+parallel shards can share one output file. Separate files are merged and the
+uncovered goals are listed by running this module:
+
+    $ python funccov.py report shard1.json shard2.json
+"""
+
+import argparse
+import array
+import fcntl
+import json
+import sys
+
+import cocotb
+from cocotb.triggers import FallingEdge
+
+
+# Instructions decoded by u_control as (name, opcode, funct3, funct7), None
+# stands for a field which is not part of the encoding.
+INSTRUCTIONS = [
+    ('lui', 0b0110111, None, None),
+    ('auipc', 0b0010111, None, None),
+    ('jal', 0b1101111, None, None),
+    ('jalr', 0b1100111, 0b000, None),
+    ('beq', 0b1100011, 0b000, None),
+    ('bne', 0b1100011, 0b001, None),
+    ('blt', 0b1100011, 0b100, None),
+    ('bge', 0b1100011, 0b101, None),
+    ('bltu', 0b1100011, 0b110, None),
+    ('bgeu', 0b1100011, 0b111, None),
+    ('lb', 0b0000011, 0b000, None),
+    ('lh', 0b0000011, 0b001, None),
+    ('lw', 0b0000011, 0b010, None),
+    ('lbu', 0b0000011, 0b100, None),
+    ('lhu', 0b0000011, 0b101, None),
+    ('sb', 0b0100011, 0b000, None),
+    ('sh', 0b0100011, 0b001, None),
+    ('sw', 0b0100011, 0b010, None),
+    ('addi', 0b0010011, 0b000, None),
+    ('slti', 0b0010011, 0b010, None),
+    ('sltiu', 0b0010011, 0b011, None),
+    ('xori', 0b0010011, 0b100, None),
+    ('ori', 0b0010011, 0b110, None),
+    ('andi', 0b0010011, 0b111, None),
+    ('slli', 0b0010011, 0b001, 0b0000000),
+    ('srli', 0b0010011, 0b101, 0b0000000),
+    ('srai', 0b0010011, 0b101, 0b0100000),
+    ('add', 0b0110011, 0b000, 0b0000000),
+    ('sub', 0b0110011, 0b000, 0b0100000),
+    ('sll', 0b0110011, 0b001, 0b0000000),
+    ('slt', 0b0110011, 0b010, 0b0000000),
+    ('sltu', 0b0110011, 0b011, 0b0000000),
+    ('xor', 0b0110011, 0b100, 0b0000000),
+    ('srl', 0b0110011, 0b101, 0b0000000),
+    ('sra', 0b0110011, 0b101, 0b0100000),
+    ('or', 0b0110011, 0b110, 0b0000000),
+    ('and', 0b0110011, 0b111, 0b0000000),
+    ('mul', 0b0110011, 0b000, 0b0000001),
+    ('mulh', 0b0110011, 0b001, 0b0000001),
+    ('mulhsu', 0b0110011, 0b010, 0b0000001),
+    ('mulhu', 0b0110011, 0b011, 0b0000001),
+    ('div', 0b0110011, 0b100, 0b0000001),
+    ('divu', 0b0110011, 0b101, 0b0000001),
+    ('rem', 0b0110011, 0b110, 0b0000001),
+    ('remu', 0b0110011, 0b111, 0b0000001),
+    ('csrrw', 0b1110011, 0b001, None),
+    ('csrrs', 0b1110011, 0b010, None),
+    ('csrrc', 0b1110011, 0b011, None),
+    ('csrrwi', 0b1110011, 0b101, None),
+    ('csrrsi', 0b1110011, 0b110, None),
+    ('csrrci', 0b1110011, 0b111, None),
+]
+
+# Compressed instructions indexed by quadrant * 8 + funct3, instructions which
+# share the quadrant and funct3 are one bin. The floating-point loads and
+# stores and the reserved encoding are not goals, rvc_expand.v turns them into
+# a nop.
+RVC_INSTRUCTIONS = ['addi4spn', 'fld', 'lw', 'flw', 'reserved', 'fsd', 'sw', 'fsw',
+                    'addi', 'jal', 'li', 'lui_addi16sp', 'alu', 'j', 'beqz', 'bnez',
+                    'slli', 'fldsp', 'lwsp', 'flwsp', 'jr_mv_add', 'fsdsp', 'swsp', 'fswsp']
+RVC_FP = ['fld', 'flw', 'reserved', 'fsd', 'fsw', 'fldsp', 'flwsp', 'fsdsp', 'fswsp']
+
+# Values of alu_op and pc_next_sel, see const.v.
+ALU_OPS = ['add', 'sub', 'and', 'or', 'xor', 'sll', 'srl', 'sra', 'eq', 'ne', 'lt', 'ge',
+           'ltu', 'geu']
+PC_NEXT_SELS = ['stall', 'next', 'pc_imm', 'rs1_imm', 'cond_pc_imm']
+ACCESS_SIZES = ['byte', 'halfword', 'word']
+
+# State transitions which the FSMs of control.v and mem_control.v take in a
+# normal run, excluding those into and within reset. Only the pipelined core
+# enters fetch_stall, the goals are those of the single-stage one.
+CONTROL_STATES = ['reset', 'exec', 'read_stall', 'fetch_stall', 'muldiv_stall']
+CONTROL_TRANSITIONS = [('reset', 'exec'), ('exec', 'exec'), ('exec', 'read_stall'),
+                       ('read_stall', 'exec'), ('exec', 'muldiv_stall'),
+                       ('muldiv_stall', 'muldiv_stall'), ('muldiv_stall', 'exec')]
+MEM_STATES = ['reset', 'ready']
+MEM_TRANSITIONS = [('reset', 'ready'), ('ready', 'ready')]
+
+RESULT_CLASSES = ['zero', 'positive', 'negative']
+
+
+def _decode_table():
+    """Return a table of indices into INSTRUCTIONS plus one, or 0 for unknown
+    encodings, indexed by opcode | funct3 << 7 | funct7 << 10."""
+    table = bytearray(1 << 17)
+    for index, (_, opcode, funct3, funct7) in enumerate(INSTRUCTIONS, 1):
+        for f3 in range(8) if funct3 is None else (funct3,):
+            for f7 in range(128) if funct7 is None else (funct7,):
+                table[opcode | f3 << 7 | f7 << 10] = index
+    return table
+
+
+def _transitions(states):
+    return [f'{a}->{b}' for a in states for b in states]
+
+
+class Group:
+    """Hit counters of the bins of one coverage point."""
+
+    def __init__(self, bins, goals=None):
+        self.bins = list(bins)
+        self.hits = array.array('Q', bytes(8 * len(self.bins)))
+        self.goals = list(self.bins if goals is None else goals)
+
+    def gaps(self):
+        """Return goals which were not hit."""
+        hits = dict(zip(self.bins, self.hits))
+        return [name for name in self.goals if not hits.get(name)]
+
+
+class Coverage:
+    """Set of coverage groups by their name."""
+
+    def __init__(self, groups=None):
+        self.groups = groups or {}
+
+    def gaps(self):
+        """Return uncovered goals as a list of (group, bin)."""
+        return [(name, gap) for name, group in self.groups.items() for gap in group.gaps()]
+
+    def to_json(self):
+        return {'groups': {name: {'bins': dict(zip(group.bins, group.hits)),
+                                  'goals': group.goals}
+                           for name, group in self.groups.items()}}
+
+    @classmethod
+    def from_json(cls, data):
+        groups = {}
+        for name, group in data['groups'].items():
+            groups[name] = Group(group['bins'], group['goals'])
+            groups[name].hits = array.array('Q', group['bins'].values())
+        return cls(groups)
+
+    def merge(self, other):
+        """Add hits of another coverage, groups and bins are matched by name."""
+        for name, group in other.groups.items():
+            if name not in self.groups:
+                self.groups[name] = Group(group.bins, group.goals)
+            mine = self.groups[name]
+            index = {bin_name: i for i, bin_name in enumerate(mine.bins)}
+            for bin_name, hits in zip(group.bins, group.hits):
+                if bin_name not in index:
+                    index[bin_name] = len(mine.bins)
+                    mine.bins.append(bin_name)
+                    mine.hits.append(0)
+                mine.hits[index[bin_name]] += hits
+            mine.goals += [goal for goal in group.goals if goal not in mine.goals]
+
+    def save(self, path):
+        """Merge the coverage into a JSON file, which may not exist yet.
+
+        The file is locked while it is updated so that tests running in
+        parallel can share it.
+        """
+        with open(path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            content = f.read()
+            merged = Coverage.from_json(json.loads(content)) if content else Coverage()
+            merged.merge(self)
+            f.seek(0)
+            f.truncate()
+            json.dump(merged.to_json(), f, indent=2)
+            f.write('\n')
+
+
+def load(path):
+    """Load coverage from a JSON file."""
+    with open(path) as f:
+        return Coverage.from_json(json.load(f))
+
+
+class CpuCoverage(Coverage):
+    """Coverage of a program running on the cpu toplevel."""
+
+    def __init__(self, dut):
+        super().__init__({
+            'instr': Group(['unknown'] + [name for name, *_ in INSTRUCTIONS],
+                           [name for name, *_ in INSTRUCTIONS]),
+            'rvc': Group(RVC_INSTRUCTIONS,
+                         [name for name in RVC_INSTRUCTIONS if name not in RVC_FP]),
+            'alu_op': Group(ALU_OPS),
+            'pc_next_sel': Group(PC_NEXT_SELS),
+            'load_size': Group(ACCESS_SIZES),
+            'store_size': Group(ACCESS_SIZES),
+            'control_fsm': Group(_transitions(CONTROL_STATES),
+                                 [f'{a}->{b}' for a, b in CONTROL_TRANSITIONS]),
+            'mem_fsm': Group(_transitions(MEM_STATES),
+                             [f'{a}->{b}' for a, b in MEM_TRANSITIONS]),
+        })
+        self.dut = dut
+        self._task = None
+
+    def start(self):
+        """Start sampling in the background."""
+        self._task = cocotb.start_soon(self.run())
+
+    def stop(self):
+        """Stop sampling started by start()."""
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def run(self):
+        """Sample every cycle until the coroutine is killed."""
+        dut = self.dut
+        control = dut.u_control
+        mem_control = dut.u_mem_control
+        table = _decode_table()
+        instr = self.groups['instr'].hits
+        rvc = self.groups['rvc'].hits
+        alu_op = self.groups['alu_op'].hits
+        pc_next_sel = self.groups['pc_next_sel'].hits
+        load_size = self.groups['load_size'].hits
+        store_size = self.groups['store_size'].hits
+        control_fsm = self.groups['control_fsm'].hits
+        mem_fsm = self.groups['mem_fsm'].hits
+        control_states = len(CONTROL_STATES)
+        mem_states = len(MEM_STATES)
+        state = control.state.value.integer
+        mem_state = mem_control.state.value.integer
+
+        while True:
+            await FallingEdge(dut.clk_i)
+            previous, state = state, control.state.value.integer
+            control_fsm[previous * control_states + state] += 1
+            previous, mem_state = mem_state, mem_control.state.value.integer
+            mem_fsm[previous * mem_states + mem_state] += 1
+
+            if dut.mem_r_en.value:
+                load_size[dut.mem_acc_r.value.integer] += 1
+            if dut.mem_wr_en.value:
+                store_size[dut.mem_acc_w.value.integer] += 1
+
+            sel = dut.pc_next_sel.value.integer
+            pc_next_sel[sel] += 1
+            if sel != 0: # PC_NEXT_SEL_STALL
+                ir = dut.instr.value.integer
+                instr[table[(ir & 0x7f) | (ir >> 5 & 0x380) | (ir >> 15 & 0x1fc00)]] += 1
+                if dut.compressed.value:
+                    half = dut.pc_data.value.integer
+                    rvc[(half & 3) * 8 + (half >> 13 & 7)] += 1
+                alu_op[dut.alu_op.value.integer] += 1
+
+
+class AluCoverage(Coverage):
+    """Coverage of the alu toplevel."""
+
+    def __init__(self, dut):
+        super().__init__({
+            'alu_result': Group([f'{op}.{result}' for op in ALU_OPS for result in RESULT_CLASSES],
+                                # Comparisons produce only 0 and 1.
+                                [f'{op}.{result}' for op in ALU_OPS for result in RESULT_CLASSES
+                                 if op in ALU_OPS[:8] or result != 'negative']),
+        })
+        self.dut = dut
+
+    def sample(self):
+        """Count the current operation and result."""
+        res = self.dut.res.value.integer
+        result = 0 if res == 0 else 2 if res >> 31 else 1
+        self.groups['alu_result'].hits[self.dut.op.value.integer * 3 + result] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge and report functional coverage.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser(
+        'report', help="print covered goals per group and list gaps")
+    report_parser.add_argument('inputs', nargs='+', help="coverage files")
+    merge_parser = subparsers.add_parser('merge', help="merge coverage files")
+    merge_parser.add_argument('output', help="merged coverage file")
+    merge_parser.add_argument('inputs', nargs='+', help="coverage files")
+    args = parser.parse_args()
+
+    coverage = Coverage()
+    for path in args.inputs:
+        coverage.merge(load(path))
+    if args.command == 'merge':
+        with open(args.output, 'w') as f:
+            json.dump(coverage.to_json(), f, indent=2)
+            f.write('\n')
+        return 0
+
+    print(f"{'GROUP':12} {'COVERED':>9} {'GOALS':>6} {'%':>7}")
+    for name, group in coverage.groups.items():
+        covered = len(group.goals) - len(group.gaps())
+        percent = 100 * covered / len(group.goals) if group.goals else 100.0
+        print(f"{name:12} {covered:9d} {len(group.goals):6d} {percent:6.2f}%")
+    gaps = coverage.gaps()
+    if gaps:
+        print("\nGaps:")
+        for name, gap in gaps:
+            print(f"  {name}: {gap}")
+    return 1 if gaps else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,639 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Instruction-set simulator of the pako32 CPU.
+
+The model executes the RV32IMC instructions decoded by control.v with the
+memory map of cpu.v, i.e. the instruction memory at MEM_INSTR_ZERO, the data memory at
+MEM_DATA_ZERO and the fifo_if registers at MEM_USB_IO_ZERO. It serves as a fast
+golden reference for the RTL.
+
+Instruction memory is not writable by the CPU so every instruction is decoded
+only once, into a closure which performs its operation and returns the next PC.
+The closures are kept in a dispatch table indexed by the PC, with an entry for
+every halfword since instructions are only 2-byte aligned with the C extension.
+A compressed instruction is first expanded by expand() into its 32-bit
+equivalent, like rvc_expand.v does, and only advances the PC by 2.
+
+Behavior follows control.v where the RISC-V specification leaves it open:
+undecoded instructions (including FENCE, ECALL, EBREAK and illegal compressed
+instructions) execute as NOPs and misaligned data accesses are performed on the
+naturally aligned address. Other cases which the RTL does not handle, such as
+accesses outside of the memory map, raise IssError. CSR instructions only read
+the performance counters, which the ISS does not model without a Counters object
+that provides them.
+"""
+
+import argparse
+import sys
+import time
+
+import const
+import elf
+
+
+M = 0xffffffff
+SIGN = 0x80000000
+
+
+class IssError(Exception):
+    pass
+
+
+def muldiv(funct3, a, b):
+    """Return the result of the RV32M instruction with the given funct3 for
+    operands a and b, which are unsigned 32-bit values.
+
+    Division by zero and the overflow of DIV and REM follow the RISC-V
+    specification, i.e. the quotient is all ones and the remainder is the
+    dividend, and -2**31 / -1 gives -2**31 with a remainder of 0.
+    """
+    sa = (a ^ SIGN) - SIGN
+    sb = (b ^ SIGN) - SIGN
+    if funct3 == const.MULDIV_OP_MUL:
+        return (a * b) & M
+    if funct3 == const.MULDIV_OP_MULH:
+        return ((sa * sb) >> 32) & M
+    if funct3 == const.MULDIV_OP_MULHSU:
+        return ((sa * b) >> 32) & M
+    if funct3 == const.MULDIV_OP_MULHU:
+        return (a * b) >> 32
+    if b == 0:
+        return M if funct3 in (const.MULDIV_OP_DIV, const.MULDIV_OP_DIVU) else a
+    if funct3 == const.MULDIV_OP_DIVU:
+        return a // b
+    if funct3 == const.MULDIV_OP_REMU:
+        return a % b
+    # Signed division rounds towards zero.
+    quotient = abs(sa) // abs(sb)
+    if (sa < 0) != (sb < 0):
+        quotient = -quotient
+    if funct3 == const.MULDIV_OP_DIV:
+        return quotient & M
+    return (sa - sb * quotient) & M
+
+
+def _scatter(half, hi, layout):
+    """Return the immediate of a compressed instruction whose bits hi and below
+    hold the immediate bits listed in layout, in the notation of the RISC-V
+    specification, e.g. '5:3|2|6'."""
+    value = 0
+    pos = hi
+    for field in layout.split('|'):
+        msb, _, lsb = field.partition(':')
+        for bit in range(int(msb), int(lsb or msb) - 1, -1):
+            value |= ((half >> pos) & 1) << bit
+            pos -= 1
+    return value
+
+
+def _sext(value, bits):
+    return ((value ^ (1 << (bits - 1))) - (1 << (bits - 1))) & M
+
+
+def expand(half):
+    """Return the 32-bit instruction equivalent to a compressed instruction.
+
+    Illegal and reserved encodings, including the floating-point loads and
+    stores and the shifts by more than 31 bits, give 0, which executes as a NOP.
+    """
+    def i_type(imm, rs1, funct3, rd, opcode):
+        return ((imm & 0xfff) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+    def r_type(funct7, rs2, rs1, funct3, rd):
+        return (funct7 << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | \
+            0b0110011
+
+    def s_type(imm, rs2, rs1):
+        return ((imm >> 5) << 25) | (rs2 << 20) | (rs1 << 15) | (0b010 << 12) | \
+            ((imm & 0x1f) << 7) | 0b0100011
+
+    def b_type(off, rs1, funct3):
+        return (((off >> 12) & 1) << 31) | (((off >> 5) & 0x3f) << 25) | (rs1 << 15) | \
+            (funct3 << 12) | (((off >> 1) & 0xf) << 8) | (((off >> 11) & 1) << 7) | 0b1100011
+
+    def j_type(off, rd):
+        return (((off >> 20) & 1) << 31) | (((off >> 1) & 0x3ff) << 21) | \
+            (((off >> 11) & 1) << 20) | (((off >> 12) & 0xff) << 12) | (rd << 7) | 0b1101111
+
+    quadrant = half & 3
+    funct3 = half >> 13
+    rd = (half >> 7) & 0x1f
+    rs2 = (half >> 2) & 0x1f
+    # rd'/rs2' and rs1' address x8..x15.
+    rd_p = 8 + ((half >> 2) & 7)
+    rs1_p = 8 + ((half >> 7) & 7)
+    imm = _sext(_scatter(half, 12, '5') | _scatter(half, 6, '4:0'), 6)
+    shamt = _scatter(half, 12, '5') | _scatter(half, 6, '4:0')
+
+    if quadrant == 0b00:
+        if funct3 == 0b000: # C.ADDI4SPN
+            nzuimm = _scatter(half, 12, '5:4|9:6|2|3')
+            return i_type(nzuimm, 2, 0b000, rd_p, 0b0010011) if nzuimm else 0
+        off = _scatter(half, 12, '5:3') | _scatter(half, 6, '2|6')
+        if funct3 == 0b010: # C.LW
+            return i_type(off, rs1_p, 0b010, rd_p, 0b0000011)
+        if funct3 == 0b110: # C.SW
+            return s_type(off, rd_p, rs1_p)
+        return 0
+
+    if quadrant == 0b01:
+        if funct3 == 0b000: # C.ADDI, C.NOP
+            return i_type(imm, rd, 0b000, rd, 0b0010011)
+        if funct3 in (0b001, 0b101): # C.JAL, C.J
+            off = _sext(_scatter(half, 12, '11|4|9:8|10|6|7|3:1|5'), 12)
+            return j_type(off, 1 if funct3 == 0b001 else 0)
+        if funct3 == 0b010: # C.LI
+            return i_type(imm, 0, 0b000, rd, 0b0010011)
+        if funct3 == 0b011:
+            if rd == 2: # C.ADDI16SP
+                nzimm = _sext(_scatter(half, 12, '9') | _scatter(half, 6, '4|6|8:7|5'), 10)
+                return i_type(nzimm, 2, 0b000, 2, 0b0010011)
+            # C.LUI
+            return ((imm << 12) & M) | (rd << 7) | 0b0110111
+        if funct3 == 0b100:
+            funct2 = (half >> 10) & 3
+            if funct2 in (0b00, 0b01): # C.SRLI, C.SRAI
+                if shamt >= 32:
+                    return 0
+                return i_type((funct2 << 10) | shamt, rs1_p, 0b101, rs1_p, 0b0010011)
+            if funct2 == 0b10: # C.ANDI
+                return i_type(imm, rs1_p, 0b111, rs1_p, 0b0010011)
+            if half >> 12 & 1:
+                return 0
+            # C.SUB, C.XOR, C.OR, C.AND
+            funct7, op = ((0b0100000, 0b000), (0, 0b100), (0, 0b110), (0, 0b111))[(half >> 5) & 3]
+            return r_type(funct7, rd_p, rs1_p, op, rs1_p)
+        # C.BEQZ, C.BNEZ
+        off = _sext(_scatter(half, 12, '8|4:3') | _scatter(half, 6, '7:6|2:1|5'), 9)
+        return b_type(off, rs1_p, funct3 & 1)
+
+    if quadrant == 0b10:
+        if funct3 == 0b000: # C.SLLI
+            return i_type(shamt, rd, 0b001, rd, 0b0010011) if shamt < 32 else 0
+        if funct3 == 0b010: # C.LWSP
+            off = _scatter(half, 12, '5') | _scatter(half, 6, '4:2|7:6')
+            return i_type(off, 2, 0b010, rd, 0b0000011)
+        if funct3 == 0b100:
+            if not half >> 12 & 1:
+                if rs2 == 0: # C.JR
+                    return i_type(0, rd, 0b000, 0, 0b1100111)
+                return r_type(0, rs2, 0, 0b000, rd) # C.MV
+            if rs2 == 0 and rd == 0: # C.EBREAK
+                return 0x00100073
+            if rs2 == 0: # C.JALR
+                return i_type(0, rd, 0b000, 1, 0b1100111)
+            return r_type(0, rs2, rd, 0b000, rd) # C.ADD
+        if funct3 == 0b110: # C.SWSP
+            return s_type(_scatter(half, 12, '5:2|7:6'), rs2, 2)
+    return 0
+
+
+class Fifo:
+    """Software view of the fifo_if registers.
+
+    Bytes in rx wait to be read by the CPU, bytes written by the CPU are
+    appended to tx. The host side is assumed to consume output immediately.
+    """
+
+    def __init__(self, rx=b''):
+        self.rx = bytearray(rx)
+        self.tx = bytearray()
+        self.buffer = 0
+
+    def read(self, addr):
+        if addr == 1: # to_usb, ready status
+            return 1
+        if addr == 2: # from_usb_ready
+            return 1 if self.rx else 0
+        if addr == 3: # from_usb_byte
+            if self.rx:
+                self.buffer = self.rx.pop(0)
+            return self.buffer
+        return 0
+
+    def write(self, addr, value):
+        if addr == 1: # to_usb, byte to send
+            self.tx.append(value & 0xff)
+
+
+class Counters:
+    """Software view of the read-only CSRs, all counters read as 0."""
+
+    def read(self, csr):
+        return 0
+
+
+class Iss:
+    """Architectural state of the CPU and the execution engine."""
+
+    def __init__(self, text=b'', data=b'', rows=const.MEM_ROWS, fifo=None,
+                 counters=None):
+        size = 4 * rows
+        if len(text) > size or len(data) > size:
+            raise IssError(f"image does not fit into {rows} rows")
+
+        self.pc = const.MEM_INSTR_ZERO
+        # x0 reads as zero, writes to it go to the extra sink entry regs[32].
+        self.regs = 33 * [0]
+        self.retired = 0
+        self.fifo = fifo if fifo is not None else Fifo()
+        self.counters = counters if counters is not None else Counters()
+
+        text = bytes(text) + bytes(size - len(text))
+        self.text = memoryview(text).cast('H')
+        self.data = bytearray(data) + bytearray(size - len(data))
+
+        # Typed views of the data memory for the individual access sizes.
+        view = memoryview(self.data)
+        self._views = (view, view.cast('b'), view.cast('H'), view.cast('h'),
+                       view.cast('I'))
+
+        self._code = {}
+        for i in range(len(self.text)):
+            pc = const.MEM_INSTR_ZERO + 2 * i
+            self._code[pc] = self._decode(self.fetch(pc), pc)
+
+    @classmethod
+    def from_elf(cls, path, **kwargs):
+        """Create a simulator with the text and data sections of an ELF file."""
+        return cls(*elf.read_images(path), **kwargs)
+
+    def fetch(self, pc):
+        """Return the word at a 2-byte aligned address of the instruction memory,
+        the part past its end reads as zero."""
+        i = (pc - const.MEM_INSTR_ZERO) >> 1
+        high = self.text[i + 1] if i + 1 < len(self.text) else 0
+        return self.text[i] | (high << 16)
+
+    def run(self, count):
+        """Execute count instructions."""
+        code = self._code
+        pc = self.pc
+        left = count
+        try:
+            while left:
+                pc = code[pc]()
+                left -= 1
+        except KeyError:
+            raise IssError(f"instruction fetch from invalid address {pc:#x}") from None
+        finally:
+            self.pc = pc
+            self.retired += count - left
+
+    def run_until(self, stop, count):
+        """Execute at most count instructions until the PC reaches stop."""
+        code = self._code
+        pc = self.pc
+        left = count
+        try:
+            while left and pc != stop:
+                pc = code[pc]()
+                left -= 1
+        except KeyError:
+            raise IssError(f"instruction fetch from invalid address {pc:#x}") from None
+        finally:
+            self.pc = pc
+            self.retired += count - left
+
+    def step(self):
+        """Execute one instruction."""
+        self.run(1)
+
+    def _decode(self, word, pc):
+        """Translate one instruction into its handler."""
+        regs = self.regs
+        size = len(self.data)
+        bytes_u, bytes_s, halves_u, halves_s, words = self._views
+        fifo = self.fifo
+        counters = self.counters
+        DATA = const.MEM_DATA_ZERO
+        USB = const.MEM_USB_IO_ZERO
+
+        if word & 3 != 3:
+            word, nxt = expand(word & 0xffff), pc + 2
+        else:
+            nxt = pc + 4
+
+        opcode = word & 0x7f
+        rd = (word >> 7) & 0x1f or 32
+        funct3 = (word >> 12) & 0x7
+        rs1 = (word >> 15) & 0x1f
+        rs2 = (word >> 20) & 0x1f
+        funct7 = word >> 25
+        imm_i = ((word >> 20) ^ 0x800) - 0x800
+
+        if opcode == 0b0110111: # LUI
+            value = word & 0xfffff000
+            def op():
+                regs[rd] = value
+                return nxt
+            return op
+
+        if opcode == 0b0010111: # AUIPC
+            value = (pc + (word & 0xfffff000)) & M
+            def op():
+                regs[rd] = value
+                return nxt
+            return op
+
+        if opcode == 0b1101111: # JAL
+            off = (((word >> 31) << 20) | (((word >> 12) & 0xff) << 12) |
+                   (((word >> 20) & 1) << 11) | (((word >> 21) & 0x3ff) << 1))
+            target = (pc + (off ^ 0x100000) - 0x100000) & M
+            def op():
+                regs[rd] = nxt
+                return target
+            return op
+
+        if opcode == 0b1100111: # JALR
+            def op():
+                target = (regs[rs1] + imm_i) & M & ~1
+                regs[rd] = nxt
+                return target
+            return op
+
+        if opcode == 0b1100011: # B-type
+            off = (((word >> 31) << 12) | (((word >> 7) & 1) << 11) |
+                   (((word >> 25) & 0x3f) << 5) | (((word >> 8) & 0xf) << 1))
+            target = (pc + (off ^ 0x1000) - 0x1000) & M
+            if funct3 == 0b000: # BEQ
+                def op():
+                    return target if regs[rs1] == regs[rs2] else nxt
+                return op
+            if funct3 == 0b001: # BNE
+                def op():
+                    return target if regs[rs1] != regs[rs2] else nxt
+                return op
+            if funct3 == 0b100: # BLT
+                def op():
+                    return target if regs[rs1] ^ SIGN < regs[rs2] ^ SIGN else nxt
+                return op
+            if funct3 == 0b101: # BGE
+                def op():
+                    return target if regs[rs1] ^ SIGN >= regs[rs2] ^ SIGN else nxt
+                return op
+            if funct3 == 0b110: # BLTU
+                def op():
+                    return target if regs[rs1] < regs[rs2] else nxt
+                return op
+            if funct3 == 0b111: # BGEU
+                def op():
+                    return target if regs[rs1] >= regs[rs2] else nxt
+                return op
+            return _nop(nxt)
+
+        if opcode == 0b0000011: # L{B,H,W,BU,HU}
+            # Access size from funct3[1:0], sign extension unless funct3[2],
+            # same as in control.v and mem_control.v.
+            if funct3 & 3 == const.MEM_ACCESS_BYTE:
+                view, shift = (bytes_u if funct3 & 4 else bytes_s), 0
+            elif funct3 & 3 == const.MEM_ACCESS_HALFWORD:
+                view, shift = (halves_u if funct3 & 4 else halves_s), 1
+            else:
+                view, shift = words, 2
+            def op():
+                addr = (regs[rs1] + imm_i) & M
+                off = addr - DATA
+                if 0 <= off < size:
+                    regs[rd] = view[off >> shift] & M
+                elif 0 <= addr - USB < 4:
+                    regs[rd] = fifo.read(addr - USB)
+                else:
+                    raise IssError(f"load from invalid address {addr:#x} at pc {pc:#x}")
+                return nxt
+            return op
+
+        if opcode == 0b0100011: # S{B,H,W}
+            imm_s = ((((word >> 25) << 5) | ((word >> 7) & 0x1f)) ^ 0x800) - 0x800
+            if funct3 & 3 == const.MEM_ACCESS_BYTE:
+                view, shift, mask = bytes_u, 0, 0xff
+            elif funct3 & 3 == const.MEM_ACCESS_HALFWORD:
+                view, shift, mask = halves_u, 1, 0xffff
+            else:
+                view, shift, mask = words, 2, M
+            def op():
+                addr = (regs[rs1] + imm_s) & M
+                off = addr - DATA
+                if 0 <= off < size:
+                    view[off >> shift] = regs[rs2] & mask
+                elif 0 <= addr - USB < 4:
+                    fifo.write(addr - USB, regs[rs2])
+                else:
+                    raise IssError(f"store to invalid address {addr:#x} at pc {pc:#x}")
+                return nxt
+            return op
+
+        if opcode == 0b0010011: # I-type
+            imm = imm_i & M
+            shamt = rs2
+            if funct3 == 0b000: # ADDI
+                def op():
+                    regs[rd] = (regs[rs1] + imm) & M
+                    return nxt
+                return op
+            if funct3 == 0b010: # SLTI
+                simm = imm ^ SIGN
+                def op():
+                    regs[rd] = 1 if regs[rs1] ^ SIGN < simm else 0
+                    return nxt
+                return op
+            if funct3 == 0b011: # SLTIU
+                def op():
+                    regs[rd] = 1 if regs[rs1] < imm else 0
+                    return nxt
+                return op
+            if funct3 == 0b100: # XORI
+                def op():
+                    regs[rd] = regs[rs1] ^ imm
+                    return nxt
+                return op
+            if funct3 == 0b110: # ORI
+                def op():
+                    regs[rd] = regs[rs1] | imm
+                    return nxt
+                return op
+            if funct3 == 0b111: # ANDI
+                def op():
+                    regs[rd] = regs[rs1] & imm
+                    return nxt
+                return op
+            if funct3 == 0b001 and funct7 == 0b0000000: # SLLI
+                def op():
+                    regs[rd] = (regs[rs1] << shamt) & M
+                    return nxt
+                return op
+            if funct3 == 0b101 and funct7 == 0b0000000: # SRLI
+                def op():
+                    regs[rd] = regs[rs1] >> shamt
+                    return nxt
+                return op
+            if funct3 == 0b101 and funct7 == 0b0100000: # SRAI
+                def op():
+                    regs[rd] = (((regs[rs1] ^ SIGN) - SIGN) >> shamt) & M
+                    return nxt
+                return op
+            return _nop(nxt)
+
+        if opcode == 0b0110011: # R-type
+            if funct7 == 0b0000000:
+                if funct3 == 0b000: # ADD
+                    def op():
+                        regs[rd] = (regs[rs1] + regs[rs2]) & M
+                        return nxt
+                    return op
+                if funct3 == 0b001: # SLL
+                    def op():
+                        regs[rd] = (regs[rs1] << (regs[rs2] & 31)) & M
+                        return nxt
+                    return op
+                if funct3 == 0b010: # SLT
+                    def op():
+                        regs[rd] = 1 if regs[rs1] ^ SIGN < regs[rs2] ^ SIGN else 0
+                        return nxt
+                    return op
+                if funct3 == 0b011: # SLTU
+                    def op():
+                        regs[rd] = 1 if regs[rs1] < regs[rs2] else 0
+                        return nxt
+                    return op
+                if funct3 == 0b100: # XOR
+                    def op():
+                        regs[rd] = regs[rs1] ^ regs[rs2]
+                        return nxt
+                    return op
+                if funct3 == 0b101: # SRL
+                    def op():
+                        regs[rd] = regs[rs1] >> (regs[rs2] & 31)
+                        return nxt
+                    return op
+                if funct3 == 0b110: # OR
+                    def op():
+                        regs[rd] = regs[rs1] | regs[rs2]
+                        return nxt
+                    return op
+                if funct3 == 0b111: # AND
+                    def op():
+                        regs[rd] = regs[rs1] & regs[rs2]
+                        return nxt
+                    return op
+            elif funct7 == 0b0000001: # MUL[H[[S]U]], DIV[U], REM[U]
+                def op():
+                    regs[rd] = muldiv(funct3, regs[rs1], regs[rs2])
+                    return nxt
+                return op
+            elif funct7 == 0b0100000:
+                if funct3 == 0b000: # SUB
+                    def op():
+                        regs[rd] = (regs[rs1] - regs[rs2]) & M
+                        return nxt
+                    return op
+                if funct3 == 0b101: # SRA
+                    def op():
+                        regs[rd] = (((regs[rs1] ^ SIGN) - SIGN) >> (regs[rs2] & 31)) & M
+                        return nxt
+                    return op
+            return _nop(nxt)
+
+        if opcode == 0b1110011 and funct3 != 0b000: # CSRR{W,S,C}[I]
+            csr = word >> 20
+            def op():
+                regs[rd] = counters.read(csr)
+                return nxt
+            return op
+
+        return _nop(nxt)
+
+
+_BRANCHES = {0b000: 'beq', 0b001: 'bne', 0b100: 'blt', 0b101: 'bge', 0b110: 'bltu',
+             0b111: 'bgeu'}
+_LOADS = {0b000: 'lb', 0b001: 'lh', 0b010: 'lw', 0b100: 'lbu', 0b101: 'lhu'}
+_STORES = {0b000: 'sb', 0b001: 'sh', 0b010: 'sw'}
+_IMM_OPS = {0b000: 'addi', 0b010: 'slti', 0b011: 'sltiu', 0b100: 'xori', 0b110: 'ori',
+            0b111: 'andi'}
+_SHIFT_IMM_OPS = {(0b001, 0b0000000): 'slli', (0b101, 0b0000000): 'srli',
+                  (0b101, 0b0100000): 'srai'}
+_REG_OPS = {(0b000, 0b0000000): 'add', (0b000, 0b0100000): 'sub', (0b001, 0b0000000): 'sll',
+            (0b010, 0b0000000): 'slt', (0b011, 0b0000000): 'sltu', (0b100, 0b0000000): 'xor',
+            (0b101, 0b0000000): 'srl', (0b101, 0b0100000): 'sra', (0b110, 0b0000000): 'or',
+            (0b111, 0b0000000): 'and', (0b000, 0b0000001): 'mul', (0b001, 0b0000001): 'mulh',
+            (0b010, 0b0000001): 'mulhsu', (0b011, 0b0000001): 'mulhu', (0b100, 0b0000001): 'div',
+            (0b101, 0b0000001): 'divu', (0b110, 0b0000001): 'rem', (0b111, 0b0000001): 'remu'}
+_CSR_OPS = {0b001: 'csrrw', 0b010: 'csrrs', 0b011: 'csrrc', 0b101: 'csrrwi',
+            0b110: 'csrrsi', 0b111: 'csrrci'}
+
+
+def disassemble(word):
+    """Return the assembly text of an instruction. A compressed one, in the low
+    halfword of word, is shown as its expansion with a 'c.' prefix."""
+    if word & 3 != 3:
+        instr = expand(word & 0xffff)
+        return f'c.{disassemble(instr)}' if instr else f'.half {word & 0xffff:#06x}'
+
+    opcode = word & 0x7f
+    rd = (word >> 7) & 0x1f
+    funct3 = (word >> 12) & 0x7
+    rs1 = (word >> 15) & 0x1f
+    rs2 = (word >> 20) & 0x1f
+    funct7 = word >> 25
+    imm_i = ((word >> 20) ^ 0x800) - 0x800
+
+    if opcode == 0b0110111:
+        return f'lui x{rd}, {word >> 12:#x}'
+    if opcode == 0b0010111:
+        return f'auipc x{rd}, {word >> 12:#x}'
+    if opcode == 0b1101111:
+        off = (((word >> 31) << 20) | (((word >> 12) & 0xff) << 12) |
+               (((word >> 20) & 1) << 11) | (((word >> 21) & 0x3ff) << 1))
+        return f'jal x{rd}, {(off ^ 0x100000) - 0x100000:#x}'
+    if opcode == 0b1100111:
+        return f'jalr x{rd}, {imm_i}(x{rs1})'
+    if opcode == 0b1100011 and funct3 in _BRANCHES:
+        off = (((word >> 31) << 12) | (((word >> 7) & 1) << 11) |
+               (((word >> 25) & 0x3f) << 5) | (((word >> 8) & 0xf) << 1))
+        return f'{_BRANCHES[funct3]} x{rs1}, x{rs2}, {(off ^ 0x1000) - 0x1000:#x}'
+    if opcode == 0b0000011 and funct3 in _LOADS:
+        return f'{_LOADS[funct3]} x{rd}, {imm_i}(x{rs1})'
+    if opcode == 0b0100011 and funct3 in _STORES:
+        imm_s = ((((word >> 25) << 5) | ((word >> 7) & 0x1f)) ^ 0x800) - 0x800
+        return f'{_STORES[funct3]} x{rs2}, {imm_s}(x{rs1})'
+    if opcode == 0b0010011 and funct3 in _IMM_OPS:
+        return f'{_IMM_OPS[funct3]} x{rd}, x{rs1}, {imm_i}'
+    if opcode == 0b0010011 and (funct3, funct7) in _SHIFT_IMM_OPS:
+        return f'{_SHIFT_IMM_OPS[funct3, funct7]} x{rd}, x{rs1}, {rs2}'
+    if opcode == 0b0110011 and (funct3, funct7) in _REG_OPS:
+        return f'{_REG_OPS[funct3, funct7]} x{rd}, x{rs1}, x{rs2}'
+    if opcode == 0b1110011 and funct3 in _CSR_OPS:
+        src = rs1 if funct3 & 4 else f'x{rs1}'
+        return f'{_CSR_OPS[funct3]} x{rd}, {word >> 20:#x}, {src}'
+    return f'.word {word:#010x}'
+
+
+def _nop(nxt):
+    def op():
+        return nxt
+    return op
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an ELF image on the ISS.")
+    parser.add_argument('elf', help="ELF file to run")
+    parser.add_argument('-n', '--count', type=int, default=10_000_000,
+                        help="number of instructions to execute")
+    parser.add_argument('-i', '--input', default='',
+                        help="data to send to the CPU over the USB FIFO")
+    args = parser.parse_args()
+
+    fifo = Fifo(args.input.encode().decode('unicode_escape').encode('latin-1'))
+    iss = Iss.from_elf(args.elf, fifo=fifo)
+    start = time.perf_counter()
+    iss.run(args.count)
+    elapsed = time.perf_counter() - start
+
+    sys.stdout.write(fifo.tx.decode('latin-1'))
+    print(f"\n{iss.retired} instructions in {elapsed:.3f} s, "
+          f"{iss.retired / elapsed / 1e6:.2f} MIPS", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
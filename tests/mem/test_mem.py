@@ -27,6 +27,7 @@ async def test_write_32B(dut):
 
     for i in range(0, 32, 4):
         dut.wr_en_i.value = 1
+        dut.wr_be_i.value = 0xf
         dut.addr_w_i.value = i
         dut.data_w_i.value = 0x12345678
         await FallingEdge(dut.clk_i)
@@ -39,6 +40,29 @@ async def test_write_32B(dut):
         dut.r_en_i.value = 0
 
 
+@cocotb.test()
+async def test_write_byte_enable(dut):
+    """Only bytes selected by wr_be_i are written."""
+    await utils.init_dut_noreset(dut)
+
+    dut.wr_en_i.value = 1
+    dut.wr_be_i.value = 0xf
+    dut.addr_w_i.value = 4
+    dut.data_w_i.value = 0xdeadbeef
+    await FallingEdge(dut.clk_i)
+
+    expected = 0xdeadbeef
+    for be, value in [(0x1, 0x11111111), (0x4, 0x22222222), (0xc, 0x33333333),
+                      (0x2, 0x44444444), (0x0, 0x55555555)]:
+        dut.wr_be_i.value = be
+        dut.data_w_i.value = value
+        await FallingEdge(dut.clk_i)
+        mask = sum(0xff << 8 * i for i in range(4) if be >> i & 1)
+        expected = expected & ~mask | value & mask
+        assert dut.mem_01[1].value == expected & 0xffff
+        assert dut.mem_23[1].value == expected >> 16
+
+
 @cocotb.test()
 async def test_write_without_en(dut):
     """Write without wr_en_i is ignored."""
@@ -49,3 +73,71 @@ async def test_write_without_en(dut):
     dut.data_w_i.value = 0xa
     await FallingEdge(dut.clk_i)
     assert dut.data_r_o.value != 0xa 
+
+
+@cocotb.test()
+async def test_load_mem(dut):
+    """Whole memory can be loaded at once through the backdoor."""
+    await utils.init_dut_noreset(dut)
+
+    words = [0x01000000 * i + 0x00abcdef for i in range(64)]
+    await utils.load_mem_words(dut, words + (len(dut.mem_01) - len(words)) * [0])
+    assert dut.mem_01[63].value == 0xcdef
+    assert dut.mem_23[63].value == 0x3fab
+    assert dut.mem_01[64].value == 0
+
+    dut.r_en_i.value = 1
+    for i in range(0, 4 * len(words), 4):
+        dut.addr_r_i.value = i
+        await FallingEdge(dut.clk_i)
+        assert dut.data_r_o.value == words[i // 4]
+
+    await utils.load_mem(dut, b'\x01\x02\x03\x04\x05', fill=0xffffffff)
+    assert dut.mem_01[0].value == 0x0201
+    assert dut.mem_23[0].value == 0x0403
+    assert dut.mem_01[1].value == 0x0005
+    assert dut.mem_23[1].value == 0x0000
+    assert dut.mem_01[2].value == 0xffff
+    assert dut.mem_23[len(dut.mem_23) - 1].value == 0xffff
+
+    await utils.clear_mem(dut)
+    assert dut.mem_01.value == len(dut.mem_01) * [0]
+    assert dut.mem_23.value == len(dut.mem_23) * [0]
+
+
+@cocotb.test()
+async def test_read_half_aligned(dut):
+    """A word at a 2-byte aligned address spans mem_23 of its row and mem_01 of
+    the next one."""
+    await utils.init_dut_noreset(dut)
+
+    words = [0x11110000 * i + 0x0000ffff - i for i in range(8)]
+    await utils.load_mem_words(dut, words + (len(dut.mem_01) - len(words)) * [0])
+    data = b''.join(word.to_bytes(4, 'little') for word in words)
+
+    dut.r_en_i.value = 1
+    for addr in range(0, 4 * (len(words) - 1), 2):
+        dut.addr_r_i.value = addr
+        await FallingEdge(dut.clk_i)
+        assert dut.data_r_o.value == int.from_bytes(data[addr:addr + 4], 'little')
+
+    # The output holds while reads are disabled.
+    dut.r_en_i.value = 0
+    dut.addr_r_i.value = 0
+    await FallingEdge(dut.clk_i)
+    assert dut.data_r_o.value == int.from_bytes(data[addr:addr + 4], 'little')
+
+
+@cocotb.test()
+async def test_read_half_aligned_last_row(dut):
+    """A word at the last halfword of the memory continues in mem_01 of row 0."""
+    await utils.init_dut_noreset(dut)
+
+    rows = len(dut.mem_01)
+    words = [0x44443333] + (rows - 2) * [0] + [0x22221111]
+    await utils.load_mem_words(dut, words)
+
+    dut.r_en_i.value = 1
+    dut.addr_r_i.value = 4 * rows - 2
+    await FallingEdge(dut.clk_i)
+    assert dut.data_r_o.value == 0x33332222
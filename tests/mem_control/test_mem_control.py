@@ -7,13 +7,20 @@ from cocotb.triggers import ClockCycles, FallingEdge
 import utils
 
 
+def image(*words):
+    return b''.join(word.to_bytes(4, 'little') for word in words)
+
+
+def read_word(dut, row):
+    return int.from_bytes(utils.read_mem(dut.u_mem)[4 * row:4 * row + 4], 'little')
+
+
 @cocotb.test()
 async def test_read_byte(dut):
     """Check read of a byte."""
     await utils.init_dut(dut)
 
-    dut.u_mem.mem_01[1].value = 0x4321
-    dut.u_mem.mem_23[1].value = 0x8765
+    await utils.load_mem(dut.u_mem, image(0, 0x87654321))
     dut.sext_i.value = 1
 
     assert dut.state.value == dut.ST_RESET
@@ -53,8 +60,7 @@ async def test_read_halfword(dut):
     """Check read of a halfword."""
     await utils.init_dut(dut)
 
-    dut.u_mem.mem_01[1].value = 0x4321
-    dut.u_mem.mem_23[1].value = 0x8765
+    await utils.load_mem(dut.u_mem, image(0, 0x87654321))
     dut.sext_i.value = 1
 
     assert dut.state.value == dut.ST_RESET
@@ -82,8 +88,7 @@ async def test_read_word(dut):
     """Check read of a word."""
     await utils.init_dut(dut)
 
-    dut.u_mem.mem_01[1].value = 0x4321
-    dut.u_mem.mem_23[1].value = 0x8765
+    await utils.load_mem(dut.u_mem, image(0, 0x87654321))
     dut.sext_i.value = 1
 
     assert dut.state.value == dut.ST_RESET
@@ -100,13 +105,70 @@ async def test_read_word(dut):
     assert dut.data_r_o.value == 0x87654321
 
 
+@cocotb.test()
+async def test_read_back_to_back(dut):
+    """Check that a read can be issued in every cycle and its data is
+    available exactly one cycle later."""
+    await utils.init_dut(dut)
+
+    words = [0x11111111 * i for i in range(1, 9)]
+    await utils.load_mem(dut.u_mem, image(*words))
+    dut.sext_i.value = 0
+
+    await FallingEdge(dut.clk_i)
+    dut.r_en_i.value = 1
+    dut.acc_r_i.value = 2 # MEM_ACCESS_WORD
+    for i in range(len(words)):
+        dut.addr_r_i.value = 4 * i
+        await FallingEdge(dut.clk_i)
+        assert dut.data_r_o.value == words[i]
+
+    # The alignment of the data follows the access of the previous cycle.
+    dut.acc_r_i.value = 0 # MEM_ACCESS_BYTE
+    dut.addr_r_i.value = 0x5
+    await FallingEdge(dut.clk_i)
+    dut.acc_r_i.value = 1 # MEM_ACCESS_HALFWORD
+    dut.addr_r_i.value = 0xa
+    assert dut.data_r_o.value == 0x22
+    await FallingEdge(dut.clk_i)
+    dut.r_en_i.value = 0
+    assert dut.data_r_o.value == 0x3333
+    await FallingEdge(dut.clk_i)
+    assert dut.data_r_o.value == 0
+
+
+@cocotb.test()
+async def test_write_byte(dut):
+    """Check write of a byte."""
+    await utils.init_dut(dut)
+
+    await utils.load_mem(dut.u_mem, image(0, 0xbeefdead))
+
+    await FallingEdge(dut.clk_i)
+    assert dut.state.value == dut.ST_READY
+    assert dut.wr_ready_o.value == 1
+
+    expected = 0xbeefdead
+    for addr, value in [(0x4, 0x21), (0x5, 0x43), (0x6, 0x65), (0x7, 0x87)]:
+        dut.wr_en_i.value = 1
+        dut.acc_w_i.value = 0 # MEM_ACCESS_BYTE
+        dut.addr_w_i.value = addr
+        dut.data_w_i.value = 0xabcdef00 | value
+        await FallingEdge(dut.clk_i)
+        expected = expected & ~(0xff << 8 * (addr & 3)) | value << 8 * (addr & 3)
+        assert read_word(dut, 1) == expected
+        assert dut.state.value == dut.ST_READY
+        assert dut.wr_ready_o.value == 1
+    dut.wr_en_i.value = 0
+    assert expected == 0x87654321
+
+
 @cocotb.test()
 async def test_write_halfword(dut):
     """Check write of a halfword."""
     await utils.init_dut(dut)
 
-    dut.u_mem.mem_01[1].value = 0xdead
-    dut.u_mem.mem_23[1].value = 0xbeef
+    await utils.load_mem(dut.u_mem, image(0, 0xbeefdead))
     dut.sext_i.value = 1
 
     assert dut.state.value == dut.ST_RESET
@@ -121,24 +183,15 @@ async def test_write_halfword(dut):
     dut.addr_w_i.value = 0x4
     dut.data_w_i.value = 0x4321
     await FallingEdge(dut.clk_i)
-    assert dut.u_mem.mem_01[1].value == 0xdead
-    assert dut.u_mem.mem_23[1].value == 0xbeef
-    await FallingEdge(dut.clk_i)
-    dut.wr_en_i.value = 0
-    assert dut.u_mem.mem_01[1].value == 0x4321
-    assert dut.u_mem.mem_23[1].value == 0xbeef
+    assert read_word(dut, 1) == 0xbeef4321
 
     dut.wr_en_i.value = 1
     dut.acc_w_i.value = 1 # MEM_ACCESS_HALFWORD
     dut.addr_w_i.value = 0x6
     dut.data_w_i.value = 0x8765
     await FallingEdge(dut.clk_i)
-    assert dut.u_mem.mem_01[1].value == 0x4321
-    assert dut.u_mem.mem_23[1].value == 0xbeef
-    await FallingEdge(dut.clk_i)
     dut.wr_en_i.value = 0
-    assert dut.u_mem.mem_01[1].value == 0x4321
-    assert dut.u_mem.mem_23[1].value == 0x8765
+    assert read_word(dut, 1) == 0x87654321
 
 
 @cocotb.test()
@@ -146,8 +199,7 @@ async def test_write_word(dut):
     """Check write of a word."""
     await utils.init_dut(dut)
 
-    dut.u_mem.mem_01[1].value = 0xdead
-    dut.u_mem.mem_23[1].value = 0xbeef
+    await utils.load_mem(dut.u_mem, image(0, 0xbeefdead))
     dut.sext_i.value = 1
 
     assert dut.state.value == dut.ST_RESET
@@ -162,12 +214,29 @@ async def test_write_word(dut):
     dut.addr_w_i.value = 0x4
     dut.data_w_i.value = 0x87654321
     await FallingEdge(dut.clk_i)
-    assert dut.u_mem.mem_01[1].value == 0xdead
-    assert dut.u_mem.mem_23[1].value == 0xbeef
+    dut.wr_en_i.value = 0
+    assert read_word(dut, 1) == 0x87654321
+
+
+@cocotb.test()
+async def test_write_read(dut):
+    """Check a write and a read of another word in the same cycle."""
+    await utils.init_dut(dut)
+
+    await utils.load_mem(dut.u_mem, image(0, 0, 0x87654321))
+
+    await FallingEdge(dut.clk_i)
+    dut.wr_en_i.value = 1
+    dut.acc_w_i.value = 2 # MEM_ACCESS_WORD
+    dut.addr_w_i.value = 0x4
+    dut.data_w_i.value = 0x12345678
+    dut.r_en_i.value = 1
+    dut.acc_r_i.value = 2 # MEM_ACCESS_WORD
+    dut.addr_r_i.value = 0x8
     await FallingEdge(dut.clk_i)
     dut.wr_en_i.value = 0
-    assert dut.u_mem.mem_01[1].value == 0x4321
-    assert dut.u_mem.mem_23[1].value == 0x8765
+    assert dut.data_r_o.value == 0x87654321
+    assert read_word(dut, 1) == 0x12345678
 
 
 @cocotb.test()
@@ -189,10 +258,6 @@ async def test_write_32B(dut):
         dut.acc_w_i.value = 2 # MEM_ACCESS_WORD
         dut.addr_w_i.value = i
         dut.data_w_i.value = 0x12345678
-        await FallingEdge(dut.clk_i)
-        assert dut.state.value == dut.ST_WRITE_PENDING
-        assert dut.wr_ready_o.value == 0
-
         await FallingEdge(dut.clk_i)
         dut.wr_en_i.value = 0
         assert dut.state.value == dut.ST_READY
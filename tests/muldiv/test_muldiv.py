@@ -0,0 +1,135 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+import itertools
+import random
+
+import cocotb
+from cocotb.triggers import FallingEdge
+
+import iss
+import utils
+
+
+OPS = ['mul', 'mulh', 'mulhsu', 'mulhu', 'div', 'divu', 'rem', 'remu']
+
+# Operands around the boundaries of signed and unsigned 32-bit values, powers
+# of two and values with one bit cleared.
+CORNERS = [0, 1, 2, 3, 7, 0x7fff, 0x8000, 0xffff, 0x10000, 0x7ffffffe, 0x7fffffff, 0x80000000,
+           0x80000001, 0xaaaaaaaa, 0x55555555, 0xfffffffd, 0xfffffffe, 0xffffffff]
+
+# Cycles from the start of an operation until done_o is set.
+STEPS = 16
+
+
+async def run_op(dut, op, a, b, rng=None):
+    """Start an operation on a falling clock edge and return its result and
+    the number of cycles it took.
+
+    The operands are replaced by random values after the start cycle when rng
+    is given, to check that u_muldiv samples them only when it starts.
+    """
+    dut.start_i.value = 1
+    dut.op_i.value = op
+    dut.a_i.value = a
+    dut.b_i.value = b
+    await FallingEdge(dut.clk_i)
+    dut.start_i.value = 0
+    if rng is not None:
+        dut.op_i.value = rng.randrange(len(OPS))
+        dut.a_i.value = rng.getrandbits(32)
+        dut.b_i.value = rng.getrandbits(32)
+
+    cycles = 1
+    while not dut.done_o.value:
+        assert cycles <= STEPS, f"{OPS[op]}({a:#x}, {b:#x}) did not finish"
+        await FallingEdge(dut.clk_i)
+        cycles += 1
+    return dut.res_o.value.integer, cycles
+
+
+async def check_op(dut, op, a, b, rng=None):
+    res, cycles = await run_op(dut, op, a, b, rng)
+    expected = iss.muldiv(op, a, b)
+    assert res == expected, \
+        f"{OPS[op]}({a:#x}, {b:#x}) is {res:#x}, expected {expected:#x}"
+    assert cycles == STEPS + 1
+
+
+@cocotb.test()
+async def test_mul(dut):
+    """Check multiplication of small numbers."""
+    await utils.init_dut(dut)
+    await FallingEdge(dut.clk_i)
+
+    res, cycles = await run_op(dut, 0, 6, 7) # MULDIV_OP_MUL
+    assert res == 42
+    assert cycles == STEPS + 1
+
+
+@cocotb.test()
+async def test_div_zero(dut):
+    """Check division by zero."""
+    await utils.init_dut(dut)
+    await FallingEdge(dut.clk_i)
+
+    res, _ = await run_op(dut, 4, 0xfffffff9, 0) # MULDIV_OP_DIV
+    assert res == 0xffffffff
+    res, _ = await run_op(dut, 5, 7, 0) # MULDIV_OP_DIVU
+    assert res == 0xffffffff
+    res, _ = await run_op(dut, 6, 0xfffffff9, 0) # MULDIV_OP_REM
+    assert res == 0xfffffff9
+    res, _ = await run_op(dut, 7, 7, 0) # MULDIV_OP_REMU
+    assert res == 7
+
+
+@cocotb.test()
+async def test_div_overflow(dut):
+    """Check signed division of the most negative value by -1."""
+    await utils.init_dut(dut)
+    await FallingEdge(dut.clk_i)
+
+    res, _ = await run_op(dut, 4, 0x80000000, 0xffffffff) # MULDIV_OP_DIV
+    assert res == 0x80000000
+    res, _ = await run_op(dut, 6, 0x80000000, 0xffffffff) # MULDIV_OP_REM
+    assert res == 0
+
+
+@cocotb.test()
+async def test_result_held(dut):
+    """Check that the result stays valid until the next operation starts."""
+    await utils.init_dut(dut)
+    await FallingEdge(dut.clk_i)
+
+    res, _ = await run_op(dut, 3, 0xffffffff, 0xffffffff) # MULDIV_OP_MULHU
+    assert res == 0xfffffffe
+    for _ in range(4):
+        await FallingEdge(dut.clk_i)
+        assert dut.done_o.value == 1
+        assert dut.res_o.value == 0xfffffffe
+
+
+@cocotb.test()
+async def test_corners(dut):
+    """Check all operations with all pairs of corner operands."""
+    await utils.init_dut(dut)
+    await FallingEdge(dut.clk_i)
+
+    for op, a, b in itertools.product(range(len(OPS)), CORNERS, CORNERS):
+        await check_op(dut, op, a, b)
+
+
+@cocotb.test()
+async def test_random(dut):
+    """Check all operations with random operands."""
+    rng = random.Random(cocotb.RANDOM_SEED)
+    await utils.init_dut(dut)
+    await FallingEdge(dut.clk_i)
+
+    for _ in range(2000):
+        op = rng.randrange(len(OPS))
+        a = rng.choice([rng.getrandbits(32), rng.getrandbits(rng.randint(1, 32)),
+                        rng.choice(CORNERS)])
+        b = rng.choice([rng.getrandbits(32), rng.getrandbits(rng.randint(1, 32)),
+                        rng.choice(CORNERS)])
+        await check_op(dut, op, a, b, rng)
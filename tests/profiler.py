@@ -0,0 +1,178 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""PC-sampling profiler of firmware running on the cpu toplevel.
+
+Profiler samples the program counter and the state of the control FSM on
+falling clock edges and counts the samples in arrays indexed by the halfword of
+the instruction memory at which the instruction starts, as compressed
+instructions are 2-byte aligned. Samples are symbolized against function
+symbols of the firmware ELF when a report is written:
+
+- write_report() produces a flat profile of functions followed by the hottest
+  instructions,
+- write_folded() produces folded stacks, one line "caller;callee samples" per
+  stack, suitable as the input of flamegraph.pl and similar tools.
+
+Stacks are reconstructed from calls and returns retired by the core, i.e.
+jal/jalr which link to ra and jalr x0, 0(ra).
+"""
+
+import array
+import bisect
+
+import cocotb
+from cocotb.triggers import ClockCycles, FallingEdge
+
+import const
+import elf
+import iss
+import utils
+
+
+# Upper limit of the tracked call depth, guards against code which calls
+# without ever returning.
+MAX_DEPTH = 64
+
+
+class Profiler:
+    """Profile of a program running on the cpu toplevel.
+
+    A sample is taken every stride cycles. Samples in ST_READ_STALL and
+    ST_MULDIV_STALL are additionally counted as stalls.
+    Tracking of calls needs to look at every retired instruction, with
+    stacks=False the profiler only wakes up for the samples.
+    """
+
+    def __init__(self, dut, stride=1, stacks=True):
+        if stride < 1:
+            raise ValueError(f"invalid stride {stride}")
+        self.dut = dut
+        self.stride = stride
+        self.stacks = stacks
+        slots = 2 * len(dut.u_mem_instr.u_mem.mem_01)
+        self.hits = array.array('Q', bytes(8 * slots))
+        self.stall_hits = array.array('Q', bytes(8 * slots))
+        # Samples by (call sites on the stack, slot).
+        self.stack_hits = {}
+        self.samples = 0
+        self._task = None
+
+    def start(self):
+        """Start sampling in the background."""
+        self._task = cocotb.start_soon(self.run())
+
+    def stop(self):
+        """Stop sampling started by start()."""
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    async def run(self):
+        """Take samples until the coroutine is killed."""
+        dut = self.dut
+        control = dut.u_control
+        st_reset = control.ST_RESET.value
+        st_stalls = (control.ST_READ_STALL.value, control.ST_MULDIV_STALL.value)
+        hits = self.hits
+        stall_hits = self.stall_hits
+        stack_hits = self.stack_hits
+        slots = len(hits)
+        stack = ()
+        countdown = self.stride
+
+        while True:
+            if self.stacks:
+                await FallingEdge(dut.clk_i)
+            else:
+                await ClockCycles(dut.clk_i, self.stride, rising=False)
+            state = control.state.value
+            if state == st_reset:
+                continue
+            pc = dut.pc.value.integer
+            slot = ((pc - const.MEM_INSTR_ZERO) >> 1) % slots
+
+            countdown -= 1
+            if not self.stacks or countdown == 0:
+                countdown = self.stride
+                self.samples += 1
+                hits[slot] += 1
+                if state in st_stalls:
+                    stall_hits[slot] += 1
+                if self.stacks:
+                    key = (stack, slot)
+                    stack_hits[key] = stack_hits.get(key, 0) + 1
+
+            if self.stacks and dut.pc_next_sel.value != 0: # PC_NEXT_SEL_STALL
+                ir = dut.instr.value.integer
+                opcode = ir & 0x7f
+                rd = (ir >> 7) & 0x1f
+                if opcode in (0b1101111, 0b1100111) and rd == 1:
+                    if len(stack) < MAX_DEPTH:
+                        stack += (slot,)
+                elif opcode == 0b1100111 and rd == 0 and (ir >> 15) & 0x1f == 1:
+                    stack = stack[:-1]
+
+    def write_report(self, path, symbols, top=20):
+        """Write a flat per-function profile and the top hottest instructions."""
+        symbolizer = Symbolizer(symbols)
+        functions = {}
+        for slot, count in enumerate(self.hits):
+            if count:
+                name = symbolizer.name(const.MEM_INSTR_ZERO + 2 * slot)
+                total, stalls = functions.get(name, (0, 0))
+                functions[name] = (total + count, stalls + self.stall_hits[slot])
+
+        samples = max(self.samples, 1)
+        with open(path, 'w') as f:
+            f.write(f"Samples: {self.samples}, stride: {self.stride} cycle(s)\n\n")
+            f.write(f"{'SAMPLES':>9} {'%':>7} {'STALLS':>9}  FUNCTION\n")
+            for name, (total, stalls) in sorted(functions.items(),
+                                                key=lambda item: (-item[1][0], item[0])):
+                f.write(f"{total:9d} {100 * total / samples:6.2f}% {stalls:9d}  {name}\n")
+
+            f.write(f"\n{'SAMPLES':>9} {'%':>7} {'STALLS':>9}  {'ADDRESS':10}  INSTRUCTION\n")
+            slots = sorted((slot for slot, count in enumerate(self.hits) if count),
+                           key=lambda slot: -self.hits[slot])[:top]
+            text = utils.read_mem(self.dut.u_mem_instr.u_mem)
+            for slot in slots:
+                addr = const.MEM_INSTR_ZERO + 2 * slot
+                word = int.from_bytes(text[2 * slot:2 * slot + 4], 'little')
+                f.write(f"{self.hits[slot]:9d} {100 * self.hits[slot] / samples:6.2f}% "
+                        f"{self.stall_hits[slot]:9d}  {addr:#010x}  "
+                        f"{iss.disassemble(word):24}  <{symbolizer.name(addr)}>\n")
+
+    def write_folded(self, path, symbols):
+        """Write folded stacks of the samples."""
+        symbolizer = Symbolizer(symbols)
+        folded = {}
+        for (stack, slot), count in self.stack_hits.items():
+            frames = [symbolizer.name(const.MEM_INSTR_ZERO + 2 * site) for site in stack]
+            frames.append(symbolizer.name(const.MEM_INSTR_ZERO + 2 * slot))
+            line = ';'.join(frames)
+            folded[line] = folded.get(line, 0) + count
+        with open(path, 'w') as f:
+            for line, count in sorted(folded.items()):
+                f.write(f"{line} {count}\n")
+
+
+class Symbolizer:
+    """Mapping of addresses to names of the function symbols which contain them."""
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.addrs = [symbol.addr for symbol in symbols]
+
+    def name(self, addr):
+        i = bisect.bisect_right(self.addrs, addr) - 1
+        if i >= 0:
+            symbol = self.symbols[i]
+            # Symbols without a size extend up to the next one.
+            if addr < symbol.addr + symbol.size or symbol.size == 0:
+                return symbol.name
+        return f'[{addr:#x}]'
+
+
+def read_symbols(path):
+    """Read function symbols of an ELF file."""
+    return elf.read_elf(path).symbols
@@ -0,0 +1,266 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Parallel runner of the cocotb test suites.
+
+Each subdirectory of tests/ with a Makefile is a suite. The runner imports the
+suite's MODULE to list its cocotb tests and then runs every test as a separate
+`make TESTCASE=<test>` job on a pool of workers. A job builds and simulates in
+its own directory sim_build/runner/<test> of the suite so that concurrent jobs
+do not clobber each other. Results of all jobs are merged into a single JUnit
+XML file.
+
+Durations recorded in a previous merged file are used to start the longest
+tests first, so the total time approaches that of the slowest single test when
+enough cores are available. When the simulator build cache of Makefile.common
+is enabled, the first job of a suite compiles the design and the remaining
+jobs of the suite reuse it.
+"""
+
+import argparse
+import concurrent.futures
+import os
+import random
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Script listing cocotb tests of a module, except those marked with skip=True
+# as TESTCASE would force them to run. It runs in a fresh interpreter because
+# test modules of different suites share names with each other.
+_LIST_TESTS = '''
+import importlib, sys
+import cocotb.regression
+module = importlib.import_module(sys.argv[1])
+for name, thing in vars(module).items():
+    if isinstance(thing, cocotb.regression.Test) and not thing.skip:
+        print(name)
+'''
+
+
+class Job:
+    """Single `make` invocation running one test, or a whole suite if test is
+    None."""
+
+    def __init__(self, suite, test):
+        self.suite = suite
+        self.test = test
+        self.returncode = None
+        self.elapsed = 0.0
+        self.testcases = []
+
+    @property
+    def name(self):
+        return f'{self.suite}.{self.test}' if self.test else self.suite
+
+    @property
+    def build_dir(self):
+        return os.path.join('sim_build', 'runner', self.test or 'all')
+
+    @property
+    def results_file(self):
+        return os.path.join(TESTS_DIR, self.suite, self.build_dir, 'results.xml')
+
+    @property
+    def log_file(self):
+        return os.path.join(TESTS_DIR, self.suite, self.build_dir, 'make.log')
+
+
+def find_suites():
+    """Return names of all test suites."""
+    return sorted(entry.name for entry in os.scandir(TESTS_DIR)
+                  if entry.is_dir() and os.path.exists(os.path.join(entry.path, 'Makefile')))
+
+
+def _make_variable(suite, name):
+    with open(os.path.join(TESTS_DIR, suite, 'Makefile')) as f:
+        for line in f:
+            key, sep, value = line.partition('=')
+            if sep and key.strip() == name:
+                return value.strip()
+    return None
+
+
+def list_tests(suite):
+    """Return names of cocotb tests in a suite, or None if they cannot be
+    determined."""
+    module = _make_variable(suite, 'MODULE')
+    if module is None:
+        return None
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.join(TESTS_DIR, suite), TESTS_DIR] +
+        ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    proc = subprocess.run([sys.executable, '-c', _LIST_TESTS, module], env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.split()
+
+
+def read_durations(path):
+    """Return durations of tests recorded in a merged results file."""
+    durations = {}
+    try:
+        root = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return durations
+    for testsuite in root.iter('testsuite'):
+        for testcase in testsuite.iter('testcase'):
+            name = f"{testsuite.get('name')}.{testcase.get('name')}"
+            durations[name] = float(testcase.get('time', 0))
+    return durations
+
+
+def run_job(job, make_args, env):
+    """Run a job and record its return code and wall-clock time."""
+    os.makedirs(os.path.dirname(job.log_file), exist_ok=True)
+    args = ['make', '-C', os.path.join(TESTS_DIR, job.suite),
+            f'SIM_BUILD={job.build_dir}', f'COCOTB_RESULTS_FILE={job.results_file}']
+    if job.test:
+        args.append(f'TESTCASE={job.test}')
+    args += make_args
+    # The results file of a previous run must not be mistaken for a new one.
+    if os.path.exists(job.results_file):
+        os.remove(job.results_file)
+    start = time.monotonic()
+    with open(job.log_file, 'w') as log:
+        job.returncode = subprocess.call(args, stdout=log, stderr=subprocess.STDOUT, env=env)
+    job.elapsed = time.monotonic() - start
+    try:
+        job.testcases = list(ET.parse(job.results_file).getroot().iter('testcase'))
+    except (OSError, ET.ParseError):
+        job.testcases = []
+    return job
+
+
+def _failed(testcase):
+    return testcase.find('failure') is not None or testcase.find('error') is not None
+
+
+def print_job(job):
+    """Print the status and wall-clock time of each test of a finished job."""
+    if not job.testcases:
+        print(f"{job.name:40} ERROR {'':8}  {job.elapsed:8.2f}s  see {job.log_file}")
+        return
+    for testcase in job.testcases:
+        if _failed(testcase):
+            status = 'FAIL'
+        elif testcase.find('skipped') is not None:
+            status = 'SKIP'
+        else:
+            status = 'PASS'
+        print(f"{job.suite + '.' + testcase.get('name'):40} {status:5} "
+              f"{float(testcase.get('time', 0)):8.2f}s {job.elapsed:8.2f}s")
+
+
+def merge_results(jobs, path, sim):
+    """Merge results of all jobs into one JUnit XML file and return numbers of
+    passed and failed tests."""
+    root = ET.Element('testsuites', name='results')
+    testsuites = {}
+    passed = failed = 0
+    for job in jobs:
+        testsuite = testsuites.get(job.suite)
+        if testsuite is None:
+            testsuite = ET.SubElement(root, 'testsuite', name=job.suite, package=job.suite)
+            properties = ET.SubElement(testsuite, 'properties')
+            ET.SubElement(properties, 'property', name='sim', value=sim)
+            testsuites[job.suite] = testsuite
+
+        if not job.testcases:
+            # The simulation did not start or crashed, report the whole job.
+            testcase = ET.SubElement(testsuite, 'testcase', name=job.test or 'all',
+                                     classname=job.suite, time=f'{job.elapsed:.2f}')
+            ET.SubElement(testcase, 'error',
+                          message=f'make exited with {job.returncode}, see {job.log_file}')
+            failed += 1
+            continue
+
+        for testcase in job.testcases:
+            testsuite.append(testcase)
+            if _failed(testcase):
+                failed += 1
+            elif testcase.find('skipped') is None:
+                passed += 1
+
+    ET.ElementTree(root).write(path, encoding='UTF-8', xml_declaration=True)
+    return passed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run cocotb test suites in parallel.",
+        epilog="Arguments of the form VAR=value are passed to make, e.g. SIM=verilator.")
+    parser.add_argument('suites', nargs='*', metavar='SUITE',
+                        help="suite to run, all suites by default")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="number of parallel jobs (default: number of CPUs)")
+    parser.add_argument('-o', '--output', default=os.path.join(TESTS_DIR, 'results.xml'),
+                        help="merged JUnit XML file (default: %(default)s)")
+    parser.add_argument('-s', '--seed', type=int,
+                        help="RANDOM_SEED shared by all tests (default: random)")
+    args = parser.parse_intermixed_args()
+
+    make_args = [arg for arg in args.suites if '=' in arg]
+    suites = [arg for arg in args.suites if '=' not in arg] or find_suites()
+    for suite in suites:
+        if suite not in find_suites():
+            parser.error(f"unknown suite '{suite}'")
+
+    jobs = []
+    for suite in suites:
+        tests = list_tests(suite)
+        if tests is None:
+            print(f"{suite}: cannot list tests, running the suite as one job")
+            jobs.append(Job(suite, None))
+        else:
+            jobs.extend(Job(suite, test) for test in tests)
+    durations = read_durations(args.output)
+    jobs.sort(key=lambda job: durations.get(job.name, 0), reverse=True)
+
+    seed = args.seed if args.seed is not None else random.getrandbits(31)
+    env = dict(os.environ)
+    env['RANDOM_SEED'] = str(seed)
+    sim = env.get('SIM', 'icarus')
+    for arg in make_args:
+        if arg.startswith('SIM='):
+            sim = arg[len('SIM='):]
+    print(f"Running {len(jobs)} jobs with {args.jobs} workers, SIM={sim}, RANDOM_SEED={seed}")
+    print(f"{'TEST':40} {'':5} {'TEST':>9} {'JOB':>9}")
+
+    # With the build cache enabled, only the first job of each suite starts
+    # right away and compiles the design, the rest of the suite waits for it
+    # and then reuses the cached build.
+    cache = 'SIM_CACHE_DIR=' not in make_args and env.get('SIM_CACHE_DIR') != ''
+    held = {}
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = set()
+        for job in jobs:
+            if cache and job.suite in held:
+                held[job.suite].append(job)
+            else:
+                held[job.suite] = []
+                futures.add(executor.submit(run_job, job, make_args, env))
+        while futures:
+            done, futures = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                job = future.result()
+                print_job(job)
+                futures.update(executor.submit(run_job, held_job, make_args, env)
+                               for held_job in held.pop(job.suite, []))
+    elapsed = time.monotonic() - start
+
+    passed, failed = merge_results(sorted(jobs, key=lambda job: job.name), args.output, sim)
+    print(f"{passed} passed, {failed} failed in {elapsed:.2f}s, results in {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
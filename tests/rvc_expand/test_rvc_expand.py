@@ -0,0 +1,38 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+import random
+
+import cocotb
+from cocotb.triggers import Timer
+
+import iss
+
+
+async def check_word(dut, word):
+    dut.data_i.value = word
+    await Timer(1)
+    compressed = word & 3 != 3
+    expected = iss.expand(word & 0xffff) if compressed else word
+    instr = dut.instr_o.value.integer
+    assert dut.compressed_o.value == compressed, f"{word:#010x} compressed_o is wrong"
+    assert instr == expected, \
+        f"{word:#010x} expands to {instr:#010x}, expected {expected:#010x}"
+
+
+@cocotb.test()
+async def test_compressed(dut):
+    """Check the expansion of all compressed instructions against the ISS."""
+    rng = random.Random(0)
+    for half in range(0x10000):
+        if half & 3 != 3:
+            # The upper halfword is the next instruction and must not matter.
+            await check_word(dut, (rng.getrandbits(16) << 16) | half)
+
+
+@cocotb.test()
+async def test_uncompressed(dut):
+    """Check that 32-bit instructions are passed through."""
+    rng = random.Random(0)
+    for _ in range(1000):
+        await check_word(dut, rng.getrandbits(32) | 3)
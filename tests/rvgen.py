@@ -0,0 +1,271 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Constrained-random generator of RV32IMC programs for the cpu toplevel.
+
+A generated program has the following layout:
+
+    prologue: x31 = MEM_DATA_ZERO, x30 = iterations, x1..x28 = random values
+    body:     random instructions
+    tail:     addi x30, x30, -1; bne x30, x0, body
+    end:      jal x0, end
+
+Branches and jumps in the body only go forward, at most to the tail, so every
+iteration of the body terminates. Loads and stores address the data memory
+relative to x31, which is never written, and no instruction accesses the USB
+FIFO. Register x29 is reserved as the base of JALR targets.
+
+Compressed instructions are mixed into the body, so 32-bit instructions start
+at 2-byte aligned addresses too. Compressed loads and stores first copy x31 to
+their base register, sp or one of x8..x15.
+"""
+
+import itertools
+
+import const
+from asm import c_imm, encode_b, encode_i, encode_j, encode_r, encode_s, encode_u
+
+
+DEFAULT_WEIGHTS = {
+    'alu': 6,
+    'alu_imm': 6,
+    'shift_imm': 2,
+    'lui': 1,
+    'auipc': 1,
+    'branch': 3,
+    'jal': 1,
+    'jalr': 1,
+    'load': 3,
+    'store': 3,
+    'muldiv': 1,
+    'compressed': 6,
+}
+
+_ALU = [(0b000, 0b0000000), (0b000, 0b0100000), (0b001, 0b0000000), (0b010, 0b0000000),
+        (0b011, 0b0000000), (0b100, 0b0000000), (0b101, 0b0000000), (0b101, 0b0100000),
+        (0b110, 0b0000000), (0b111, 0b0000000)]
+_ALU_IMM = [0b000, 0b010, 0b011, 0b100, 0b110, 0b111]
+_SHIFT_IMM = [(0b001, 0b0000000), (0b101, 0b0000000), (0b101, 0b0100000)]
+# funct3 of MUL, MULH, MULHSU, MULHU, DIV, DIVU, REM and REMU
+_MULDIV = range(8)
+_BRANCHES = [0b000, 0b001, 0b100, 0b101, 0b110, 0b111]
+# funct3 and access size of loads and stores
+_LOADS = [(0b000, 1), (0b001, 2), (0b010, 4), (0b100, 1), (0b101, 2)]
+_STORES = [(0b000, 1), (0b001, 2), (0b010, 4)]
+_COMPRESSED = ['c.addi', 'c.li', 'c.lui', 'c.addi16sp', 'c.addi4spn', 'c.srli', 'c.srai',
+               'c.andi', 'c.alu', 'c.slli', 'c.mv', 'c.add', 'c.lw', 'c.sw', 'c.lwsp', 'c.swsp',
+               'c.beqz', 'c.bnez', 'c.j', 'c.jal', 'c.jr', 'c.jalr']
+
+DATA_BASE = 31
+COUNTER = 30
+JALR_BASE = 29
+MAX_RD = 28
+
+
+class Program:
+    """Generated text image and the address where the program ends."""
+
+    def __init__(self, text, end):
+        self.text = text
+        self.end = end
+
+
+def _ci(funct3, imm, rd, quadrant):
+    return (funct3 << 13) | c_imm(imm, 12, '5') | (rd << 7) | c_imm(imm, 6, '4:0') | quadrant
+
+
+def _cb(off, rs1, funct3):
+    return (funct3 << 13) | c_imm(off, 12, '8|4:3') | ((rs1 - 8) << 7) | \
+        c_imm(off, 6, '7:6|2:1|5') | 0b01
+
+
+def _cj(off, funct3):
+    return (funct3 << 13) | c_imm(off, 12, '11|4|9:8|10|6|7|3:1|5') | 0b01
+
+
+def _size(code):
+    if isinstance(code, tuple):
+        return 4 if code[0] else 2
+    return 4 if code & 3 == 3 else 2
+
+
+def generate(rng, length=400, iterations=100, weights=None, max_skip=16):
+    """Generate a random program with a body of the given length in
+    instructions.
+
+    The rng is a random.Random instance. The returned program runs its body the
+    given number of times and then loops forever at the end address. Forward
+    branches and jumps skip at most max_skip instructions so that most of the
+    body gets executed.
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    kinds = list(weights)
+    cum_weights = list(itertools.accumulate(weights[kind] for kind in kinds))
+    if not 1 <= iterations < 2048:
+        raise ValueError("iterations must be in [1, 2047]")
+
+    words = [
+        encode_u(const.MEM_DATA_ZERO >> 12, DATA_BASE, 0b0110111), # lui x31, MEM_DATA_ZERO
+        encode_i(iterations, 0, 0b000, COUNTER, 0b0010011), # addi x30, x0, iterations
+    ]
+    for rd in range(1, MAX_RD + 1):
+        value = rng.getrandbits(32)
+        words.append(encode_u((value + 0x800) >> 12, rd, 0b0110111)) # lui
+        words.append(encode_i(value & 0xfff, rd, 0b000, rd, 0b0010011)) # addi
+
+    body = len(words)
+    tail = body + length
+    if tail + 3 > const.MEM_ROWS:
+        raise ValueError("program does not fit into the instruction memory")
+
+    # Branch and jump targets, the second instruction of a pair which sets up
+    # a JALR or a compressed load or store must not be one. Instructions with
+    # a target are appended as (is 32-bit, index of the instruction the offset
+    # is relative to, target, encoder of the offset) and resolved once the
+    # addresses of all instructions are known.
+    targets = set()
+    while len(words) < tail:
+        idx = len(words)
+        kind = rng.choices(kinds, cum_weights=cum_weights)[0]
+        rd = rng.randint(1, MAX_RD)
+        rs1 = rng.randint(0, 31)
+        rs2 = rng.randint(0, 31)
+        target = min(idx + 1 + rng.randrange(max_skip + 1), tail)
+        if kind == 'alu':
+            funct3, funct7 = rng.choice(_ALU)
+            words.append(encode_r(funct7, rs2, rs1, funct3, rd, 0b0110011))
+        elif kind == 'alu_imm':
+            words.append(encode_i(rng.randint(-2048, 2047), rs1, rng.choice(_ALU_IMM), rd,
+                            0b0010011))
+        elif kind == 'shift_imm':
+            funct3, funct7 = rng.choice(_SHIFT_IMM)
+            words.append(encode_r(funct7, rng.randint(0, 31), rs1, funct3, rd, 0b0010011))
+        elif kind == 'lui':
+            words.append(encode_u(rng.getrandbits(20), rd, 0b0110111))
+        elif kind == 'auipc':
+            words.append(encode_u(rng.getrandbits(20), rd, 0b0010111))
+        elif kind == 'branch':
+            targets.add(target)
+            funct3 = rng.choice(_BRANCHES)
+            words.append((True, idx, target,
+                          lambda off, rs2=rs2, rs1=rs1, funct3=funct3:
+                          encode_b(off, rs2, rs1, funct3)))
+        elif kind == 'jal':
+            targets.add(target)
+            words.append((True, idx, target, lambda off, rd=rd: encode_j(off, rd)))
+        elif kind == 'jalr':
+            if idx + 2 > tail or idx + 1 in targets:
+                continue
+            target = min(idx + 2 + rng.randrange(max_skip + 1), tail)
+            targets.add(target)
+            words.append(encode_u(0, JALR_BASE, 0b0010111)) # auipc x29, 0
+            words.append((True, idx, target,
+                          lambda off, rd=rd: encode_i(off, JALR_BASE, 0b000, rd, 0b1100111)))
+        elif kind == 'load':
+            funct3, size = rng.choice(_LOADS)
+            off = rng.randrange(0, 4 * const.MEM_ROWS, size) if rng.getrandbits(1) \
+                else rng.randrange(0, 64, size)
+            words.append(encode_i(off, DATA_BASE, funct3, rd, 0b0000011))
+        elif kind == 'store':
+            funct3, size = rng.choice(_STORES)
+            off = rng.randrange(0, 4 * const.MEM_ROWS, size) if rng.getrandbits(1) \
+                else rng.randrange(0, 64, size)
+            words.append(encode_s(off, rs2, DATA_BASE, funct3))
+        elif kind == 'muldiv':
+            words.append(encode_r(0b0000001, rs2, rs1, rng.choice(_MULDIV), rd, 0b0110011))
+        elif kind == 'compressed':
+            if not _compressed(rng, words, targets, tail, max_skip):
+                continue
+
+    words.append(encode_i(-1, COUNTER, 0b000, COUNTER, 0b0010011)) # addi x30, x30, -1
+    # bne x30, x0, body
+    words.append((True, tail + 1, body, lambda off: encode_b(off, 0, COUNTER, 0b001)))
+    words.append(encode_j(0, 0)) # end: jal x0, end
+
+    addrs = list(itertools.accumulate((_size(code) for code in words),
+                                      initial=const.MEM_INSTR_ZERO))
+    text = bytearray()
+    for code in words:
+        if isinstance(code, tuple):
+            _, base, target, encode = code
+            code = encode(addrs[target] - addrs[base])
+        text += code.to_bytes(_size(code), 'little')
+    return Program(bytes(text), addrs[-2])
+
+
+def _compressed(rng, words, targets, tail, max_skip):
+    """Append a random compressed instruction, preceded by the setup of its base
+    register for loads, stores and jumps through a register. Return False if
+    the setup does not fit before the tail."""
+    idx = len(words)
+    name = rng.choice(_COMPRESSED)
+    rd = rng.randint(1, MAX_RD)
+    rs2 = rng.randint(1, 31)
+    # rd'/rs1' and rs2' of the formats with 3-bit register fields
+    rd_p = rng.randint(8, 15)
+    rs2_p = rng.randint(8, 15)
+    imm = rng.choice([value for value in range(-32, 32) if value])
+    target = min(idx + 1 + rng.randrange(max_skip + 1), tail)
+
+    if name in ('c.lw', 'c.sw', 'c.lwsp', 'c.swsp', 'c.jr', 'c.jalr'):
+        setup = 2 if name in ('c.jr', 'c.jalr') else 1
+        if idx + setup + 1 > tail or any(idx + i in targets for i in range(1, setup + 1)):
+            return False
+
+    if name == 'c.addi':
+        words.append(_ci(0b000, imm, rd, 0b01))
+    elif name == 'c.li':
+        words.append(_ci(0b010, imm, rd, 0b01))
+    elif name == 'c.lui':
+        words.append(_ci(0b011, imm, rd if rd != 2 else 3, 0b01))
+    elif name == 'c.addi16sp':
+        off = 16 * imm
+        words.append((0b011 << 13) | c_imm(off, 12, '9') | (2 << 7) |
+                     c_imm(off, 6, '4|6|8:7|5') | 0b01)
+    elif name == 'c.addi4spn':
+        words.append(c_imm(rng.randrange(4, 1024, 4), 12, '5:4|9:6|2|3') | ((rd_p - 8) << 2))
+    elif name in ('c.srli', 'c.srai', 'c.andi'):
+        funct2 = ('c.srli', 'c.srai', 'c.andi').index(name)
+        value = imm if name == 'c.andi' else rng.randint(1, 31)
+        words.append((0b100 << 13) | c_imm(value, 12, '5') | (funct2 << 10) | ((rd_p - 8) << 7) |
+                     c_imm(value, 6, '4:0') | 0b01)
+    elif name == 'c.alu': # c.sub, c.xor, c.or, c.and
+        words.append((0b100011 << 10) | ((rd_p - 8) << 7) | (rng.randrange(4) << 5) |
+                     ((rs2_p - 8) << 2) | 0b01)
+    elif name == 'c.slli':
+        words.append(_ci(0b000, rng.randint(1, 31), rd, 0b10))
+    elif name in ('c.mv', 'c.add'):
+        words.append(((0b1000 if name == 'c.mv' else 0b1001) << 12) | (rd << 7) | (rs2 << 2) |
+                     0b10)
+    elif name in ('c.lw', 'c.sw'):
+        words.append(encode_i(0, DATA_BASE, 0b000, rd_p, 0b0010011)) # addi rd', x31, 0
+        off = rng.randrange(0, 128, 4)
+        words.append(((0b010 if name == 'c.lw' else 0b110) << 13) | c_imm(off, 12, '5:3') |
+                     ((rd_p - 8) << 7) | c_imm(off, 6, '2|6') | ((rs2_p - 8) << 2))
+    elif name == 'c.lwsp':
+        words.append(encode_i(0, DATA_BASE, 0b000, 2, 0b0010011)) # addi sp, x31, 0
+        off = rng.randrange(0, 256, 4)
+        words.append((0b010 << 13) | c_imm(off, 12, '5') | (rd << 7) |
+                     c_imm(off, 6, '4:2|7:6') | 0b10)
+    elif name == 'c.swsp':
+        words.append(encode_i(0, DATA_BASE, 0b000, 2, 0b0010011)) # addi sp, x31, 0
+        off = rng.randrange(0, 256, 4)
+        words.append((0b110 << 13) | c_imm(off, 12, '5:2|7:6') | (rs2 << 2) | 0b10)
+    elif name in ('c.beqz', 'c.bnez'):
+        targets.add(target)
+        funct3 = 0b110 if name == 'c.beqz' else 0b111
+        words.append((False, idx, target,
+                      lambda off, rs1=rd_p, funct3=funct3: _cb(off, rs1, funct3)))
+    elif name in ('c.j', 'c.jal'):
+        targets.add(target)
+        funct3 = 0b101 if name == 'c.j' else 0b001
+        words.append((False, idx, target, lambda off, funct3=funct3: _cj(off, funct3)))
+    else: # c.jr, c.jalr
+        target = min(idx + 3 + rng.randrange(max_skip + 1), tail)
+        targets.add(target)
+        words.append(encode_u(0, JALR_BASE, 0b0010111)) # auipc x29, 0
+        words.append((True, idx, target,
+                      lambda off: encode_i(off, JALR_BASE, 0b000, JALR_BASE, 0b0010011)))
+        words.append(((0b1000 if name == 'c.jr' else 0b1001) << 12) | (JALR_BASE << 7) | 0b10)
+    return True
+
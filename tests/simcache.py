@@ -0,0 +1,120 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Content-addressed cache of simulator builds, used by Makefile.common.
+
+A cache key is a hash of the simulator configuration passed by the Makefile
+and of the content of all Verilog sources, including files pulled in through
+`include. An entry stores the build files which cocotb needs to run a
+simulation, e.g. sim.vvp for Icarus Verilog.
+
+Restoring an entry copies its files into the build directory and gives them
+the current time so that make sees them up to date with respect to the
+sources.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+
+_INCLUDE = re.compile(rb'^\s*`include\s+"([^"]+)"', re.MULTILINE)
+
+
+def _resolve_include(name, source, include_dirs):
+    for directory in [os.path.dirname(source)] + include_dirs:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def compute_key(config, sources, include_dirs):
+    """Return a cache key of the given configuration string and sources."""
+    digest = hashlib.sha256(config.encode())
+    pending = list(sources)
+    seen = set()
+    while pending:
+        source = pending.pop(0)
+        real = os.path.realpath(source)
+        if real in seen:
+            continue
+        seen.add(real)
+        with open(source, 'rb') as f:
+            data = f.read()
+        digest.update(f'\0{os.path.basename(source)}\0{len(data)}\0'.encode())
+        digest.update(data)
+        for name in _INCLUDE.findall(data):
+            path = _resolve_include(name.decode(), source, include_dirs)
+            if path is not None:
+                pending.append(path)
+    return digest.hexdigest()[:32]
+
+
+def restore(cache_dir, key, build_dir, files):
+    """Copy cached files into build_dir, return False if the entry is missing."""
+    entry = os.path.join(cache_dir, key)
+    if not all(os.path.exists(os.path.join(entry, name)) for name in files):
+        return False
+    os.makedirs(build_dir, exist_ok=True)
+    now = time.time()
+    # Files are given in dependency order, later ones must not look older.
+    for i, name in enumerate(files):
+        path = os.path.join(build_dir, name)
+        shutil.copy2(os.path.join(entry, name), path)
+        os.utime(path, (now + i, now + i))
+    return True
+
+
+def store(cache_dir, key, build_dir, files):
+    """Add files from build_dir to the cache unless the entry already exists."""
+    entry = os.path.join(cache_dir, key)
+    if os.path.exists(entry):
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    # Concurrent builds of the same key can race, publish the entry atomically.
+    tmp = tempfile.mkdtemp(prefix=f'.{key}.', dir=cache_dir)
+    try:
+        for name in files:
+            shutil.copy2(os.path.join(build_dir, name), os.path.join(tmp, name))
+        os.rename(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the simulator build cache.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    key_parser = subparsers.add_parser('key', help="print the cache key of sources")
+    key_parser.add_argument('-c', '--config', default='',
+                            help="simulator configuration string")
+    key_parser.add_argument('-I', dest='include_dirs', action='append', default=[],
+                            metavar='DIR', help="include directory")
+    key_parser.add_argument('sources', nargs='*', metavar='SOURCE')
+
+    for command in ('restore', 'store'):
+        command_parser = subparsers.add_parser(command, help=f"{command} a build")
+        command_parser.add_argument('cache_dir')
+        command_parser.add_argument('key')
+        command_parser.add_argument('build_dir')
+        command_parser.add_argument('files', nargs='+', metavar='FILE')
+
+    args = parser.parse_args()
+    if args.command == 'key':
+        print(compute_key(args.config, args.sources, args.include_dirs))
+    elif args.command == 'restore':
+        if restore(args.cache_dir, args.key, args.build_dir, args.files):
+            print(f"Restored {' '.join(args.files)} from the build cache ({args.key})")
+    else:
+        store(args.cache_dir, args.key, args.build_dir, args.files)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Snapshots of the state of the cpu toplevel.
+
+A Snapshot holds everything needed to continue a run of the cpu toplevel from
+an instruction boundary: pc, x1..x31, the instruction and data memory, state
+of the control FSM with the performance counters, state of mem_control and
+registers of fifo_if. capture() takes a snapshot of a running simulation and
+restore() puts it back, typically into a fresh simulation instead of going
+through reset and the boot path of the firmware:
+
+    await utils.init_dut_noreset(dut)
+    await snapshot.restore(dut, snapshot.Snapshot.load('booted.snap'))
+
+Snapshots are saved as a small header followed by the memories compressed with
+zlib.
+"""
+
+import struct
+import zlib
+
+from cocotb.triggers import FallingEdge
+
+import const
+import utils
+
+
+MAGIC = b'PK32SNP\0'
+VERSION = 2
+
+# Registers of fifo_if in the order in which they are saved.
+FIFO_REGS = ('in_buffer_q', 'in_valid_q', 'in_irq_q', 'addr_q', 'out_buffer_q',
+             'out_ready_q', 'out_irq_q', 'started_q')
+
+# magic, version, pc, x1..x31, control state, cycle, instret, read_stall,
+# mem_control state, fifo_if registers, sizes of both memories
+_HEADER = struct.Struct(f'<8sII31IBQQIB{len(FIFO_REGS)}BII')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class Snapshot:
+    """State of the cpu toplevel at the start of an instruction."""
+
+    def __init__(self, pc, regs, control, mem_control, fifo, text, data):
+        self.pc = pc
+        # Values of x0..x31.
+        self.regs = regs
+        # {'state', 'cycle', 'instret', 'read_stall'}
+        self.control = control
+        self.mem_control = mem_control
+        # {register: value} with FIFO_REGS of fifo_if.
+        self.fifo = fifo
+        # Little-endian byte images of the instruction and data memory.
+        self.text = text
+        self.data = data
+
+    def to_bytes(self):
+        """Return the snapshot serialized into bytes."""
+        text = zlib.compress(self.text)
+        data = zlib.compress(self.data)
+        control = self.control
+        header = _HEADER.pack(MAGIC, VERSION, self.pc, *self.regs[1:], control['state'],
+                              control['cycle'], control['instret'],
+                              control['read_stall'], self.mem_control, *(self.fifo[name] for name in FIFO_REGS),
+                              len(text), len(data))
+        return header + text + data
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """Return a snapshot deserialized from bytes."""
+        if len(buffer) < _HEADER.size:
+            raise SnapshotError("truncated snapshot")
+        fields = _HEADER.unpack_from(buffer)
+        magic, version, pc = fields[:3]
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"not a version {VERSION} snapshot")
+        regs = [0] + list(fields[3:34])
+        control = dict(zip(('state', 'cycle', 'instret', 'read_stall'), fields[34:38]))
+        mem_control = fields[38]
+        fifo = dict(zip(FIFO_REGS, fields[39:39 + len(FIFO_REGS)]))
+        text_size, data_size = fields[39 + len(FIFO_REGS):]
+        offset = _HEADER.size
+        if len(buffer) != offset + text_size + data_size:
+            raise SnapshotError("truncated snapshot")
+        text = zlib.decompress(buffer[offset:offset + text_size])
+        data = zlib.decompress(buffer[offset + text_size:])
+        return cls(pc, regs, control, mem_control, fifo, text, data)
+
+    def save(self, path):
+        """Write the snapshot to a file."""
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot from a file."""
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+async def capture(dut):
+    """Wait for the start of the next instruction and return its snapshot.
+
+    Must be called on a falling clock edge, the snapshot is taken on the first
+    following one in which the control FSM is in ST_EXEC and the instruction
+    does not wait for a load. On the pipelined core, the memory stage must also
+    not access the data memory or the FIFO. Register writes of the previous
+    instructions in the memory stage and in writeback are included in the
+    registers.
+    """
+    control = dut.u_control
+    st_exec = int(control.ST_EXEC.value)
+    pipelined = utils.is_pipelined(dut)
+    while True:
+        await FallingEdge(dut.clk_i)
+        if control.state.value == st_exec and not control.load_use.value and \
+           not (pipelined and (dut.ma_r_en.value or dut.ma_wr_en.value)):
+            break
+
+    regs = utils.read_regs(dut)
+    u_registers = dut.u_registers
+    if u_registers.wr_en_i.value and u_registers.rd_idx_i.value.integer != 0:
+        regs[u_registers.rd_idx_i.value.integer] = u_registers.rd_data_i.value.integer
+    if pipelined and dut.ma_en.value and dut.ma_rd.value.integer != 0:
+        regs[dut.ma_rd.value.integer] = dut.ma_data.value.integer
+    fifo = dut.u_fifo_if
+    return Snapshot(
+        dut.pc.value.integer,
+        regs,
+        {name: getattr(control, name).value.integer
+         for name in ('state', 'cycle', 'instret', 'read_stall')},
+        dut.u_mem_control.state.value.integer,
+        {name: getattr(fifo, name).value.integer for name in FIFO_REGS},
+        utils.read_mem(dut.u_mem_instr.u_mem),
+        utils.read_mem(dut.u_mem_control.u_mem))
+
+
+async def restore(dut, snapshot):
+    """Restore a snapshot, the cpu continues with the instruction at its pc.
+
+    The clock must be running and the call must be made on a falling clock
+    edge. Any reset of the core which is in progress is ended.
+    """
+    dut.rstn_i.value = 1
+    dut.rstn_sync.value = 0b11
+
+    # Memories are replaced through the backdoor, which takes a simulation step
+    # but no clock edge.
+    await utils.load_mem(dut.u_mem_instr.u_mem, snapshot.text)
+    await utils.load_mem(dut.u_mem_control.u_mem, snapshot.data)
+
+    # The instruction at pc is normally fetched in the previous cycle, set the
+    # output registers of the instruction memory as if it was.
+    # A pc in the middle of a row reads the halves swapped, see mem.v.
+    dut.pc.value = snapshot.pc
+    u_mem_instr = dut.u_mem_instr
+    offset = (snapshot.pc - const.MEM_INSTR_ZERO) % (4 * len(u_mem_instr.u_mem.mem_01))
+    word = int.from_bytes(snapshot.text[offset:offset + 4], 'little')
+    swap = offset >> 1 & 1
+    u_mem_instr.u_mem.swap_r.value = swap
+    u_mem_instr.u_mem.data_r_01.value = word >> 16 if swap else word & 0xffff
+    u_mem_instr.u_mem.data_r_23.value = word & 0xffff if swap else word >> 16
+    u_mem_instr.r_en_post.value = 1
+    u_mem_instr.acc_r_post.value = const.MEM_ACCESS_WORD
+
+    regs = dut.u_registers.regs
+    for index in range(1, 32):
+        regs[index].value = snapshot.regs[index]
+    # The registers already include the results of the previous instructions.
+    if utils.is_pipelined(dut):
+        dut.ma_en.value = 0
+        dut.ma_r_en.value = 0
+        dut.ma_wr_en.value = 0
+    dut.wb_en.value = 0
+    control = dut.u_control
+    for name, value in snapshot.control.items():
+        getattr(control, name).value = value
+    dut.u_mem_control.state.value = snapshot.mem_control
+    fifo = dut.u_fifo_if
+    for name, value in snapshot.fifo.items():
+        getattr(fifo, name).value = value
@@ -0,0 +1,237 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Parallel design-space exploration of build parameters of pako32.
+
+A sweep builds every combination of the given values of:
+
+- ROWS, the number of words of the instruction and data memory,
+- CPU_CLK_DIV, the divider of the 16MHz clock which gives the cpu clock,
+- PIPELINE, the choice between the single-stage and the pipelined core,
+- the nextpnr seed,
+- extra options of synth_ice40.
+
+Each variant is synthesized, placed and routed by synth.run() in its own
+directory <output>/<variant>, on a pool of parallel workers. The benchmarks of
+tests/cpu_bench are simulated alongside, once for each value of ROWS and
+PIPELINE as the other parameters do not change the number of cycles, with
+results in <output>/bench-rows<N>-pipe<P>.json.
+
+Variants are then ranked. Those whose cpu clock domain meets timing come
+first, ordered by the time the benchmarks take at the cpu clock, then by the
+number of logic cells and then by Fmax. The ranked table is printed and saved to
+<output>/sweep.json:
+
+    $ python tests/sweep.py -j 8 --rows 256,512 --clk-div 2,4,8 --pipeline 0,1 \\
+          --seed 1,2 --synth-options= --synth-options=-abc9 $(HDL_FILES)
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import re
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+import bench
+import synth
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Frequency of the clock divided by CPU_CLK_DIV.
+BASE_CLK_MHZ = 16
+
+
+class SweepError(Exception):
+    pass
+
+
+Variant = collections.namedtuple('Variant', ['rows', 'clk_div', 'pipeline', 'seed',
+                                             'synth_options'])
+
+
+def variant_name(variant):
+    """Return a name of a variant usable as a directory name."""
+    name = f'rows{variant.rows}-div{variant.clk_div}-pipe{variant.pipeline}-seed{variant.seed}'
+    options = re.sub(r'\W+', '_', variant.synth_options).strip('_')
+    return f'{name}-{options}' if options else name
+
+
+def cpu_fmax(record, clk_div):
+    """Return Fmax of the cpu clock domain of a synth record.
+
+    The net of the cpu clock keeps the name of the prescaler output it is
+    connected to, fall back to the name of the net in pako32 otherwise.
+    """
+    try:
+        return synth.clock_fmax(record, f'clk_{BASE_CLK_MHZ // clk_div}mhz')
+    except synth.SynthError:
+        return synth.clock_fmax(record, 'clk_cpu')
+
+
+def run_synth(variant, output, hdl_files):
+    """Synthesize a variant and return its synth record."""
+    params = {'ROWS': variant.rows, 'CPU_CLK_DIV': variant.clk_div,
+              'PIPELINE': variant.pipeline}
+    return synth.run(os.path.join(output, variant_name(variant)), hdl_files,
+                     variant.seed, variant.synth_options.split(), params)
+
+
+def run_bench(rows, pipeline, output, sim):
+    """Simulate tests/cpu_bench with the given ROWS and PIPELINE and return its
+    results."""
+    build_dir = os.path.join(output, f'sim-rows{rows}-pipe{pipeline}')
+    results_file = os.path.join(build_dir, 'results.xml')
+    path = os.path.join(output, f'bench-rows{rows}-pipe{pipeline}.json')
+    # bench.save() adds to an existing file.
+    for stale in (path, results_file):
+        if os.path.exists(stale):
+            os.remove(stale)
+    os.makedirs(build_dir, exist_ok=True)
+    log_file = os.path.join(build_dir, 'make.log')
+    env = dict(os.environ, BENCH_OUTPUT=path)
+    with open(log_file, 'w') as log:
+        returncode = subprocess.call(
+            ['make', '-C', os.path.join(TESTS_DIR, 'cpu_bench'), f'SIM={sim}',
+             f'SIM_BUILD={build_dir}',
+             f'COCOTB_RESULTS_FILE={results_file}',
+             f'PARAMS=ROWS={rows} PIPELINE={pipeline}'],
+            stdout=log, stderr=subprocess.STDOUT, env=env)
+    try:
+        testcases = list(ET.parse(results_file).getroot().iter('testcase'))
+    except (OSError, ET.ParseError):
+        testcases = []
+    # A benchmark fails for example when its firmware does not fit into ROWS.
+    if returncode != 0 or not testcases or \
+       any(testcase.find('failure') is not None for testcase in testcases):
+        raise SweepError(f"benchmarks failed, see {log_file}")
+    return bench.load(path)
+
+
+def summarize(variant, record, benchmarks):
+    """Return a row of the ranked table for a variant."""
+    clk_mhz = BASE_CLK_MHZ / variant.clk_div
+    fmax = cpu_fmax(record, variant.clk_div)
+    cycles = sum(results['cycles'] for results in benchmarks.values())
+    instret = sum(results['instret'] for results in benchmarks.values())
+    return {
+        'variant': variant_name(variant),
+        'rows': variant.rows,
+        'clk_div': variant.clk_div,
+        'pipeline': variant.pipeline,
+        'seed': variant.seed,
+        'synth_options': variant.synth_options,
+        'clk_mhz': clk_mhz,
+        'fmax': fmax,
+        'meets_timing': fmax >= clk_mhz,
+        'lcs': record['lcs'],
+        'luts': record['luts'],
+        'ffs': record['ffs'],
+        'ebr': record['ebr'],
+        'cycles': cycles,
+        'cpi': cycles / instret if instret else 0.0,
+        # Time of all benchmarks at the cpu clock.
+        'time_us': cycles / clk_mhz,
+    }
+
+
+def rank(rows):
+    """Sort rows of variants from the best one."""
+    return sorted(rows, key=lambda row: (not row['meets_timing'], row['time_us'], row['lcs'],
+                                         -row['fmax']))
+
+
+def sweep(variants, output, hdl_files, sim, jobs):
+    """Build and benchmark all variants and return (ranked rows, errors)."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        benches = {key: executor.submit(run_bench, *key, output, sim)
+                   for key in sorted({(variant.rows, variant.pipeline)
+                                      for variant in variants})}
+        synths = {variant: executor.submit(run_synth, variant, output, hdl_files)
+                  for variant in variants}
+
+        rows = []
+        errors = {}
+        for variant, future in synths.items():
+            try:
+                rows.append(summarize(variant, future.result(),
+                                      benches[variant.rows, variant.pipeline].result()))
+            except (synth.SynthError, SweepError) as e:
+                errors[variant_name(variant)] = str(e)
+    return rank(rows), errors
+
+
+def print_table(rows, errors):
+    print(f"{'RANK':>4} {'VARIANT':42} {'MHZ':>5} {'FMAX':>7} {'LCS':>6} {'LUTS':>6} "
+          f"{'FFS':>5} {'EBR':>4} {'CPI':>6} {'TIME_US':>10}")
+    for index, row in enumerate(rows, 1):
+        fmax = f"{row['fmax']:6.2f}{'' if row['meets_timing'] else '!'}"
+        print(f"{index:4d} {row['variant']:42} {row['clk_mhz']:5.1f} {fmax:>7} "
+              f"{row['lcs']:6d} {row['luts']:6d} {row['ffs']:5d} {row['ebr']:4d} "
+              f"{row['cpi']:6.3f} {row['time_us']:10.1f}")
+    for name, error in sorted(errors.items()):
+        print(f"{'-':>4} {name:42} {error}")
+
+
+def int_list(text):
+    """Parse a comma-separated list of integers."""
+    try:
+        return [int(value, 0) for value in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid list of integers: {text!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build and benchmark variants of the design in parallel.",
+        epilog="Fmax marked with ! is below the cpu clock of the variant.")
+    parser.add_argument('hdl_files', nargs='+', help="HDL files of the design")
+    parser.add_argument('-o', '--output', default='sweep_build',
+                        help="directory for the variants (default: %(default)s)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="number of parallel jobs (default: %(default)s)")
+    parser.add_argument('--sim', default='icarus',
+                        help="simulator of the benchmarks (default: %(default)s)")
+    parser.add_argument('--rows', type=int_list, default='512',
+                        help="comma-separated values of ROWS (default: %(default)s)")
+    parser.add_argument('--clk-div', type=int_list, default='8',
+                        help="comma-separated values of CPU_CLK_DIV, each one of 2, 4, 8 "
+                             "and 16 (default: %(default)s)")
+    parser.add_argument('--pipeline', type=int_list, default='0',
+                        help="comma-separated values of PIPELINE, 0 for the single-stage "
+                             "and 1 for the pipelined core (default: %(default)s)")
+    parser.add_argument('--seed', type=int_list, default='1',
+                        help="comma-separated nextpnr seeds (default: %(default)s)")
+    parser.add_argument('--synth-options', action='append',
+                        help="extra options of synth_ice40 of one variant, can be "
+                             "repeated, use --synth-options=-abc9 for options starting "
+                             "with a dash (default: none)")
+    args = parser.parse_args()
+    if not set(args.clk_div) <= {2, 4, 8, 16}:
+        parser.error(f"invalid CPU_CLK_DIV in {args.clk_div}")
+    if not set(args.pipeline) <= {0, 1}:
+        parser.error(f"invalid PIPELINE in {args.pipeline}")
+
+    output = os.path.abspath(args.output)
+    os.makedirs(output, exist_ok=True)
+    variants = [Variant(rows, clk_div, pipeline, seed, options)
+                for rows in args.rows
+                for clk_div in args.clk_div
+                for pipeline in args.pipeline
+                for seed in args.seed
+                for options in args.synth_options or ['']]
+    rows, errors = sweep(variants, output, args.hdl_files, args.sim, args.jobs)
+
+    print_table(rows, errors)
+    with open(os.path.join(output, 'sweep.json'), 'w') as f:
+        json.dump({'variants': rows, 'errors': errors}, f, indent=2)
+        f.write('\n')
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
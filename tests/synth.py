@@ -0,0 +1,325 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Fmax and resource tracking of the synthesized pako32 design.
+
+run() synthesizes the design with yosys, places and routes it with
+nextpnr-ice40 and analyzes its timing with icetime, all in a separate build
+directory. The logs and the report are then parsed into a record:
+
+    {"time": ..., "commit": ..., "seed": ..., "yosys_options": [...],
+     "params": {"<name>": <value>, ...},
+     "fmax": {"<clock>": <MHz>, ...},
+     "critical_path": {"delay_ns": ..., "fmax": ..., "levels": ...,
+                       "nets": [...]},
+     "utilization": {"<bel>": [<used>, <available>], ...},
+     "cells": {"<cell type>": <count>, ...},
+     "lcs": ..., "luts": ..., "ffs": ..., "ebr": ...}
+
+fmax holds the maximum frequency of each clock domain as estimated by
+nextpnr, critical_path the longest path of the whole design as found by
+icetime. Records are appended to a history file with one JSON object per line
+and a new record is compared with the previous one of the same params, seed and
+yosys_options to catch changes of the HDL which make the design slower or
+larger:
+
+    $ python tests/synth.py run --history synth_history.jsonl $(HDL_FILES)
+    $ python tests/synth.py history synth_history.jsonl
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TOP = 'pako32'
+DEVICE = 'lp8k'
+PACKAGE = 'cm81'
+PIN_DEF = 'pins.pcf'
+
+# Clock domain of the cpu, which is checked for regressions of its Fmax.
+CLOCK = 'clk_2mhz'
+
+# Metrics compared with the previous record: (name, True if higher is better).
+METRICS = (('fmax', True), ('lcs', False), ('luts', False), ('ffs', False),
+           ('ebr', False))
+
+_STAT_CELL = re.compile(r'^\s+(SB_\w+)\s+(\d+)\s*$')
+_UTILIZATION = re.compile(r'^Info:\s+(\w+):\s+(\d+)/\s*(\d+)\s+\d+%')
+_MAX_FREQUENCY = re.compile(r"^Info: Max frequency for clock '([^']+)': ([\d.]+) MHz")
+_PATH_NET = re.compile(r'^\s+[\d.]+ ns \.\.\s+[\d.]+ ns (\S+)')
+_PATH_LEVELS = re.compile(r'^Total number of logic levels: (\d+)')
+_PATH_DELAY = re.compile(r'^Total path delay: ([\d.]+) ns \(([\d.]+) MHz\)')
+
+
+class SynthError(Exception):
+    pass
+
+
+def parse_yosys_log(text):
+    """Return {cell type: count} from the last statistics printed by yosys."""
+    start = text.rfind('Printing statistics.')
+    if start < 0:
+        raise SynthError("no statistics in the yosys log")
+    cells = {}
+    for line in text[start:].splitlines():
+        match = _STAT_CELL.match(line)
+        if match:
+            cells[match.group(1)] = int(match.group(2))
+    return cells
+
+
+def parse_nextpnr_log(text):
+    """Return (utilization, fmax) from a nextpnr-ice40 log.
+
+    utilization is {bel type: [used, available]} and fmax {clock: MHz}. Both
+    are printed more than once during the run, the last values which are
+    those after routing win.
+    """
+    utilization = {}
+    fmax = {}
+    for line in text.splitlines():
+        match = _UTILIZATION.match(line)
+        if match:
+            utilization[match.group(1)] = [int(match.group(2)), int(match.group(3))]
+            continue
+        match = _MAX_FREQUENCY.match(line)
+        if match:
+            fmax[match.group(1)] = float(match.group(2))
+    if not fmax:
+        raise SynthError("no clock frequencies in the nextpnr log")
+    return utilization, fmax
+
+
+def parse_icetime_report(text):
+    """Return the critical path from an icetime report as {'delay_ns', 'fmax',
+    'levels', 'nets'}."""
+    path = {'nets': []}
+    for line in text.splitlines():
+        match = _PATH_NET.match(line)
+        if match:
+            path['nets'].append(match.group(1))
+            continue
+        match = _PATH_LEVELS.match(line)
+        if match:
+            path['levels'] = int(match.group(1))
+            continue
+        match = _PATH_DELAY.match(line)
+        if match:
+            path['delay_ns'] = float(match.group(1))
+            path['fmax'] = float(match.group(2))
+    if 'delay_ns' not in path:
+        raise SynthError("no critical path in the icetime report")
+    return path
+
+
+def clock_fmax(record, clock=CLOCK):
+    """Return Fmax of the clock domain whose net name contains clock, e.g.
+    clk_2mhz matches clk_2mhz_$glb_clk."""
+    for name, fmax in sorted(record['fmax'].items()):
+        if clock in name:
+            return fmax
+    raise SynthError(f"no clock matching {clock!r} in {sorted(record['fmax'])}")
+
+
+def git_commit():
+    """Return a description of the checked out commit, or None outside of
+    git."""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run(args, log, cwd=ROOT_DIR):
+    """Run a tool with its output going to a log file."""
+    with open(log, 'w') as f:
+        try:
+            result = subprocess.run(args, cwd=cwd, stdout=f, stderr=subprocess.STDOUT)
+        except OSError as e:
+            raise SynthError(f"cannot run {args[0]}: {e.strerror}") from e
+    if result.returncode != 0:
+        raise SynthError(f"{args[0]} failed with exit code {result.returncode}, see {log}")
+
+
+def run(build_dir, hdl_files, seed=1, yosys_options=(), params=None, top=TOP,
+        device=DEVICE, package=PACKAGE, pin_def=PIN_DEF):
+    """Synthesize, place and route the design in build_dir and return its
+    record.
+
+    Paths of hdl_files and pin_def are relative to the top of the repository,
+    where yosys runs so that includes and memory images are found.
+    yosys_options are appended to the synth_ice40 command and params is
+    {name: value} of parameters of the top module to override.
+    """
+    os.makedirs(build_dir, exist_ok=True)
+    build_dir = os.path.abspath(build_dir)
+    json_file = os.path.join(build_dir, f'{top}.json')
+    asc_file = os.path.join(build_dir, f'{top}.asc')
+    rpt_file = os.path.join(build_dir, f'{top}.rpt')
+    yosys_log = os.path.join(build_dir, 'yosys.log')
+    nextpnr_log = os.path.join(build_dir, 'nextpnr.log')
+
+    read = ' '.join(f'read_verilog -sv {path};' for path in hdl_files)
+    read += ''.join(f' chparam -set {name} {value} {top};'
+                    for name, value in (params or {}).items())
+    synth = ' '.join(['synth_ice40', '-top', top, *yosys_options, '-json', json_file])
+    _run(['yosys', '-p', read, '-p', synth], yosys_log)
+    _run(['nextpnr-ice40', f'--{device}', '--package', package, '--seed', str(seed),
+          '--pcf', os.path.join(ROOT_DIR, pin_def), '--json', json_file,
+          '--asc', asc_file], nextpnr_log, cwd=build_dir)
+    _run(['icetime', '-d', device, '-mtr', rpt_file, asc_file],
+         os.path.join(build_dir, 'icetime.log'), cwd=build_dir)
+
+    with open(yosys_log) as f:
+        cells = parse_yosys_log(f.read())
+    with open(nextpnr_log) as f:
+        utilization, fmax = parse_nextpnr_log(f.read())
+    with open(rpt_file) as f:
+        critical_path = parse_icetime_report(f.read())
+
+    return {
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'seed': seed,
+        'yosys_options': list(yosys_options),
+        'params': dict(params or {}),
+        'fmax': fmax,
+        'critical_path': critical_path,
+        'utilization': utilization,
+        'cells': cells,
+        'lcs': utilization.get('ICESTORM_LC', [0, 0])[0],
+        'luts': cells.get('SB_LUT4', 0),
+        'ffs': sum(count for cell, count in cells.items() if cell.startswith('SB_DFF')),
+        'ebr': cells.get('SB_RAM40_4K', 0),
+    }
+
+
+def load_history(path):
+    """Return all records of a history file, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, record):
+    """Append a record to a history file."""
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def metric(record, name, clock=CLOCK):
+    """Return a metric of METRICS from a record."""
+    return clock_fmax(record, clock) if name == 'fmax' else record[name]
+
+
+def compare(current, previous, clock=CLOCK):
+    """Return rows (metric, previous, current, relative change) of METRICS,
+    the change is positive when the design got worse."""
+    rows = []
+    for name, higher_is_better in METRICS:
+        old, new = metric(previous, name, clock), metric(current, name, clock)
+        change = (new - old) / old if old else 0.0
+        rows.append((name, old, new, -change if higher_is_better else change))
+    return rows
+
+
+def cmd_run(args):
+    params = dict(param.split('=', 1) for param in args.param)
+    record = run(args.build_dir, args.hdl_files, args.seed, args.yosys_option, params,
+                 pin_def=args.pin_def)
+    print(f"fmax {args.clock}: {clock_fmax(record, args.clock):.2f} MHz, critical path "
+          f"{record['critical_path']['delay_ns']:.2f} ns "
+          f"({record['critical_path']['levels']} logic levels)")
+    print(f"lcs {record['lcs']}, luts {record['luts']}, ffs {record['ffs']}, "
+          f"ebr {record['ebr']}")
+
+    history = load_history(args.history) if args.history else []
+    if args.history:
+        append_history(args.history, record)
+    # Compare only builds of the same variant of the design and with the same
+    # tool settings, nextpnr results differ from seed to seed.
+    history = [previous for previous in history
+               if previous.get('params', {}) == record['params']
+               and previous['seed'] == record['seed']
+               and previous['yosys_options'] == record['yosys_options']]
+    if not history:
+        return 0
+
+    regressed = []
+    print(f"{'METRIC':8} {'PREVIOUS':>10} {'CURRENT':>10} {'CHANGE':>8}")
+    for name, old, new, change in compare(record, history[-1], args.clock):
+        fmt = '10.2f' if name == 'fmax' else '10d'
+        print(f"{name:8} {old:{fmt}} {new:{fmt}} {100 * change:+7.2f}%")
+        threshold = args.fmax_threshold if name == 'fmax' else args.area_threshold
+        if 100 * change > threshold:
+            regressed.append(name)
+    if regressed:
+        print(f"Regressed past the threshold: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+def cmd_history(args):
+    print(f"{'TIME':25} {'COMMIT':16} {'FMAX':>8} {'PATH':>8} {'LCS':>6} {'LUTS':>6} "
+          f"{'FFS':>6} {'EBR':>4}")
+    for record in load_history(args.history):
+        print(f"{record['time']:25} {record['commit'] or '-':16} "
+              f"{clock_fmax(record, args.clock):8.2f} "
+              f"{record['critical_path']['delay_ns']:8.2f} {record['lcs']:6d} "
+              f"{record['luts']:6d} {record['ffs']:6d} {record['ebr']:4d}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track Fmax and resources of the design.")
+    parser.add_argument('-c', '--clock', default=CLOCK,
+                        help="clock domain checked for Fmax (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser(
+        'run', help="synthesize the design and compare it with the last record")
+    run_parser.add_argument('hdl_files', nargs='+', help="HDL files of the design")
+    run_parser.add_argument('-b', '--build-dir', default='synth_build',
+                            help="directory for the outputs (default: %(default)s)")
+    run_parser.add_argument('-p', '--pin-def', default=PIN_DEF,
+                            help="pin constraints (default: %(default)s)")
+    run_parser.add_argument('-s', '--seed', type=int, default=1,
+                            help="nextpnr seed (default: %(default)s)")
+    run_parser.add_argument('-y', '--yosys-option', action='append', default=[],
+                            help="extra option of synth_ice40, can be repeated")
+    run_parser.add_argument('-P', '--param', action='append', default=[],
+                            metavar='NAME=VALUE',
+                            help="override a parameter of the top module, can be repeated")
+    run_parser.add_argument('--history', help="history file to compare with and append to")
+    run_parser.add_argument(
+        '--fmax-threshold', type=float, default=5.0,
+        help="fail if Fmax drops by more than this percentage (default: %(default)s)")
+    run_parser.add_argument(
+        '--area-threshold', type=float, default=2.0,
+        help="fail if LCs, LUTs, FFs or EBRs grow by more than this percentage "
+             "(default: %(default)s)")
+    run_parser.set_defaults(func=cmd_run)
+
+    history_parser = subparsers.add_parser('history', help="print a history file")
+    history_parser.add_argument('history', help="history file")
+    history_parser.set_defaults(func=cmd_history)
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    except SynthError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
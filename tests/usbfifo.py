@@ -0,0 +1,146 @@
+# Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
+# SPDX-License-Identifier: MIT
+
+"""Testbench side of the USB FIFO interface of the cpu toplevel.
+
+UsbDriver plays the host which sends bytes to the cpu over out_data_i,
+out_valid_i and out_ready_o. UsbMonitor receives bytes which the cpu sends over
+in_data_o, in_valid_o and in_ready_i. A byte is transferred on a rising clock
+edge when both valid and ready are high. Both classes update their signals on
+falling clock edges, like the rest of the testbench.
+
+Backpressure is configured by a pause iterable of booleans, one per cycle. In a
+cycle where it yields True, the driver keeps out_valid_i low, respectively the
+monitor keeps in_ready_i low. Once the iterable is exhausted, there are no more
+pauses. random_pause() gives a pause with a fixed probability per cycle.
+
+Both classes count the transferred bytes and the cycles from the first to the
+last transfer. Their ratio, bytes_per_cycle, is the sustained throughput.
+"""
+
+import random
+
+import cocotb
+from cocotb.triggers import Event, FallingEdge
+
+
+def random_pause(probability, rng=random):
+    """Yield True with the given probability per cycle, forever."""
+    while True:
+        yield rng.random() < probability
+
+
+class _Endpoint:
+    def __init__(self, dut, pause=None):
+        self.dut = dut
+        self.bytes = 0
+        self.first_cycle = None
+        self.last_cycle = None
+        self._pause = iter(pause or ())
+        self._cycle = 0
+        self._task = None
+
+    def start(self):
+        """Start driving the interface in the background."""
+        self._task = cocotb.start_soon(self.run())
+
+    def stop(self):
+        """Stop driving the interface started by start()."""
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    def _paused(self):
+        return next(self._pause, False)
+
+    def _transferred(self):
+        if self.first_cycle is None:
+            self.first_cycle = self._cycle
+        self.last_cycle = self._cycle
+        self.bytes += 1
+
+    @property
+    def cycles(self):
+        """Cycles from the first to the last transferred byte, inclusive."""
+        if self.first_cycle is None:
+            return 0
+        return self.last_cycle - self.first_cycle + 1
+
+    @property
+    def bytes_per_cycle(self):
+        """Sustained throughput of the transfers."""
+        return self.bytes / self.cycles if self.cycles else 0.0
+
+
+class UsbDriver(_Endpoint):
+    """Source of bytes sent to the cpu toplevel.
+
+    Bytes queued by send() are transferred in order. The idle event is set
+    whenever the queue is empty and the last byte has been consumed.
+    """
+
+    def __init__(self, dut, pause=None):
+        super().__init__(dut, pause)
+        self.queue = bytearray()
+        self.idle = Event()
+        self.idle.set()
+        dut.out_valid_i.value = 0
+
+    def send(self, data):
+        """Queue bytes to be sent."""
+        if data:
+            self.queue.extend(data)
+            self.idle.clear()
+
+    async def wait(self):
+        """Wait until all queued bytes are consumed by the cpu."""
+        await self.idle.wait()
+
+    async def run(self):
+        """Send queued bytes until the coroutine is killed."""
+        dut = self.dut
+        queue = self.queue
+        while True:
+            await FallingEdge(dut.clk_i)
+            self._cycle += 1
+            valid = bool(queue) and not self._paused()
+            dut.out_valid_i.value = valid
+            if not valid:
+                continue
+            dut.out_data_i.value = queue[0]
+            # The byte is consumed on the next rising edge.
+            if dut.out_ready_o.value == 1:
+                del queue[0]
+                self._transferred()
+                if not queue:
+                    self.idle.set()
+
+
+class UsbMonitor(_Endpoint):
+    """Sink of bytes sent by the cpu toplevel, collected in data."""
+
+    def __init__(self, dut, pause=None):
+        super().__init__(dut, pause)
+        self.data = bytearray()
+        self._received = Event()
+        dut.in_ready_i.value = 0
+
+    async def wait_for(self, done):
+        """Wait until done(data) returns True."""
+        while not done(self.data):
+            self._received.clear()
+            await self._received.wait()
+
+    async def run(self):
+        """Receive bytes until the coroutine is killed."""
+        dut = self.dut
+        while True:
+            await FallingEdge(dut.clk_i)
+            self._cycle += 1
+            ready = not self._paused()
+            dut.in_ready_i.value = ready
+            # The byte is consumed on the next rising edge.
+            if ready and dut.in_valid_o.value == 1:
+                self.data.append(dut.in_data_o.value.integer)
+                self._transferred()
+                self._received.set()
@@ -1,9 +1,15 @@
 # Copyright (C) 2023 Petr Pavlu <petr.pavlu@dagobah.cz>
 # SPDX-License-Identifier: MIT
 
+import itertools
+import os
+import random
+
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import FallingEdge
+from cocotb.triggers import FallingEdge, Timer
+
+import elf
 
 
 CLK_16MHZ_NS = 1_000_000_000 / 16_000_000
@@ -24,3 +30,97 @@ async def init_dut(dut):
     dut.rstn_i.value = 0
     await FallingEdge(dut.clk_i)
     dut.rstn_i.value = 1
+
+
+async def usb_send(dut, data):
+    """Send bytes to the cpu toplevel over its USB OUT interface.
+
+    Must be called on a falling clock edge, each byte is held on out_data_i
+    until it is consumed.
+    """
+    for byte in data:
+        dut.out_data_i.value = byte
+        dut.out_valid_i.value = 1
+        while not dut.out_ready_o.value:
+            await FallingEdge(dut.clk_i)
+        await FallingEdge(dut.clk_i)
+    dut.out_valid_i.value = 0
+
+
+_backdoor_tokens = itertools.count(1 + (os.getpid() << 10) % (1 << 30))
+
+
+async def load_mem(mem, data=b'', fill=0):
+    """Replace the whole content of a mem instance in one step.
+
+    The data is a little-endian byte image placed from row 0, all remaining rows
+    are set to the fill word. The image is passed to the simulator through the
+    $readmemh backdoor in mem.v so the cost does not depend on the number of
+    rows.
+    """
+    rows = len(mem.mem_01)
+    if len(data) > 4 * rows:
+        raise ValueError(f"image of {len(data)} bytes does not fit into {rows} rows")
+    data = bytes(data) + bytes(-len(data) % 4)
+    words = [int.from_bytes(data[i:i + 4], 'little') for i in range(0, len(data), 4)]
+    words += (rows - len(words)) * [fill]
+    await load_mem_words(mem, words)
+
+
+async def load_mem_words(mem, words):
+    """Replace the whole content of a mem instance with a list of 32-bit words."""
+    token = next(_backdoor_tokens)
+    name_01 = f'mem_backdoor_{token}.txt01'
+    name_23 = f'mem_backdoor_{token}.txt23'
+    with open(name_01, 'w') as f:
+        f.write(''.join(f'{word & 0xffff:04x}\n' for word in words))
+    with open(name_23, 'w') as f:
+        f.write(''.join(f'{word >> 16:04x}\n' for word in words))
+    try:
+        mem.backdoor_load.value = token
+        await Timer(1, units='step')
+    finally:
+        os.remove(name_01)
+        os.remove(name_23)
+
+
+def read_mem(mem):
+    """Return the whole content of a mem instance as a little-endian byte image."""
+    rows_01 = mem.mem_01.value
+    rows_23 = mem.mem_23.value
+    # Values are listed from the left index, i.e. from row ROWS-1 down to 0.
+    return b''.join(((int(rows_23[i]) << 16) | int(rows_01[i])).to_bytes(4, 'little')
+                    for i in reversed(range(len(rows_01))))
+
+
+def is_pipelined(dut):
+    """Return True if the cpu toplevel is built with the pipelined core."""
+    return bool(int(dut.PIPELINE.value))
+
+
+def read_regs(dut):
+    """Return values of x0..x31 of the cpu toplevel."""
+    return [0] + [int(value) for value in reversed(dut.u_registers.regs.value)]
+
+
+async def clear_mem(mem):
+    """Set all rows of a mem instance to zero."""
+    await load_mem(mem)
+
+
+async def randomize_mem(mem, rng=random):
+    """Set all rows of a mem instance to random values."""
+    await load_mem_words(mem, [rng.getrandbits(32) for _ in range(len(mem.mem_01))])
+
+
+async def load_image(dut, text=b'', data=b''):
+    """Load raw text and data images into the instruction and data memory of the
+    cpu toplevel. Unused rows are cleared."""
+    await load_mem(dut.u_mem_instr.u_mem, text)
+    await load_mem(dut.u_mem_control.u_mem, data)
+
+
+async def load_elf(dut, path):
+    """Load allocatable sections of an ELF file into the instruction and data
+    memory of the cpu toplevel. Unused rows are cleared."""
+    await load_image(dut, *elf.read_images(path))